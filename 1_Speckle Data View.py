@@ -5,12 +5,15 @@ from modules.speckle.projects import SpeckleProject
 
 import streamlit as st
 
-st.session_state["project_name"] = "Datenansicht Modell"
+page_title = "Datenansicht Modell"
 st.set_page_config(
-    page_title=st.session_state["project_name"],
+    page_title=page_title,
     layout="wide"
 )
 
+# Set the page title in the session state (the project name is set by the project selection of the sidebar)
+st.session_state["page_title"] = page_title
+
 # Instantiate the main components
 sidebar = Sidebar()
 
@@ -26,7 +29,7 @@ st_speckle = Streamlit_Speckle_Components(project.get_basehandler())
 
 # Header
 info = "This page introduces you to the different models in Speckle"
-st_speckle.show_header("Datenansicht Modell", info)
+st_speckle.show_header(page_title, info)
 
 # Show the 3D model
 st.subheader("Modell Visualisierung")
@@ -37,5 +40,5 @@ st.subheader("Arbeite mit Modell Informationen")
 st_speckle.show_data_tree(project)
 
 # Filter the dataframe
-st_speckle.filter_dataframe(show_df=True)
+st_speckle.filter_dataframe(project, show_df=True)
     
\ No newline at end of file
@@ -0,0 +1,101 @@
+"""
+Accuracy and latency of the category selection: LLM classification chain vs. the embedding based category router.
+
+The questions are fixed, every question names the synonym group of its expected category. Questions whose
+category is not in the model are skipped. A selection is correct if its first category is the expected one.
+
+Run from the repository root (needs OPENAI_API_KEY and SPECKLE_AUTH_TOKEN):
+    python -m benchmarks.bench_category_router --url https://app.speckle.systems/projects/xxx/models/xxx
+"""
+from modules.llm.category_router import CATEGORY_SYNONYMS, CategoryRouter, classify_with_llm
+from modules.speckle.projects import SpeckleProject
+
+import argparse
+import statistics
+import time
+
+
+# (question, a synonym of the expected category)
+QUESTIONS = [
+    ("Wie viele Wände gibt es im Modell?", "Wände"),
+    ("Welche Wand ist am längsten?", "Wände"),
+    ("How many doors are in the building?", "Türen"),
+    ("Wie breit sind die Türen im Erdgeschoss?", "Türen"),
+    ("What is the total glazing area of all windows?", "Fenster"),
+    ("Welche Fenster haben eine Brüstungshöhe unter 90 cm?", "Fenster"),
+    ("Wie groß ist die Nutzfläche der Räume?", "Räume"),
+    ("Which room has the largest area?", "Räume"),
+    ("Wie dick sind die Geschossdecken?", "Geschossdecken"),
+    ("What is the volume of the floor slabs?", "Geschossdecken"),
+    ("Welche Dachneigung hat das Dach?", "Dächer"),
+    ("How many columns carry the structure?", "Stützen"),
+    ("Wie viele Stufen hat die Treppe?", "Treppen"),
+    ("Wie hoch ist das Geländer?", "Geländer"),
+    ("Welche Querschnitte haben die Träger?", "Tragwerk"),
+    ("Wie viele Sitzgelegenheiten gibt es?", "Möbel"),
+    ("Wie viele WCs sind eingebaut?", "Sanitärinstallationen"),
+    ("Welche Materialien haben die tragenden Bauteile aus Beton mit der größten Dicke?", "Wände"),
+]
+
+
+def find_category(categories: list[str], synonym: str):
+    """ returns the category of the model which belongs to the synonym group of the given synonym"""
+    group = next((group for group in CATEGORY_SYNONYMS if synonym in group), [synonym])
+    lower_group = {name.lower() for name in group}
+    for category in categories:
+        if category.lstrip("@").lower() in lower_group:
+            return category
+    return None
+
+
+def measure(function, question: str) -> tuple[float, list[str]]:
+    start = time.perf_counter()
+    result = function(question)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="url of the Speckle model")
+    args = parser.parse_args()
+
+    basehandler = SpeckleProject(url=args.url).get_basehandler()
+    categories = basehandler.categories
+
+    start = time.perf_counter()
+    router = CategoryRouter(basehandler)
+    print(f"router built in {time.perf_counter() - start:.2f}s ({len(categories)} categories)\n")
+
+    def llm_chain(question: str) -> list[str]:
+        return CategoryRouter.parse_categories(classify_with_llm(question, categories), categories)
+
+    selectors = {"llm": llm_chain, "router": router.route}
+    latencies = {name: [] for name in selectors}
+    correct = {name: 0 for name in selectors}
+    n_questions = 0
+
+    print(f"{'question':<50} {'expected':<20} {'llm':<20} {'router':<20}")
+    for question, synonym in QUESTIONS:
+        expected = find_category(categories, synonym)
+        if expected is None:
+            continue
+        n_questions += 1
+        selected = {}
+        for name, selector in selectors.items():
+            seconds, result = measure(selector, question)
+            latencies[name].append(seconds)
+            selected[name] = result[0] if result else "-"
+            correct[name] += selected[name] == expected
+        print(f"{question[:50]:<50} {expected:<20} {selected['llm']:<20} {selected['router']:<20}")
+
+    if not n_questions:
+        print("none of the question categories is in the model")
+        return
+    print()
+    for name in selectors:
+        print(f"{name:<8} accuracy {correct[name] / n_questions:>6.0%}   median latency {statistics.median(latencies[name]) * 1000:>8.1f} ms")
+    print(f"router LLM fallbacks: {router.get_stats()['llm_fallbacks']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark of the category table building: row-wise BuiltElementsHandler path vs. the columnar builder.
+
+Run from the repository root:
+    python -m benchmarks.bench_category_table --sizes 10000 100000 1000000
+"""
+from specklepy.objects.base import Base
+from pandas import DataFrame
+import pandas as pd
+
+from benchmarks.synthetic_model import SyntheticModelGenerator
+from modules.speckle.data_handler.base_handler import BaseHandler
+from modules.speckle.data_handler.built_element_handler import BuiltElementsHandler
+
+import argparse
+import time
+
+
+def create_elements(n_elements: int, n_parameters: int, seed: int = 0) -> list[Base]:
+    """ creates synthetic walls with Revit-like parameters (float, int, str and bool values, realistic sparsity)"""
+    generator = SyntheticModelGenerator(n_elements, n_parameters, seed=seed)
+    return generator.create_elements("@Wände", n_elements)
+
+
+def rowwise_dataframe(elements: list[Base]) -> DataFrame:
+    """ the previous implementation: one BuiltElementsHandler and one dict per element"""
+    result_data = []
+    for AS_element in elements:
+        element_handler = BuiltElementsHandler(AS_element)
+        result_data.append(element_handler.get_AS_specific_parameters())
+    return DataFrame.from_dict(result_data)
+
+
+def columnar_dataframe(elements: list[Base]) -> DataFrame:
+    """ the current implementation (without the column sorting)"""
+    handler = BaseHandler.__new__(BaseHandler)
+    return handler._create_dataframe_from_elements(elements, sort=False)
+
+
+def measure(function, elements: list[Base]) -> tuple[float, DataFrame]:
+    start = time.perf_counter()
+    df = function(elements)
+    return time.perf_counter() - start, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--parameters", type=int, default=10)
+    parser.add_argument("--skip-rowwise-above", type=int, default=None,
+                        help="skip the row-wise path for larger categories")
+    args = parser.parse_args()
+
+    print(f"{'elements':>10} {'row-wise rows/s':>16} {'columnar rows/s':>16} {'speedup':>8}")
+    for size in args.sizes:
+        elements = create_elements(size, args.parameters)
+        columnar_time, columnar_df = measure(columnar_dataframe, elements)
+
+        if args.skip_rowwise_above is not None and size > args.skip_rowwise_above:
+            print(f"{size:>10} {'-':>16} {size / columnar_time:>16,.0f} {'-':>8}")
+            continue
+
+        rowwise_time, rowwise_df = measure(rowwise_dataframe, elements)
+        # both paths have to build the same table
+        pd.testing.assert_frame_equal(rowwise_df, columnar_df)
+        print(f"{size:>10} {size / rowwise_time:>16,.0f} {size / columnar_time:>16,.0f} {rowwise_time / columnar_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Time and peak memory of the data path on synthetic Speckle models (no Speckle server needed).
+
+Measured steps:
+    parameters   BaseHandler.get_ASparameters_from_category for all categories (builds the schema index)
+    dataframe    BaseHandler.get_category_dataframe for all categories (without table store)
+    clean_df     BaseHandler._clean_df of the largest category table
+    load_json    SpeckleProject.load_json of the whole model
+    extraction   category extraction like the pandas extraction tool (parsing + tables linked by the element index)
+
+Every step is run with fresh handlers, the setup is not measured. The time is the median of the repetitions,
+the peak memory is measured with tracemalloc in a separate run (tracemalloc slows down the code).
+
+Run from the repository root:
+    python -m benchmarks.bench_data_path --sizes 1000 10000 100000 --parameters 50 --layout both
+    python -m benchmarks.bench_data_path --sizes 1000000 --parameters 20 --steps dataframe extraction --output results.jsonl
+"""
+from typing import Callable, NamedTuple
+
+from benchmarks.synthetic_model import SyntheticModelGenerator
+from modules.llm.category_router import CategoryRouter
+from modules.speckle.data_handler.base_handler import BaseHandler
+from modules.speckle.projects import SpeckleProject
+
+import argparse
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+
+
+class Step(NamedTuple):
+    name: str
+    # returns the function to measure, its setup is not measured
+    prepare: Callable
+
+
+def prepare_parameters(base):
+    handler = BaseHandler(base)
+    return lambda: [handler.get_ASparameters_from_category(category) for category in handler.categories]
+
+
+def prepare_dataframe(base):
+    handler = BaseHandler(base)
+    return lambda: [handler.get_category_dataframe(category) for category in handler.categories]
+
+
+def prepare_clean_df(base):
+    handler = BaseHandler(base)
+    category = max(handler.categories, key=lambda category: len(handler.base[category]))
+    df = handler._create_dataframe_from_elements(handler.base[category], sort=False)
+    return lambda: handler._clean_df(df)
+
+
+def prepare_load_json(base):
+    project = SpeckleProject(name="Synthetic", url="https://app.speckle.systems/projects/synthetic/models/synthetic")
+    project.base_obj = base
+    return project.load_json
+
+
+def prepare_extraction(base):
+    handler = BaseHandler(base)
+    # the output of the category selection, with the typical formatting of the LLM
+    category_str = "['@Wände', 'Türen', '@Fenster']"
+
+    def extract():
+        categories = CategoryRouter.parse_categories(category_str, handler.categories)
+        return [handler.get_linked_dataframe(category) for category in categories]
+    return extract
+
+
+STEPS = [
+    Step("parameters", prepare_parameters),
+    Step("dataframe", prepare_dataframe),
+    Step("clean_df", prepare_clean_df),
+    Step("load_json", prepare_load_json),
+    Step("extraction", prepare_extraction),
+]
+
+
+def measure_time(step: Step, base, repeat: int) -> float:
+    """ median time of the repetitions in seconds"""
+    times = []
+    for _ in range(repeat):
+        function = step.prepare(base)
+        gc.collect()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def measure_peak_memory(step: Step, base) -> float:
+    """ peak memory allocated by the step in MB"""
+    function = step.prepare(base)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                        help="number of elements of the models")
+    parser.add_argument("--parameters", type=int, default=50, help="parameters per category")
+    parser.add_argument("--layout", choices=["old", "new", "both"], default="both")
+    parser.add_argument("--steps", nargs="+", choices=[step.name for step in STEPS], default=None)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="appends the results as JSON lines to this file")
+    args = parser.parse_args()
+
+    layouts = ["old", "new"] if args.layout == "both" else [args.layout]
+    steps = [step for step in STEPS if args.steps is None or step.name in args.steps]
+
+    print(f"{'layout':>6} {'elements':>10} {'step':>12} {'time [s]':>10} {'rows/s':>12} {'peak [MB]':>10}")
+    results = []
+    for size in args.sizes:
+        for layout in layouts:
+            base = SyntheticModelGenerator(size, args.parameters, layout, seed=args.seed).create_model()
+            for step in steps:
+                seconds = measure_time(step, base, args.repeat)
+                peak_mb = measure_peak_memory(step, base)
+                print(f"{layout:>6} {size:>10} {step.name:>12} {seconds:>10.3f} {size / seconds:>12,.0f} {peak_mb:>10.1f}")
+                results.append({"layout": layout, "elements": size, "parameters": args.parameters, "step": step.name,
+                                "seconds": seconds, "peak_mb": peak_mb, "seed": args.seed})
+            del base
+            gc.collect()
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as file:
+            for result in results:
+                file.write(json.dumps(result) + "\n")
+
+
+if __name__ == "__main__":
+    main()
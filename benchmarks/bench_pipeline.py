@@ -0,0 +1,171 @@
+"""
+Latency of the own code per stage of the BIM question answering, deterministic and without network.
+
+The completions of the LLM are replayed from recordings (LLMSettings.LLM_BACKEND), the embeddings are derived
+from the text hash (LLMSettings.EMBEDDING_BACKEND) and the model is served from a recording
+(SpeckleSettings.TRANSPORT). Answer and plan cache are disabled unless --caches is given.
+
+Stages per question:
+    routing      category router (question embedding, ranking, replayed LLM fallback)
+    extraction   category tables linked by the element index
+    prepare      BIM IR tool until the pandas agent is created (warm extraction, schema prompt)
+    agent        pandas agent run, split into the time in the replayed LLM calls and in the tools (sandbox)
+
+Record the completions once (needs OPENAI_API_KEY), then replay them:
+    python -m benchmarks.bench_pipeline --synthetic 10000 --mode record
+    python -m benchmarks.bench_pipeline --synthetic 10000 --repeat 5
+
+A recorded Speckle model can be used instead of a synthetic one (needs SPECKLE_AUTH_TOKEN for the recording):
+    python -m benchmarks.bench_pipeline --url https://app.speckle.systems/projects/xxx/models/xxx --mode record
+"""
+from typing import Any
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from benchmarks.synthetic_model import SyntheticModelGenerator
+from modules.llm.category_router import get_category_router
+from modules.llm.llm_settings import LLMSettings
+from modules.llm.replay import get_replay_store
+from modules.llm.tools.bim_ir_tool import _prepare_answer
+from modules.llm.tools.pandas_extraction_tool import extract_pandas_from_speckle
+from modules.speckle.projects import SpeckleProject
+from modules.speckle.recorded_transport import RecordedTransport, get_recording_path, record_base
+
+import argparse
+import json
+import os
+import statistics
+import time
+
+
+QUESTIONS = [
+    "Wie viele Wände gibt es im Modell?",
+    "Wie groß ist die Fläche aller Wände zusammen?",
+    "Wie viele Türen gibt es auf jeder Ebene?",
+    "Welche Familie haben die meisten Fenster?",
+    "Wie viele Räume haben eine Fläche von mehr als 20 m²?",
+]
+
+STAGES = ["routing", "extraction", "prepare", "agent", "agent_llm", "agent_tools"]
+
+
+class AgentTimer(BaseCallbackHandler):
+
+    """ sums the time of the LLM calls and the tool calls of an agent run"""
+
+    def __init__(self) -> None:
+        self.llm_seconds = 0.0
+        self.tool_seconds = 0.0
+        self._starts = {}
+
+    def on_llm_start(self, serialized: dict, prompts: list, *, run_id, **kwargs: Any) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def on_chat_model_start(self, serialized: dict, messages: list, *, run_id, **kwargs: Any) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs: Any) -> None:
+        self.llm_seconds += time.perf_counter() - self._starts.pop(run_id, time.perf_counter())
+
+    def on_tool_start(self, serialized: dict, input_str: str, *, run_id, **kwargs: Any) -> None:
+        self._starts[run_id] = time.perf_counter()
+
+    def on_tool_end(self, output: Any, *, run_id, **kwargs: Any) -> None:
+        self.tool_seconds += time.perf_counter() - self._starts.pop(run_id, time.perf_counter())
+
+    def on_tool_error(self, error: BaseException, *, run_id, **kwargs: Any) -> None:
+        self.on_tool_end(None, run_id=run_id)
+
+
+def get_synthetic_url(n_elements: int, n_parameters: int, layout: str, seed: int) -> str:
+    """ url of a synthetic model, old layouts get an url of the old Speckle server"""
+    name = f"synthetic-{n_elements}-{n_parameters}-{seed}"
+    if layout == "old":
+        return f"https://speckle.xyz/streams/{name}/commits/{name}"
+    return f"https://app.speckle.systems/projects/{name}/models/{name}"
+
+
+def run_question(project: SpeckleProject, question: str) -> dict:
+    """ runs the stages for one question, returns the seconds per stage"""
+    timings = {}
+
+    start = time.perf_counter()
+    categories = get_category_router(project.get_basehandler()).route(question)
+    timings["routing"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    extract_pandas_from_speckle(", ".join(categories), project)
+    timings["extraction"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    cached_result, agent_executor, _ = _prepare_answer(question, project)
+    timings["prepare"] = time.perf_counter() - start
+    if cached_result is not None:
+        timings.update(agent=0.0, agent_llm=0.0, agent_tools=0.0)
+        return timings
+
+    timer = AgentTimer()
+    start = time.perf_counter()
+    agent_executor.invoke({"input": question}, config={"callbacks": [timer]})
+    timings["agent"] = time.perf_counter() - start
+    timings["agent_llm"] = timer.llm_seconds
+    timings["agent_tools"] = timer.tool_seconds
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--synthetic", type=int, help="number of elements of a synthetic model")
+    source.add_argument("--url", help="url of a Speckle model (recorded in record mode)")
+    parser.add_argument("--parameters", type=int, default=30, help="parameters per category of the synthetic model")
+    parser.add_argument("--layout", choices=["old", "new"], default="new")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mode", choices=["record", "replay"], default="replay")
+    parser.add_argument("--embeddings", choices=["fake", "openai"], default="fake")
+    parser.add_argument("--caches", action="store_true", help="keep the answer and plan cache enabled")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per question")
+    parser.add_argument("--output", default=None, help="appends the results as JSON lines to this file")
+    args = parser.parse_args()
+
+    LLMSettings.LLM_BACKEND = args.mode
+    LLMSettings.EMBEDDING_BACKEND = args.embeddings
+    if not args.caches:
+        LLMSettings.ANSWER_CACHE_ENABLED = False
+        LLMSettings.PLAN_CACHE_ENABLED = False
+
+    if args.synthetic is not None:
+        url = get_synthetic_url(args.synthetic, args.parameters, args.layout, args.seed)
+        transport = RecordedTransport(get_recording_path(url))
+        if not os.path.exists(os.path.join(transport.path, transport.VERSION_FILE)):
+            start = time.perf_counter()
+            base = SyntheticModelGenerator(args.synthetic, args.parameters, args.layout, seed=args.seed).create_model()
+            record_base(url, base)
+            print(f"synthetic model recorded in {time.perf_counter() - start:.1f}s")
+        project = SpeckleProject(name="Synthetic", url=url, transport="replay")
+    else:
+        project = SpeckleProject(name="Benchmark", url=args.url, transport="record" if args.mode == "record" else "replay")
+
+    start = time.perf_counter()
+    basehandler = project.get_basehandler()
+    print(f"model loaded in {time.perf_counter() - start:.2f}s ({len(basehandler.categories)} categories)\n")
+
+    print(f"{'question':<50}" + "".join(f" {stage:>12}" for stage in STAGES))
+    results = []
+    for question in QUESTIONS:
+        runs = [run_question(project, question) for _ in range(args.repeat)]
+        medians = {stage: statistics.median(run[stage] for run in runs) for stage in STAGES}
+        print(f"{question[:50]:<50}" + "".join(f" {medians[stage]:>12.3f}" for stage in STAGES))
+        results.append({"question": question, "url": project.url, "mode": args.mode, **medians})
+
+    print(f"{'median':<50}" + "".join(f" {statistics.median(result[stage] for result in results):>12.3f}" for stage in STAGES))
+    print(f"\nreplayed completions: {get_replay_store(LLMSettings.REPLAY_PATH).get_stats()}")
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as file:
+            for result in results:
+                file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Latency of the BIM question answering: pandas dataframe agent vs. SQL agent (DuckDB query engine).
+
+Both agents get the same questions over the same category tables, the category extraction is skipped.
+The question set is fixed, the category placeholders are filled with the largest categories of the model.
+
+Run from the repository root (needs OPENAI_API_KEY and SPECKLE_AUTH_TOKEN):
+    python -m benchmarks.bench_sql_vs_pandas_agent --url https://app.speckle.systems/projects/xxx/models/xxx
+"""
+from langchain.agents import AgentExecutor, create_tool_calling_agent
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_experimental.agents import create_pandas_dataframe_agent
+from langchain_openai import ChatOpenAI
+
+from modules.llm.tools.sql_tool import create_sql_tools
+from modules.speckle.projects import SpeckleProject
+
+import argparse
+import statistics
+import time
+
+
+# {a} and {b} are replaced with the largest and second largest category
+QUESTIONS = [
+    "How many elements are in the category {a}?",
+    "Which parameters of the category {a} are filled for every element?",
+    "What are the five most common values of the first parameter of the category {a}?",
+    "How many elements do the categories {a} and {b} have together?",
+    "Which category has more elements, {a} or {b}?",
+]
+
+SQL_SYSTEM_PROMPT = """You answer questions about a BIM model. The data of the model is stored in SQL tables, one table per category.
+Use the BIM_Schema_Tool to get the tables and columns, then answer the question with the BIM_SQL_Tool."""
+
+
+def create_pandas_agent(llm, dfs) -> AgentExecutor:
+    return create_pandas_dataframe_agent(llm, dfs, agent_type="openai-tools")
+
+
+def create_sql_agent(llm, project: SpeckleProject) -> AgentExecutor:
+    tools = create_sql_tools(project.get_query_engine)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", SQL_SYSTEM_PROMPT),
+        ("human", "{input}"),
+        MessagesPlaceholder("agent_scratchpad"),
+    ])
+    agent = create_tool_calling_agent(llm, tools, prompt)
+    return AgentExecutor(agent=agent, tools=tools)
+
+
+def measure(agent: AgentExecutor, question: str) -> tuple[float, str]:
+    start = time.perf_counter()
+    try:
+        answer = agent.invoke({"input": question})["output"]
+    except Exception as e:
+        answer = f"Error: {e}"
+    return time.perf_counter() - start, answer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", required=True, help="url of the Speckle model")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per question and agent")
+    args = parser.parse_args()
+
+    project = SpeckleProject(url=args.url)
+    basehandler = project.get_basehandler()
+    categories = sorted(basehandler.categories, key=lambda category: len(basehandler.base[category]), reverse=True)
+    a, b = categories[0], categories[1 if len(categories) > 1 else 0]
+    dfs = [basehandler.get_category_dataframe(a), basehandler.get_category_dataframe(b)]
+
+    # the engine is built before the measurement, like the shared engine of the app
+    start = time.perf_counter()
+    project.get_query_engine()
+    print(f"query engine set up in {time.perf_counter() - start:.2f}s ({len(basehandler.categories)} categories)\n")
+
+    llm = ChatOpenAI(model=args.model, temperature=0)
+    agents = {"pandas": create_pandas_agent(llm, dfs), "sql": create_sql_agent(llm, project)}
+    latencies = {name: [] for name in agents}
+
+    print(f"{'question':<60} {'pandas s':>9} {'sql s':>9}")
+    for template in QUESTIONS:
+        question = template.format(a=a, b=b)
+        row = {}
+        for name, agent in agents.items():
+            times = [measure(agent, question)[0] for _ in range(args.repeat)]
+            latencies[name].extend(times)
+            row[name] = statistics.median(times)
+        print(f"{question[:60]:<60} {row['pandas']:>9.2f} {row['sql']:>9.2f}")
+
+    print(f"{'median':<60} {statistics.median(latencies['pandas']):>9.2f} {statistics.median(latencies['sql']):>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Import time of the Streamlit pages (cold start of the server and first load of a page).
+
+The module level imports of every page are run in a fresh interpreter with `python -X importtime`, the time of the
+interpreter startup itself is subtracted. Reported per page: the median import time, the heaviest top level imports
+and the heavy packages which were loaded (the data view should not load the LLM stack).
+
+Every page has a budget (PAGE_BUDGETS, milliseconds), the script exits with code 1 if a page is over its budget.
+The budgets are set for a warm disk cache, --budget-scale adapts them to slower machines.
+
+Run from the repository root:
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 7 --top 15 --output startup.jsonl
+"""
+from typing import Dict, List, NamedTuple
+
+import argparse
+import ast
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# page script -> budget of its imports in milliseconds
+PAGE_BUDGETS = {
+    "1_Speckle Data View.py": 1500,
+    "pages/2_PandasAI Prototype.py": 3500,
+    "pages/3_Agent Chat.py": 4500,
+    "pages/4_BIM IR Tool Chat.py": 4500,
+}
+
+# packages which should only be loaded by the pages which need them
+HEAVY_PACKAGES = ["langchain", "langchain_core", "langchain_experimental", "langchain_community", "pandasai",
+                  "openai", "faiss", "fitz", "duckdb", "tiktoken"]
+
+
+class ImportTiming(NamedTuple):
+    name: str
+    # depth in the import tree, 0 for the imports of the page itself
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def get_page_imports(path: str) -> str:
+    """ the module level import statements of a page script as code"""
+    with open(path, "r", encoding="utf-8") as file:
+        source = file.read()
+    tree = ast.parse(source)
+    statements = [ast.get_source_segment(source, node) for node in tree.body
+                  if isinstance(node, (ast.Import, ast.ImportFrom))]
+    return "\n".join(statements) if statements else "pass"
+
+
+def run_importtime(code: str) -> List[ImportTiming]:
+    """ runs the code in a fresh interpreter, returns the timings of all imported modules"""
+    env = {**os.environ, "PYTHONPATH": ROOT}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"imports failed:\n{result.stderr[-2000:]}")
+
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        stripped = name.lstrip(" ")
+        # the tree depth is encoded by two spaces per level after the separator
+        depth = (len(name) - len(stripped) - 1) // 2
+        timings.append(ImportTiming(stripped, depth, int(self_us), int(cumulative_us)))
+    return timings
+
+
+def measure_page(path: str, baseline: set, repeat: int) -> Dict:
+    """ median import time of the page (without the modules of the interpreter startup)"""
+    code = get_page_imports(os.path.join(ROOT, path))
+    runs = [[timing for timing in run_importtime(code) if timing.name not in baseline] for _ in range(repeat)]
+    totals = [sum(timing.self_us for timing in run) / 1000 for run in runs]
+
+    # the heaviest imports of the median run
+    median_run = sorted(zip(totals, runs), key=lambda item: item[0])[len(runs) // 2][1]
+    top_level = min(timing.depth for timing in median_run) if median_run else 0
+    heaviest = sorted((timing for timing in median_run if timing.depth == top_level),
+                      key=lambda timing: timing.cumulative_us, reverse=True)
+    loaded = {timing.name for timing in median_run}
+    return {
+        "page": path,
+        "milliseconds": statistics.median(totals),
+        "modules": len(median_run),
+        "heaviest": [(timing.name, timing.cumulative_us / 1000) for timing in heaviest],
+        "heavy_packages": [package for package in HEAVY_PACKAGES if package in loaded],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", nargs="+", choices=list(PAGE_BUDGETS), default=list(PAGE_BUDGETS))
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per page")
+    parser.add_argument("--top", type=int, default=10, help="heaviest imports shown per page")
+    parser.add_argument("--budget-scale", type=float, default=1.0, help="factor for the budgets of PAGE_BUDGETS")
+    parser.add_argument("--output", default=None, help="appends the results as JSON lines to this file")
+    args = parser.parse_args()
+
+    # the modules of the interpreter startup are not counted
+    baseline = {timing.name for timing in run_importtime("pass")}
+
+    results = []
+    over_budget = []
+    for path in args.pages:
+        result = measure_page(path, baseline, args.repeat)
+        budget = PAGE_BUDGETS[path] * args.budget_scale
+        result["budget_milliseconds"] = budget
+        results.append(result)
+        if result["milliseconds"] > budget:
+            over_budget.append(path)
+
+        status = "OK" if result["milliseconds"] <= budget else "OVER BUDGET"
+        print(f"{path}: {result['milliseconds']:.0f} ms of {budget:.0f} ms ({result['modules']} modules) {status}")
+        print(f"    heavy packages: {', '.join(result['heavy_packages']) or '-'}")
+        for name, milliseconds in result["heaviest"][:args.top]:
+            print(f"    {milliseconds:>9.1f} ms  {name}")
+        print()
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as file:
+            for result in results:
+                file.write(json.dumps(result, ensure_ascii=False) + "\n")
+
+    if over_budget:
+        print(f"over budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Synthetic Speckle models for the benchmarks, no Speckle server or Revit model needed.
+
+The generated Base trees have the layouts the BaseHandler understands:
+    old: the categories are members of the root, next to @Projektinformationen, @Raster and @Materialien
+    new: the categories are members of root["@Types"], the project information is root["@Project Information"]
+
+Every element carries Revit-like parameters (name, internal key, value, units) with realistic sparsity:
+a few core parameters (family, type, level, mark, dimensions) are set on almost every element, the other
+parameters are shared between categories and filled from 1% to 100%. Doors and windows reference their host
+wall with HOST_ID_PARAM. Values are drawn from pools generated with Faker, so generation is fast and
+the models are repeatable for a seed.
+
+Usage:
+    from benchmarks.synthetic_model import SyntheticModelGenerator
+    base = SyntheticModelGenerator(n_elements=100_000, n_parameters=50, layout="new").create_model()
+"""
+from specklepy.objects.base import Base
+from faker import Faker
+
+import random
+
+
+class SyntheticElement(Base, speckle_type="Objects.BuiltElements.Revit.SyntheticElement"):
+    pass
+
+
+# category, share of the elements, host category
+CATEGORIES = [
+    ("@Wände", 0.22, None),
+    ("@Türen", 0.08, "@Wände"),
+    ("@Fenster", 0.10, "@Wände"),
+    ("@Geschossdecken", 0.04, None),
+    ("@Dächer", 0.01, None),
+    ("@Räume", 0.08, None),
+    ("@Stützen", 0.06, None),
+    ("@Tragwerk", 0.07, None),
+    ("@Treppen", 0.01, None),
+    ("@Geländer", 0.03, None),
+    ("@Möbel", 0.20, None),
+    ("@Sanitärinstallationen", 0.10, None),
+]
+
+# name, internal key, kind, units, fill rate of the parameters every category has
+CORE_PARAMETERS = [
+    ("Familie", "ELEM_FAMILY_PARAM", "family", None, 1.0),
+    ("Typ", "ELEM_TYPE_PARAM", "type", None, 1.0),
+    ("Ebene", "FAMILY_LEVEL_PARAM", "level", None, 0.98),
+    ("Kennzeichen", "ALL_MODEL_MARK", "mark", None, 0.6),
+    ("Kommentare", "ALL_MODEL_INSTANCE_COMMENTS", "text", None, 0.1),
+    ("Fläche", "HOST_AREA_COMPUTED", "float", "m²", 0.9),
+    ("Volumen", "HOST_VOLUME_COMPUTED", "float", "m³", 0.85),
+    ("Länge", "CURVE_ELEM_LENGTH", "float", "m", 0.7),
+    ("Höhe", "INSTANCE_HEIGHT_PARAM", "float", "m", 0.7),
+    ("Breite", "INSTANCE_WIDTH_PARAM", "float", "m", 0.6),
+]
+
+# share of the value kinds of the other parameters
+PARAMETER_KINDS = [("float", 0.4), ("int", 0.15), ("text", 0.35), ("bool", 0.1)]
+
+# distinct values per text parameter
+TEXT_POOL_SIZE = 200
+
+
+class SyntheticModelGenerator:
+
+    """
+    Generates synthetic Speckle models of a given size.
+
+    Variables:
+    n_elements (int): number of elements over all categories
+    n_parameters (int): number of parameters per category (core parameters included)
+    layout (str): "old" (categories at the root) or "new" (categories in @Types)
+    n_levels (int): number of levels of the building
+    seed (int): seed of the random values
+    """
+
+    def __init__(self, n_elements: int = 10_000, n_parameters: int = 50, layout: str = "new",
+                 n_levels: int = 6, seed: int = 0) -> None:
+        assert layout in ["old", "new"], f"Invalid layout: {layout}"
+        assert n_parameters >= len(CORE_PARAMETERS), f"At least {len(CORE_PARAMETERS)} parameters are needed"
+        self.n_elements = n_elements
+        self.n_parameters = n_parameters
+        self.layout = layout
+        self.n_levels = n_levels
+        self.seed = seed
+
+        self.rng = random.Random(seed)
+        self.faker = Faker("de_DE")
+        self.faker.seed_instance(seed)
+
+        self.levels = [f"Ebene {i}" for i in range(n_levels)]
+        # parameters shared between the categories, each category uses a part of them
+        self.shared_parameters = [self._create_parameter(i) for i in range(int((n_parameters - len(CORE_PARAMETERS)) * 1.5))]
+        self._text_pools = {}
+        self._counter = 0
+
+    def create_model(self) -> Base:
+        """ returns the root object of the model with all categories"""
+        categories = {}
+        for category, share, host_category in CATEGORIES:
+            n = max(1, round(self.n_elements * share))
+            hosts = categories.get(host_category, []) if host_category else []
+            categories[category] = self.create_elements(category, n, hosts)
+
+        root = Base()
+        if self.layout == "old":
+            root["@Projektinformationen"] = [self.create_project_information()]
+            root["@Raster"] = [Base(name=f"Raster {axis}") for axis in "ABCD1234"]
+            root["@Materialien"] = [Base(name=self.faker.word().capitalize()) for _ in range(20)]
+            for category, elements in categories.items():
+                root[category] = elements
+        else:
+            root["@Project Information"] = [self.create_project_information()]
+            types = Base()
+            for category, elements in categories.items():
+                types[category] = elements
+            root["@Types"] = types
+        return root
+
+    def create_elements(self, category: str, n_elements: int, hosts: list[Base] = None) -> list[Base]:
+        """ returns the elements of a category, hosted elements reference a random host element"""
+        parameters = self._get_category_parameters(category)
+        families = [f"{category.lstrip('@')} {self.faker.word().capitalize()}" for _ in range(max(1, n_elements // 500 + 3))]
+        rng = self.rng
+
+        elements = []
+        for _ in range(n_elements):
+            self._counter += 1
+            element = SyntheticElement()
+            element.id = f"{rng.getrandbits(128):032x}"
+            element.applicationId = f"{rng.getrandbits(128):032x}-{self._counter:08x}"
+            element["elementId"] = str(100_000 + self._counter)
+            element["category"] = category.lstrip("@")
+
+            family = rng.choice(families)
+            element_parameters = Base()
+            for name, key, kind, units, fill_rate in parameters:
+                if rng.random() > fill_rate:
+                    continue
+                value = self._create_value(name, kind, family)
+                element_parameters[key] = Base(name=name, value=value, units=units, applicationInternalName=key)
+            if hosts:
+                host = rng.choice(hosts)
+                element_parameters["HOST_ID_PARAM"] = Base(name="Bauteil-ID des Basisbauteils", value=host["elementId"],
+                                                           units=None, applicationInternalName="HOST_ID_PARAM")
+            element["parameters"] = element_parameters
+            elements.append(element)
+        return elements
+
+    def create_project_information(self) -> Base:
+        """ returns the project information like Revit exports it"""
+        info = Base()
+        info["Author"] = self.faker.name()
+        info["Name"] = f"Projekt {self.faker.city()}"
+        info["Address"] = self.faker.address().replace("\n", ", ")
+        info["Organization Name"] = self.faker.company()
+        info["Latitude"] = float(self.faker.latitude())
+        info["Longitude"] = float(self.faker.longitude())
+        info["Status"] = "Entwurf"
+        return info
+
+    def _get_category_parameters(self, category: str) -> list[tuple]:
+        """ the core parameters and a random part of the shared parameters (repeatable per category)"""
+        rng = random.Random(f"{self.seed}:{category}")
+        n_shared = self.n_parameters - len(CORE_PARAMETERS)
+        return CORE_PARAMETERS + rng.sample(self.shared_parameters, n_shared)
+
+    def _create_parameter(self, i: int) -> tuple:
+        """ returns name, internal key, kind, units and fill rate of a shared parameter"""
+        kind = self.rng.choices([kind for kind, _ in PARAMETER_KINDS], [share for _, share in PARAMETER_KINDS])[0]
+        units = self.rng.choice(["m", "m²", "m³", "kN", None]) if kind == "float" else None
+        # most parameters are either (almost) always set or rarely set
+        group = self.rng.random()
+        if group < 0.3:
+            fill_rate = self.rng.uniform(0.9, 1.0)
+        elif group < 0.7:
+            fill_rate = self.rng.uniform(0.2, 0.8)
+        else:
+            fill_rate = self.rng.uniform(0.01, 0.1)
+        name = f"{self.faker.word().capitalize()} {i}"
+        # shared parameters have a GUID as internal key
+        return name, self.faker.uuid4(), kind, units, fill_rate
+
+    def _create_value(self, name: str, kind: str, family: str):
+        rng = self.rng
+        if kind == "float":
+            return round(rng.lognormvariate(0, 1), 3)
+        if kind == "int":
+            return rng.randint(0, 100)
+        if kind == "bool":
+            return rng.random() < 0.5
+        if kind == "family":
+            return family
+        if kind == "type":
+            return f"{family} {rng.choice([60, 80, 100, 120, 240])}"
+        if kind == "level":
+            return rng.choice(self.levels)
+        if kind == "mark":
+            return f"{name[0]}-{rng.randint(1, 999):03d}"
+        # text parameters have a limited number of distinct values (and empty strings)
+        if name not in self._text_pools:
+            self._text_pools[name] = [""] + [self.faker.sentence(nb_words=3).rstrip(".") for _ in range(TEXT_POOL_SIZE)]
+        return rng.choice(self._text_pools[name])
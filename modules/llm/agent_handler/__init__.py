@@ -1,2 +1,21 @@
-from .langchain_agent import Langchain_Agent_Handler
-from .pandasai_agent import Pandasai_Agent_Handler
\ No newline at end of file
+from importlib import import_module
+
+# the handlers are imported on first access, the PandasAI page does not load the LangChain agent and its tools
+_HANDLERS = {
+    "Langchain_Agent_Handler": ".langchain_agent",
+    "Pandasai_Agent_Handler": ".pandasai_agent",
+}
+
+__all__ = list(_HANDLERS)
+
+
+def __getattr__(name: str):
+    if name not in _HANDLERS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_HANDLERS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
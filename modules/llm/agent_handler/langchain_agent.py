@@ -1,41 +1,108 @@
 from typing import Callable, Any
 
 from modules.llm.llm_settings import LLMSettings
-from modules.llm.tools import information_tool, bim_ir_tool, rag_tool
+from modules.llm.prompt_library import PromptLibrary
+from modules.llm.tools.bim_ir_tool import bim_ir_tool
+from modules.llm.tools.information_tool import information_tool
+from modules.llm.tools.RAG_Tool import rag_tool
+from modules.llm.tools.sql_tool import bim_sql_tool, bim_schema_tool
+from modules.llm.tools.async_tools import run_on_agent_loop
+from modules.tracing import traced
 
 from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain import hub
+from langchain_core.agents import AgentAction, AgentStep
 
 from abc import ABC
+from collections import OrderedDict
 import ast
+import asyncio
+import threading
+
+
+class TimedAgentExecutor(AgentExecutor):
+
+    """ agent executor with a timeout per tool call
+
+    in async mode (ainvoke), the tool calls of one agent step run concurrently; a call which exceeds its timeout
+    is cancelled and the agent gets an error observation, so a slow tool does not stall the answer"""
+
+    # tool name -> seconds
+    tool_timeouts: dict = {}
+    default_tool_timeout: float = LLMSettings.TOOL_TIMEOUT_DEFAULT
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action: AgentAction,
+                                     run_manager=None) -> AgentStep:
+        timeout = self.tool_timeouts.get(agent_action.tool, self.default_tool_timeout)
+        try:
+            return await asyncio.wait_for(
+                super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager), timeout)
+        except asyncio.TimeoutError:
+            observation = f"Error: {agent_action.tool} did not answer within {timeout:.0f} seconds, answer without it"
+            if run_manager:
+                await run_manager.on_text(observation, verbose=self.verbose)
+            return AgentStep(action=agent_action, observation=observation)
 
 
 class Langchain_Agent_Handler(ABC):
     """ class to handle and specify the behavior of the Langchain Agent"""
 
+    # hub prompt of the central agent
+    AGENT_PROMPT = "janix/central_agent_ma"
+
+    # (model, temperature, prompt version, tool names) -> agent executor, least recently used first
+    _agent_executors = OrderedDict()
+    _agent_lock = threading.Lock()
+
     @staticmethod
     def setup_agent(settings: LLMSettings) -> AgentExecutor:
-        """ set up the LangChain Agent"""
+        """ set up the LangChain Agent
+
+        the agent executor holds no conversation state, so it is shared by all sessions and reruns
+        with the same model, temperature, prompt version and tools
+        all tools have asynchronous implementations, see Langchain_Agent_Handler.invoke"""
 
-        # Get the correct LLM model
-        llm = settings.get_correct_langchain_llm()
+        # Get the prompt (local copy, pulled again after LLMSettings.PROMPT_REFRESH_SECONDS)
+        prompt, prompt_version = PromptLibrary.get_versioned_prompt(Langchain_Agent_Handler.AGENT_PROMPT)
 
-        # Get the prompt
-        # prompt = hub.pull("hwchase17/openai-functions-agent")
-        prompt = hub.pull("janix/central_agent_ma")
+        tools = [bim_ir_tool, bim_sql_tool, bim_schema_tool, rag_tool, information_tool]
 
-        tools = [bim_ir_tool, rag_tool, information_tool]
+        key = (settings.model, settings.temperature, prompt_version, tuple(tool.name for tool in tools))
+        with Langchain_Agent_Handler._agent_lock:
+            cache = Langchain_Agent_Handler._agent_executors
+            if key in cache:
+                cache.move_to_end(key)
+                return cache[key]
 
-        # Set up the agent
-        agent = create_tool_calling_agent(llm, tools, prompt)
+            # Get the correct LLM model
+            llm = settings.get_correct_langchain_llm()
 
-        # Create an agent executor by passing in the agent and tools
-        agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True,
-                                       return_intermediate_steps=True
-                                       )
+            # Set up the agent
+            agent = create_tool_calling_agent(llm, tools, prompt)
 
+            # Create an agent executor by passing in the agent and tools
+            # with ainvoke, the tool calls of a step run concurrently (with a timeout per tool)
+            agent_executor = TimedAgentExecutor(agent=agent, tools=tools, verbose=True,
+                                                return_intermediate_steps=True,
+                                                tool_timeouts=LLMSettings.TOOL_TIMEOUTS
+                                                )
+
+            cache[key] = agent_executor
+            while len(cache) > LLMSettings.AGENT_CACHE_SIZE:
+                cache.popitem(last=False)
         return agent_executor
 
+    @staticmethod
+    @traced("agent.invoke", kind="agent")
+    def invoke(agent: AgentExecutor, inputs: dict, callbacks: list = None) -> dict[str, Any]:
+        """ runs the agent, in async mode (LLMSettings.ASYNC_TOOLS) the tool calls of a step run concurrently
+
+        called from the Streamlit script thread, the run is executed on the long-lived agent event loop
+        (the cached agent keeps its async LLM client, which is bound to one loop)"""
+        config = {"callbacks": callbacks or []}
+        if LLMSettings.ASYNC_TOOLS:
+            return run_on_agent_loop(agent.ainvoke(inputs, config=config))
+        return agent.invoke(inputs, config=config)
+
     @staticmethod
     def setup_tool_tester(settings: LLMSettings) -> AgentExecutor:
         """ set up the LangChain Agent for the tool tester"""
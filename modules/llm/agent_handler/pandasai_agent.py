@@ -19,7 +19,8 @@ class Pandasai_Agent_Handler(ABC):
         llm = settings.get_correct_pandasai_llm()
 
         # setup the agent (with according configurations)
-        agent = Agent([df], memory_size=10, config={
+        # the generated code runs in-process on the data of the agent, so it gets its own copy of the shared table
+        agent = Agent([df.copy()], memory_size=10, config={
             "llm": llm, 
             "verbose": False, 
             "conversational": True, 
@@ -28,6 +29,26 @@ class Pandasai_Agent_Handler(ABC):
             })
         
         return agent
+
+    @staticmethod
+    def get_cached_agent(df: DataFrame, settings: LLMSettings, agent_cache: dict, data_key: tuple) -> Agent:
+        """ returns the agent for the data and settings from the cache, sets it up on first request
+
+        the agent keeps the conversation, so the cache has to belong to one user session (e.g. a session state dict)
+
+        Args:
+            df (DataFrame): the data of the agent
+            settings (LLMSettings): the LLM settings
+            agent_cache (dict): the cache of the session
+            data_key (tuple): identifies the data, e.g. (version id, category)
+        """
+        key = (settings.model, settings.temperature, data_key)
+        if key not in agent_cache:
+            agent_cache[key] = Pandasai_Agent_Handler.setup_agent(df, settings)
+            # drop the oldest agents
+            for old_key in list(agent_cache)[:-LLMSettings.AGENT_CACHE_SIZE]:
+                del agent_cache[old_key]
+        return agent_cache[key]
     
     @staticmethod
     def return_verbose(agent: Agent):
@@ -36,9 +57,10 @@ class Pandasai_Agent_Handler(ABC):
         return last_logs
     
     @staticmethod
-    def load_code(agent: Agent):
+    def load_code(agent: Agent, since: int = 0):
         """
         Extract the code that the PandasAI Agent has executed
+        with since, only the log entries from this index on are considered (e.g. the ones of the last chat)
         """
         # get the code from the agent
         logs = Pandasai_Agent_Handler.return_verbose(agent)
@@ -47,7 +69,7 @@ class Pandasai_Agent_Handler(ABC):
         # iterate over the logs and extract the wanted output
         code = "No steps executed"
         print(logs)
-        for log in logs:
+        for log in logs[since:]:
             if log["source"]=="CodeManager" or log["source"]=="CodeCleaning":
                 if "```" in log["msg"]:
                     code = log["msg"].split('```')[1]
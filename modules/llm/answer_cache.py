@@ -0,0 +1,250 @@
+from typing import Any, Optional
+
+from langchain_core.embeddings import Embeddings
+import numpy as np
+
+from modules.llm.category_router import CATEGORY_SYNONYMS
+from modules.llm.embedding_cache import get_cached_embeddings
+from modules.llm.llm_settings import LLMSettings
+from modules.llm.plan_cache import PlanCache
+
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+
+
+class CachedAnswer:
+
+    """
+    An answer of the cache.
+
+    Variables:
+    question (str): the question the answer was generated for
+    answer (Any): the answer (text, number or DataFrame)
+    code (str): the generated code, None if not known
+    steps (list): the intermediate steps (tool, input, observation) as plain dicts
+    similarity (float): similarity of the asked question to the cached question (1.0 for the same question)
+    """
+
+    def __init__(self, question: str, answer: Any, code: Optional[str], steps: list, similarity: float) -> None:
+        self.question = question
+        self.answer = answer
+        self.code = code
+        self.steps = steps
+        self.similarity = similarity
+
+
+class SemanticAnswerCache:
+
+    """
+    Answers of questions about a model version, found again for the same or a similar question.
+
+    Entries are keyed by the version id of the model and a scope (the answering pipeline, e.g. "bim_ir" or
+    "pandasai:@Türen"), so an answer never outlives its version: a new version has no entries and the entries
+    of old versions are evicted as least recently used. The normalized question is matched first, then the
+    embedded question is compared with the cached questions of the version (cosine similarity >= threshold).
+    A similar question only matches if it has the same key tokens (numbers, levels and categories, see
+    get_key_tokens): "Wie viele Türen im 1. OG" and "Wie viele Türen im 2. OG" are close, but have different answers.
+    """
+
+    # words of levels ("EG", "1. OG", "Erdgeschoss", "level 2")
+    LEVEL_PATTERN = re.compile(r"\b(?:eg|og|ug|dg|kg|\w*geschoss|keller|level|ebene|etage|stockwerk|storey|floor|basement)\b")
+
+    def __init__(self, path: str = None, threshold: float = None, max_entries: int = None,
+                 embeddings: Embeddings = None) -> None:
+        self.path = path if path else LLMSettings.ANSWER_CACHE_PATH
+        self.threshold = threshold if threshold else LLMSettings.ANSWER_CACHE_THRESHOLD
+        self.max_entries = max_entries if max_entries else LLMSettings.ANSWER_CACHE_MAX_ENTRIES
+        self._embeddings = embeddings
+        self._lock = threading.RLock()
+        # (version id, scope) -> (entry ids, normalized questions, normalized vectors)
+        self._indexes = {}
+
+        # counters
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._initialise()
+
+    def _initialise(self) -> None:
+        """ creates the database file and the table"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS answers(
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                version_id TEXT NOT NULL,
+                scope TEXT NOT NULL,
+                question TEXT NOT NULL,
+                normalized TEXT NOT NULL,
+                vector BLOB,
+                answer BLOB NOT NULL,
+                code TEXT,
+                steps BLOB,
+                last_access REAL NOT NULL)"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_key ON answers(version_id, scope)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_access ON answers(last_access)")
+        self._conn.commit()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        # created on first semantic lookup
+        if self._embeddings is None:
+            self._embeddings = get_cached_embeddings()
+        return self._embeddings
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """ lower case, single spaces, without surrounding punctuation"""
+        question = re.sub(r"\s+", " ", question.strip().lower())
+        return question.strip(" ?!.")
+
+    @classmethod
+    def get_key_tokens(cls, normalized: str) -> frozenset:
+        """ the numbers, level words and categories (synonym groups) of a normalized question"""
+        tokens = {number.replace(",", ".") for number in re.findall(r"\d+(?:[.,]\d+)?", normalized)}
+        tokens.update(cls.LEVEL_PATTERN.findall(normalized))
+        words = re.findall(r"\w+", normalized)
+        for index, group in enumerate(CATEGORY_SYNONYMS):
+            for synonym in (synonym.lower() for synonym in group):
+                # german compounds end with the base word ("Innentüren", "Tragwerksstützen")
+                if (f" {synonym} " in f" {normalized} " if " " in synonym
+                        else any(word == synonym or (len(synonym) > 3 and word.endswith(synonym)) for word in words)):
+                    tokens.add(f"category:{index}")
+                    break
+        return frozenset(tokens)
+
+    def _embed(self, question: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, version_id: str, scope: str, question: str) -> Optional[CachedAnswer]:
+        """ returns the cached answer of the same or a similar question for the version, None if there is none"""
+        if version_id is None:
+            return None
+        normalized = self.normalize_question(question)
+        with self._lock:
+            ids, questions, vectors = self._get_index(version_id, scope)
+        if not ids:
+            self.misses += 1
+            return None
+
+        similarity = 1.0
+        if normalized in questions:
+            entry_id = ids[questions.index(normalized)]
+        else:
+            similarities = vectors @ self._embed(normalized)
+            key_tokens = self.get_key_tokens(normalized)
+            # the most similar question above the threshold with the same numbers, levels and categories
+            candidates = [index for index in np.argsort(-similarities) if similarities[index] >= self.threshold
+                          and self.get_key_tokens(questions[index]) == key_tokens]
+            if not candidates:
+                self.misses += 1
+                return None
+            best = int(candidates[0])
+            similarity = float(similarities[best])
+            entry_id = ids[best]
+            self.semantic_hits += 1
+
+        with self._lock:
+            row = self._conn.execute("SELECT question, answer, code, steps FROM answers WHERE id = ?", (entry_id,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE answers SET last_access = ? WHERE id = ?", (time.time(), entry_id))
+            self._conn.commit()
+        self.hits += 1
+        return CachedAnswer(row[0], pickle.loads(row[1]), row[2], pickle.loads(row[3]) if row[3] else [], similarity)
+
+    def store(self, version_id: str, scope: str, question: str, answer: Any, code: str = None, steps: list = None) -> None:
+        """ stores the answer of the question for the version, the least recently used answers are evicted"""
+        if version_id is None:
+            return
+        normalized = self.normalize_question(question)
+        vector = self._embed(normalized)
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE version_id = ? AND scope = ? AND normalized = ?",
+                               (version_id, scope, normalized))
+            self._conn.execute(
+                "INSERT INTO answers (version_id, scope, question, normalized, vector, answer, code, steps, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (version_id, scope, question, normalized, vector.tobytes(), pickle.dumps(answer), code,
+                 pickle.dumps(steps or []), time.time()))
+            self._conn.commit()
+            self._indexes.pop((version_id, scope), None)
+            self._evict()
+
+    @staticmethod
+    def from_intermediate_steps(intermediate_steps: list) -> tuple[Optional[str], list]:
+        """ converts the intermediate steps of an agent into the generated code and plain dict steps"""
+        steps = [{"tool": action.tool, "tool_input": str(action.tool_input), "observation": str(observation)[:2000]}
+                 for action, observation in intermediate_steps]
+        return PlanCache.extract_agent_code(intermediate_steps), steps
+
+    def invalidate_version(self, version_id: str) -> None:
+        """ deletes all answers of a version"""
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE version_id = ?", (version_id,))
+            self._conn.commit()
+            self._indexes = {key: index for key, index in self._indexes.items() if key[0] != version_id}
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "max_entries": self.max_entries,
+        }
+
+    # --- internals, callers hold the lock ---
+
+    def _get_index(self, version_id: str, scope: str) -> tuple[list[int], list[str], np.ndarray]:
+        key = (version_id, scope)
+        if key not in self._indexes:
+            rows = self._conn.execute("SELECT id, normalized, vector FROM answers WHERE version_id = ? AND scope = ?",
+                                      key).fetchall()
+            ids = [row[0] for row in rows]
+            questions = [row[1] for row in rows]
+            vectors = np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows]) if rows else np.zeros((0, 1), np.float32)
+            self._indexes[key] = (ids, questions, vectors)
+        return self._indexes[key]
+
+    def _evict(self) -> None:
+        """ deletes the least recently used answers above the maximum number of entries"""
+        count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        rows = self._conn.execute("SELECT id, version_id, scope FROM answers ORDER BY last_access ASC LIMIT ?",
+                                  (count - self.max_entries,)).fetchall()
+        self._conn.executemany("DELETE FROM answers WHERE id = ?", [(row[0],) for row in rows])
+        self._conn.commit()
+        for _, version_id, scope in rows:
+            self._indexes.pop((version_id, scope), None)
+        self.evictions += len(rows)
+
+
+_answer_cache = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> SemanticAnswerCache:
+    """ returns the process wide answer cache"""
+    global _answer_cache
+    with _answer_cache_lock:
+        if _answer_cache is None:
+            _answer_cache = SemanticAnswerCache()
+    return _answer_cache
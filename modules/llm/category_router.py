@@ -0,0 +1,215 @@
+from typing import Callable
+
+from langchain.prompts import ChatPromptTemplate
+from langchain.schema import StrOutputParser
+from langchain_core.embeddings import Embeddings
+import numpy as np
+
+from modules.llm.embedding_cache import get_cached_embeddings
+from modules.llm.llm_settings import LLMSettings
+from modules.speckle.data_handler.base_handler import BaseHandler
+
+import re
+import threading
+import weakref
+
+
+# german and english names of the common categories, matched against the category names of the model
+CATEGORY_SYNONYMS = [
+    ["Wände", "Wand", "Walls", "Wall", "Mauer", "Mauerwerk", "Innenwand", "Außenwand"],
+    ["Türen", "Tür", "Doors", "Door", "Tor", "Tore"],
+    ["Fenster", "Windows", "Window"],
+    ["Räume", "Raum", "Rooms", "Room", "Zimmer"],
+    ["Geschossdecken", "Geschossdecke", "Decken", "Decke", "Floors", "Floor", "Boden", "Böden", "Slab", "Slabs"],
+    ["Dächer", "Dach", "Roofs", "Roof"],
+    ["Stützen", "Stütze", "Tragwerksstützen", "Columns", "Column", "Structural Columns", "Säule", "Säulen"],
+    ["Treppen", "Treppe", "Stairs", "Stair"],
+    ["Geländer", "Railings", "Railing", "Handlauf"],
+    ["Tragwerk", "Träger", "Unterzug", "Structural Framing", "Beams", "Beam"],
+    ["Tragwerksfundamente", "Fundamente", "Fundament", "Structural Foundations", "Foundation"],
+    ["Deckenuntersichten", "Unterdecke", "Ceilings", "Ceiling"],
+    ["Fassadenelemente", "Fassade", "Curtain Panels", "Curtain Wall", "Pfosten", "Curtain Wall Mullions"],
+    ["Möbel", "Furniture", "Einrichtung"],
+    ["Sanitärinstallationen", "Sanitär", "Plumbing Fixtures", "WC", "Waschbecken"],
+    ["Leuchten", "Beleuchtung", "Lighting Fixtures", "Lampe", "Lampen"],
+    ["Rampen", "Rampe", "Ramps", "Ramp"],
+    ["Ebenen", "Ebene", "Geschosse", "Geschoss", "Levels", "Level", "Stockwerk"],
+    ["Parkplätze", "Parkplatz", "Parking"],
+    ["Allgemeines Modell", "Generic Models", "Generic Model"],
+    ["Flächen", "Bereiche", "Areas", "Area"],
+]
+
+# prompt of the LLM fallback
+CLASSIFICATION_TEMPLATE = """In the following I provide you a list with categories. Please take the following question "{question}" and understand about which category it is.
+
+The category does not have to mentioned in the exact form, but it has to be clear that the question is about this category.
+
+The categories are given in form of a Python list. For every entry in the list, search whether it is given in the question.
+
+Please just return the categories that are mentioned in the question, separated with a comma, without any other text.
+
+Please mention the category that is most likely to be the correct one at the beginning.
+
+-----
+-----
+Categories: {categories}
+"""
+
+
+class CategoryRouter:
+
+    """
+    Ranks the categories of a model version for a question without an LLM call.
+
+    For every category the name, the name with its german/english synonyms and the name with its parameter names
+    are embedded once (through the embedding cache). A question costs one query embedding and a matrix product,
+    a category is scored with its best matching text. Categories which are named in the question (or one of their
+    synonyms) are always selected. The LLM only decides if the best score is low or not clearly ahead.
+    """
+
+    def __init__(self, basehandler: BaseHandler, embeddings: Embeddings = None,
+                 llm_classifier: Callable[[str, list[str]], str] = None) -> None:
+        self.categories = list(basehandler.categories)
+        self.embeddings = embeddings if embeddings else get_cached_embeddings()
+        self.llm_classifier = llm_classifier if llm_classifier else classify_with_llm
+
+        # counters
+        self.routed = 0
+        self.llm_fallbacks = 0
+
+        # category -> lower case names (name and synonyms) for the lexical match
+        self._names = {category: self._get_names(category) for category in self.categories}
+
+        texts, owners = [], []
+        for position, category in enumerate(self.categories):
+            name = category.lstrip("@")
+            category_texts = [name, f"{name} ({', '.join(sorted(self._names[category]))})"]
+            parameters = self._get_parameter_names(basehandler, category)
+            if parameters:
+                category_texts.append(f"{name}: {', '.join(parameters)}")
+            texts.extend(category_texts)
+            owners.extend([position] * len(category_texts))
+
+        vectors = np.array(self.embeddings.embed_documents(texts), dtype=np.float32) if texts else np.zeros((0, 1), np.float32)
+        self._vectors = self._normalize(vectors)
+        self._owners = np.array(owners, dtype=np.int64)
+
+    @staticmethod
+    def _get_names(category: str) -> set[str]:
+        """ returns the name of the category and the synonyms of its synonym groups (lower case)"""
+        name = category.lstrip("@").lower()
+        words = set(re.findall(r"\w+", name))
+        names = {name}
+        for group in CATEGORY_SYNONYMS:
+            lower_group = [synonym.lower() for synonym in group]
+            # german compounds end with the base word ("Innentüren", "Tragwerksstützen")
+            if any(synonym == name or synonym in words or (len(synonym) > 3 and name.endswith(synonym))
+                   for synonym in lower_group):
+                names.update(lower_group)
+        return names
+
+    @staticmethod
+    def _get_parameter_names(basehandler: BaseHandler, category: str) -> list[str]:
+        """ returns the best filled parameter names, categories of lazy models are not received for this"""
+        if not basehandler.is_category_loaded(category):
+            return []
+        schema = basehandler.get_category_schema(category)
+        infos = sorted(schema.parameters.values(), key=lambda info: info.fill_rate, reverse=True)
+        return [info.name for info in infos[:LLMSettings.CATEGORY_ROUTER_MAX_PARAMETERS]]
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def rank(self, question: str) -> list[tuple[str, float]]:
+        """ returns all categories with their score (cosine similarity of the best matching text), best first"""
+        if not self.categories:
+            return []
+        query = self._normalize(np.array(self.embeddings.embed_query(question), dtype=np.float32))
+        similarities = self._vectors @ query
+        scores = np.full(len(self.categories), -1.0, dtype=np.float32)
+        np.maximum.at(scores, self._owners, similarities)
+        order = np.argsort(-scores)
+        return [(self.categories[position], float(scores[position])) for position in order]
+
+    def get_named_categories(self, question: str) -> list[str]:
+        """ returns the categories whose name or synonym is a word of the question"""
+        words = set(re.findall(r"\w+", question.lower()))
+        text = " ".join(re.findall(r"\w+", question.lower()))
+        named = []
+        for category, names in self._names.items():
+            # single words are matched as words, names with several words as phrase
+            if any((name in words) if " " not in name else (name in text) for name in names):
+                named.append(category)
+        return named
+
+    def route(self, question: str, max_categories: int = 3) -> list[str]:
+        """ returns the categories of the question, the most likely one first
+
+        Args:
+            question (str): the question of the user
+            max_categories (int, optional): maximum number of returned categories. Defaults to 3.
+
+        Returns:
+            list[str]: the selected categories
+        """
+        self.routed += 1
+        ranking = self.rank(question)
+        if not ranking:
+            return []
+
+        named = set(self.get_named_categories(question))
+        if named:
+            return [category for category, _ in ranking if category in named][:max_categories]
+
+        best, best_score = ranking[0]
+        second_score = ranking[1][1] if len(ranking) > 1 else -1.0
+        if best_score >= LLMSettings.CATEGORY_ROUTER_MIN_SCORE and best_score - second_score >= LLMSettings.CATEGORY_ROUTER_MIN_MARGIN:
+            return [best]
+
+        # low confidence: the LLM decides, the best ranked category is the fallback
+        self.llm_fallbacks += 1
+        selected = self.parse_categories(self.llm_classifier(question, self.categories), self.categories)
+        return selected[:max_categories] if selected else [best]
+
+    @staticmethod
+    def parse_categories(text: str, categories: list[str]) -> list[str]:
+        """ finds the categories in a free text answer (with or without "@", quotes or brackets), in order of appearance"""
+        lower_text = text.lower()
+        found = []
+        for category in categories:
+            name = category.lstrip("@").lower()
+            match = re.search(r"(?<!\w)@?" + re.escape(name) + r"(?!\w)", lower_text)
+            if match:
+                found.append((match.start(), -len(name), category))
+        # longer names first at the same position ("Tragwerksstützen" before "Stützen")
+        found.sort()
+        result = []
+        for _, _, category in found:
+            if category not in result:
+                result.append(category)
+        return result
+
+    def get_stats(self) -> dict:
+        return {"routed": self.routed, "llm_fallbacks": self.llm_fallbacks,
+                "fallback_rate": self.llm_fallbacks / self.routed if self.routed else 0.0}
+
+
+def classify_with_llm(question: str, categories: list[str]) -> str:
+    """ classifies the question with the LLM, returns the raw answer"""
+    chain = ChatPromptTemplate.from_template(CLASSIFICATION_TEMPLATE) | LLMSettings.create_chat_model(temperature=0.7) | StrOutputParser()
+    return chain.invoke({"question": question, "categories": str(categories)})
+
+
+_routers = weakref.WeakKeyDictionary()
+_routers_lock = threading.Lock()
+
+
+def get_category_router(basehandler: BaseHandler) -> CategoryRouter:
+    """ returns the router of the basehandler (one per model version), built on first request"""
+    with _routers_lock:
+        router = _routers.get(basehandler)
+        if router is None:
+            router = _routers[basehandler] = CategoryRouter(basehandler)
+    return router
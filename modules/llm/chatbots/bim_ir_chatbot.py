@@ -10,6 +10,7 @@ from pandasai import Agent
 from pandas import DataFrame
 
 from modules.llm.llm_settings import LLMSettings
+from modules.llm.category_router import get_category_router
 from modules.llm.prompt_library import PromptLibrary
 from modules.speckle.projects import SpeckleProject
 from modules.llm.agent_handler import Pandasai_Agent_Handler
@@ -49,18 +50,17 @@ class BIMIRChatBot:
         return chain
     
     def table_classification(self) -> Runnable:
-        """Classify the query to find the correct Speckle table"""
-        prompt = PromptLibrary.get_from_langchain_hub("janix/speckle_table_classification")
-        chain = (
-            {
-                "categories": RunnableLambda(self.extract_categories), 
-                "question": RunnablePassthrough()
-            }
-            | prompt 
-            | self.llm
-            | StrOutputParser()
-        )
-        return chain
+        """Classify the query to find the correct Speckle table
+
+        the categories are ranked with precomputed vectors, the LLM is only asked if the ranking is not confident"""
+        router = get_category_router(self.project.get_basehandler())
+
+        def classify(question: str) -> str:
+            # the most likely category
+            categories = router.route(question)
+            return categories[0] if categories else ""
+
+        return RunnableLambda(classify)
     
     def extract_categories(self, question) -> str:
         """ Extracts the categories from the project"""
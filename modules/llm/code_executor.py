@@ -0,0 +1,265 @@
+from typing import Any, Iterator, Optional
+
+from pandas import DataFrame
+import pandas as pd
+import pyarrow as pa
+
+from modules.llm import code_runner
+from modules.llm.llm_settings import LLMSettings
+from modules.llm.tools.async_tools import get_cancel_event
+from modules.tracing import traced
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+import weakref
+
+
+class SandboxError(RuntimeError):
+    """ the generated code failed, the message has the format of the python tool ("KeyError: 'Fläche'")"""
+
+
+class SandboxTimeout(SandboxError):
+    """ the generated code exceeded its time, the worker was replaced"""
+
+
+class SandboxCancelled(SandboxError):
+    """ the tool call of the code was abandoned (tool timeout), the worker was killed and replaced"""
+
+
+class _Worker:
+
+    """ a pre-warmed worker process and the pipe to it"""
+
+    def __init__(self, context, memory_mb: int) -> None:
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=code_runner.worker_main, args=(child_conn, memory_mb), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.ready = False
+
+    def wait_ready(self, timeout: float) -> None:
+        """ waits until the worker has imported pandas and is able to execute code"""
+        if self.ready:
+            return
+        if not self.conn.poll(timeout):
+            raise SandboxError("The code worker did not start")
+        self.conn.recv()
+        self.ready = True
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class SandboxedExecutor:
+
+    """
+    Executes LLM-generated pandas code in a pool of pre-warmed worker processes instead of the Streamlit server.
+
+    A slow or faulty generated statement only blocks its worker, never the script threads of the sessions.
+    The tables are not pickled per call: every DataFrame is written once as Arrow IPC file (spool folder)
+    and the workers read it memory-mapped and keep it for the following calls. Each call is limited in CPU time
+    (LLMSettings.SANDBOX_CPU_SECONDS) and each worker in private memory (LLMSettings.SANDBOX_MEMORY_MB),
+    a worker exceeding the wall clock timeout or running the code of an abandoned tool call is killed and replaced.
+    Results are streamed back as events:
+    ("stdout", text), ("rows", DataFrame chunk) and ("value", value).
+    """
+
+    # seconds between the checks of the cancel event while the code runs
+    CANCEL_CHECK_SECONDS = 0.2
+
+    def __init__(self, n_workers: int = None, cpu_seconds: float = None, memory_mb: int = None,
+                 spool_dir: str = None, chunk_rows: int = None) -> None:
+        self.n_workers = n_workers if n_workers else LLMSettings.SANDBOX_WORKERS
+        self.cpu_seconds = cpu_seconds if cpu_seconds else LLMSettings.SANDBOX_CPU_SECONDS
+        self.memory_mb = memory_mb if memory_mb else LLMSettings.SANDBOX_MEMORY_MB
+        self.spool_dir = spool_dir if spool_dir else LLMSettings.SANDBOX_SPOOL_DIR
+        self.chunk_rows = chunk_rows if chunk_rows else LLMSettings.SANDBOX_CHUNK_ROWS
+
+        # spawned workers do not inherit the threads and sockets of the Streamlit server
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        for _ in range(self.n_workers):
+            self._idle.put(_Worker(self._context, self.memory_mb))
+
+        # id of a shared DataFrame -> (weak reference, path of its Arrow file)
+        self._shared = {}
+        self._shared_lock = threading.Lock()
+
+        # counters
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    def share(self, df: DataFrame) -> str:
+        """ returns the path of the Arrow file of the DataFrame, written on first request
+
+        the file is removed when the DataFrame is garbage collected"""
+        with self._shared_lock:
+            entry = self._shared.get(id(df))
+            if entry is not None and entry[0]() is df:
+                return entry[1]
+
+            os.makedirs(self.spool_dir, exist_ok=True)
+            path = os.path.join(self.spool_dir, f"{os.getpid()}-{uuid.uuid4().hex}.arrow")
+            table = pa.table({str(name): self._to_arrow(df[name]) for name in df.columns})
+            tmp_path = f"{path}.tmp"
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, path)
+
+            self._shared[id(df)] = (weakref.ref(df), path)
+            weakref.finalize(df, self._unshare, id(df), path)
+            return path
+
+    def stream(self, code: str, dfs: list[DataFrame], framework: str = "pandas_agent",
+               setup: list[str] = None) -> Iterator[tuple[str, Any]]:
+        """ executes the code in a worker and yields its events while they arrive
+
+        Args:
+            code (str): the generated code
+            dfs (list[DataFrame]): the tables of the code (df, or df1, df2, ..., and dfs)
+            framework (str): "pandas_agent" (value of the last expression) or "pandasai" (result dictionary)
+            setup (list[str], optional): earlier code whose variables are needed, executed without output
+
+        Raises:
+            SandboxError: the code raised an exception or the worker died (e.g. memory limit)
+            SandboxTimeout: the code exceeded its time
+            SandboxCancelled: the tool call was cancelled while the code ran (see async_tools.get_cancel_event)
+        """
+        request = {"code": code, "framework": framework, "paths": [self.share(df) for df in dfs], "setup": setup,
+                   "cpu_seconds": self.cpu_seconds, "chunk_rows": self.chunk_rows}
+        # generous wall clock limit, the CPU time limit applies first if the code is busy
+        timeout = 2 * self.cpu_seconds + 10
+        cancel = get_cancel_event()
+        self.calls += 1
+
+        worker = self._idle.get()
+        finished = False
+        try:
+            worker.wait_ready(timeout)
+            worker.conn.send(request)
+            deadline = time.monotonic() + timeout
+            while True:
+                # waits in short steps, so an abandoned call stops its worker
+                if not worker.conn.poll(min(max(deadline - time.monotonic(), 0), self.CANCEL_CHECK_SECONDS)):
+                    if cancel is not None and cancel.is_set():
+                        raise SandboxCancelled("CancelledError: the tool call was cancelled")
+                    if time.monotonic() < deadline:
+                        continue
+                    self.timeouts += 1
+                    raise SandboxTimeout(f"TimeoutError: the code did not finish within {timeout:.0f} seconds")
+                try:
+                    kind, payload = worker.conn.recv()
+                except EOFError:
+                    self.errors += 1
+                    raise SandboxError("MemoryError: the code worker was terminated (memory limit exceeded?)")
+                if kind == "done":
+                    finished = True
+                    return
+                if kind == "error":
+                    finished = True
+                    self.errors += 1
+                    raise SandboxError(payload)
+                yield kind, payload
+        finally:
+            # a worker in an unknown state (timeout, died, stream not consumed) is replaced
+            if not finished:
+                worker.kill()
+                worker = _Worker(self._context, self.memory_mb)
+            self._idle.put(worker)
+
+    def execute(self, code: str, dfs: list[DataFrame], framework: str = "pandas_agent", setup: list[str] = None) -> Any:
+        """ executes the code in a worker and returns its value (or the printed output)"""
+        return collect_events(self.stream(code, dfs, framework, setup))
+
+    def get_stats(self) -> dict:
+        return {"workers": self.n_workers, "calls": self.calls, "errors": self.errors, "timeouts": self.timeouts,
+                "shared_tables": len(self._shared)}
+
+    def close(self) -> None:
+        """ stops the idle workers"""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=5)
+
+    def _unshare(self, key: int, path: str) -> None:
+        with self._shared_lock:
+            if key in self._shared and self._shared[key][1] == path:
+                del self._shared[key]
+        try:
+            os.remove(path)
+        except OSError:
+            # still mapped by a worker on Windows, the spool folder can be cleared
+            pass
+
+    @staticmethod
+    def _to_arrow(column: pd.Series) -> pa.Array:
+        """ converts a column, columns with mixed value types are shared as strings"""
+        try:
+            return pa.array(column, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            values = [None if value is None or (isinstance(value, float) and value != value) else str(value)
+                      for value in column]
+            return pa.array(values, type=pa.string())
+
+
+def collect_events(events: Iterator[tuple[str, Any]]) -> Any:
+    """ combines the events of a call into its result: the rows, the value or the printed output"""
+    printed = []
+    chunks = []
+    value = None
+    for kind, payload in events:
+        if kind == "stdout":
+            printed.append(payload)
+        elif kind == "rows":
+            chunks.append(payload)
+        elif kind == "value":
+            value = payload
+    if chunks:
+        return pd.concat(chunks)
+    return value if value is not None else "".join(printed).strip()
+
+
+def stream_code(code: str, dfs: list[DataFrame], framework: str = "pandas_agent",
+                setup: list[str] = None) -> Iterator[tuple[str, Any]]:
+    """ yields the events of the generated code, executed in the sandbox or (if it is disabled) in this process"""
+    if LLMSettings.SANDBOX_ENABLED:
+        yield from get_code_executor().stream(code, dfs, framework, setup)
+        return
+    try:
+        result = code_runner.execute(code, dfs, framework, setup)
+    except Exception as e:
+        raise SandboxError(f"{type(e).__name__}: {e}") from e
+    yield ("rows" if isinstance(result, DataFrame) else "value"), result
+
+
+@traced(kind="code", attributes=["framework"])
+def execute_code(code: str, dfs: list[DataFrame], framework: str = "pandas_agent", setup: list[str] = None) -> Any:
+    """ executes the generated code and returns its value (or the printed output)"""
+    return collect_events(stream_code(code, dfs, framework, setup))
+
+
+_code_executor: Optional[SandboxedExecutor] = None
+_code_executor_lock = threading.Lock()
+
+
+def get_code_executor() -> SandboxedExecutor:
+    """ returns the process wide code sandbox, the workers are started on first request"""
+    global _code_executor
+    with _code_executor_lock:
+        if _code_executor is None:
+            _code_executor = SandboxedExecutor()
+    return _code_executor
@@ -0,0 +1,197 @@
+"""
+Execution of generated pandas code, in-process or inside the worker processes of the code sandbox.
+
+This module only depends on pandas, numpy and pyarrow, so the worker processes start without
+the LLM and Streamlit modules.
+"""
+from typing import Any
+
+from pandas import DataFrame
+import pandas as pd
+import numpy as np
+import pyarrow as pa
+
+from collections import OrderedDict
+from contextlib import redirect_stdout
+import ast
+import io
+import re
+import signal
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, only the wall clock timeout of the executor applies there
+    resource = None
+
+
+def get_namespace(dfs: list[DataFrame]) -> dict:
+    """ variables like in the python tool of the pandas agent: df for one table, df1, df2, ... for several"""
+    namespace = {"pd": pd, "np": np, "dfs": dfs}
+    if len(dfs) == 1:
+        namespace["df"] = dfs[0]
+    else:
+        namespace.update({f"df{i + 1}": df for i, df in enumerate(dfs)})
+    return namespace
+
+
+def run_agent_code(code: str, namespace: dict) -> Any:
+    """ executes the code of the pandas agent, returns the value of the last expression (None if there is none)"""
+    # the agent sometimes wraps its code in a markdown block
+    code = re.sub(r"^\s*```(python)?|```\s*$", "", code.strip())
+    tree = ast.parse(code)
+    if tree.body and isinstance(tree.body[-1], ast.Expr):
+        exec(compile(ast.Module(tree.body[:-1], type_ignores=[]), "<generated>", "exec"), namespace)
+        return eval(compile(ast.Expression(tree.body[-1].value), "<generated>", "eval"), namespace)
+    exec(compile(tree, "<generated>", "exec"), namespace)
+    return None
+
+
+def run_pandasai_code(code: str, namespace: dict) -> Any:
+    """ executes the code of PandasAI, returns the value of its result dictionary"""
+    # the logged code can start with the language of the code block
+    code = re.sub(r"^\s*python\s*\n", "", code)
+    exec(compile(code, "<generated>", "exec"), namespace)
+    result = namespace.get("result")
+    if not isinstance(result, dict) or "value" not in result:
+        raise ValueError("The code does not define a result")
+    if result.get("type") == "plot":
+        # charts are written to files by PandasAI, they are not re-executed
+        raise ValueError("Charts are not answered from generated code")
+    return result["value"]
+
+
+RUNNERS = {"pandas_agent": run_agent_code, "pandasai": run_pandasai_code}
+
+
+def execute(code: str, dfs: list[DataFrame], framework: str = "pandas_agent", setup: list[str] = None) -> Any:
+    """ executes generated code in this process, returns its value (or the printed output)
+
+    the setup code (earlier steps of the agent) is executed before, without output. The code gets copies of the
+    tables, they are shared with other sessions and must not be changed"""
+    runner = RUNNERS[framework]
+    namespace = get_namespace([df.copy() for df in dfs])
+    for step in setup or []:
+        with redirect_stdout(io.StringIO()):
+            runner(step, namespace)
+    output = io.StringIO()
+    with redirect_stdout(output):
+        result = runner(code, namespace)
+    return result if result is not None else output.getvalue().strip()
+
+
+# --- worker process of the code sandbox ---
+
+class CPUTimeExceeded(Exception):
+    pass
+
+
+class _PipeWriter(io.TextIOBase):
+
+    """ stdout of the generated code, every write is sent to the executor"""
+
+    def __init__(self, conn) -> None:
+        self.conn = conn
+
+    def write(self, text: str) -> int:
+        if text:
+            self.conn.send(("stdout", text))
+        return len(text)
+
+
+def _raise_cpu_time_exceeded(signum, frame):
+    raise CPUTimeExceeded("CPU time limit of the generated code exceeded")
+
+
+def _set_cpu_limit(seconds: float) -> None:
+    """ limits the CPU time of the next call (the limit of the process counts the used time as well)"""
+    if resource is None:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _reset_cpu_limit() -> None:
+    if resource is None:
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    resource.setrlimit(resource.RLIMIT_CPU, (hard, hard))
+
+
+def _read_table(path: str) -> pa.Table:
+    """ reads a shared table memory-mapped (Arrow IPC file), the data stays in the page cache of the file"""
+    with pa.memory_map(path, "r") as source:
+        return pa.ipc.open_file(source).read_all()
+
+
+def _send_result(conn, result: Any, chunk_rows: int) -> None:
+    """ sends DataFrames in chunks of rows, so the first rows are shown while the rest is transferred"""
+    if isinstance(result, DataFrame):
+        for start in range(0, max(len(result), 1), chunk_rows):
+            conn.send(("rows", result.iloc[start:start + chunk_rows]))
+        return
+    try:
+        conn.send(("value", result))
+    except Exception:
+        # results which can not be pickled (e.g. generators) are sent as text
+        conn.send(("value", repr(result)))
+
+
+def worker_main(conn, memory_mb: int = None, max_tables: int = 16) -> None:
+    """ loop of a worker process: receives requests, executes the code and sends the events back
+
+    a request is a dict with code, framework, table paths, setup code (executed silently before the code),
+    cpu_seconds and chunk_rows; None stops the worker"""
+    # the private memory of the process is limited, memory-mapped tables do not count
+    if resource is not None and memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_DATA, (limit, resource.getrlimit(resource.RLIMIT_DATA)[1]))
+    if resource is not None:
+        signal.signal(signal.SIGXCPU, _raise_cpu_time_exceeded)
+
+    # Arrow tables by path, shared by the calls of this worker
+    tables = OrderedDict()
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+
+        try:
+            dfs = []
+            for path in request["paths"]:
+                if path not in tables:
+                    tables[path] = _read_table(path)
+                    while len(tables) > max_tables:
+                        tables.popitem(last=False)
+                tables.move_to_end(path)
+                # every request gets its own writable DataFrame, changes of the code do not reach the next request
+                dfs.append(tables[path].to_pandas())
+
+            runner = RUNNERS[request["framework"]]
+            namespace = get_namespace(dfs)
+            _set_cpu_limit(request["cpu_seconds"])
+            try:
+                # earlier steps of the agent define the variables of the code, their output is not sent again
+                for setup in request.get("setup") or []:
+                    with redirect_stdout(io.StringIO()):
+                        runner(setup, namespace)
+                with redirect_stdout(_PipeWriter(conn)):
+                    result = runner(request["code"], namespace)
+            finally:
+                _reset_cpu_limit()
+            if result is not None:
+                _send_result(conn, result, request["chunk_rows"])
+            conn.send(("done", None))
+        except BaseException as e:
+            if isinstance(e, KeyboardInterrupt):
+                break
+            conn.send(("error", f"{type(e).__name__}: {e}"))
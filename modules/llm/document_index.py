@@ -0,0 +1,155 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+import numpy as np
+
+from modules.llm.embedding_cache import get_cached_embeddings
+from modules.llm.llm_settings import LLMSettings
+
+import hashlib
+import json
+import os
+import threading
+import uuid
+
+
+class DocumentIndexStore:
+
+    """
+    Build-once store of the FAISS indexes of documents (e.g. the BayBO).
+
+    An index is keyed by the content hash of the file and the splitter and embedding settings, so it is only
+    rebuilt if the document or the settings change. The FAISS index and the chunks (text and metadata as JSON)
+    are stored in <root>/<key>/, loaded indexes are memory-mapped and shared by all sessions of the process.
+    A question then costs one query embedding and one search instead of embedding the whole document.
+    """
+
+    INDEX_FILE = "index.faiss"
+    CHUNKS_FILE = "chunks.json"
+
+    def __init__(self, root: str = None, chunk_size: int = None, chunk_overlap: int = None,
+                 embedding_model: str = None) -> None:
+        self.root = root if root else LLMSettings.DOCUMENT_INDEX_DIR
+        self.chunk_size = chunk_size if chunk_size else LLMSettings.CHUNK_SIZE
+        self.chunk_overlap = chunk_overlap if chunk_overlap is not None else LLMSettings.CHUNK_OVERLAP
+        self.embedding_model = embedding_model if embedding_model else LLMSettings.EMBEDDING_MODEL
+        # key -> loaded vector store
+        self._vectorstores = {}
+        # one lock per key, so different documents are built in parallel
+        self._locks = {}
+        self._lock = threading.Lock()
+        # (path, modification time, size) -> hash of the file content, a question does not read the document again
+        self._content_digests = {}
+
+    def get_key(self, file_path: str) -> str:
+        """ returns the key of the index: hash of the file content and the index settings"""
+        stat = os.stat(file_path)
+        file_key = (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            content_digest = self._content_digests.get(file_key)
+        if content_digest is None:
+            content_digest = hashlib.sha256()
+            with open(file_path, "rb") as file:
+                for block in iter(lambda: file.read(1 << 20), b""):
+                    content_digest.update(block)
+            with self._lock:
+                self._content_digests[file_key] = content_digest
+
+        digest = content_digest.copy()
+        settings = {"chunk_size": self.chunk_size, "chunk_overlap": self.chunk_overlap,
+                    "embedding_model": self.embedding_model}
+        if LLMSettings.EMBEDDING_BACKEND != "openai":
+            # indexes of the fake embeddings are kept apart
+            settings["embedding_backend"] = LLMSettings.EMBEDDING_BACKEND
+        digest.update(json.dumps(settings, sort_keys=True).encode("utf-8"))
+        return digest.hexdigest()[:32]
+
+    def get_vectorstore(self, file_path: str, embeddings: Embeddings = None) -> VectorStore:
+        """ returns the vector store of the document, it is built and stored on first request
+
+        Args:
+            file_path (str): path to the PDF
+            embeddings (Embeddings, optional): embedding model, must match the embedding model of the store
+
+        Returns:
+            FAISS: the vector store (also usable as retriever)
+        """
+        key = self.get_key(file_path)
+        with self._lock:
+            if key in self._vectorstores:
+                return self._vectorstores[key]
+            lock = self._locks.setdefault(key, threading.Lock())
+
+        with lock:
+            if key not in self._vectorstores:
+                embeddings = embeddings if embeddings else get_cached_embeddings(self.embedding_model)
+                index_dir = os.path.join(self.root, key)
+                if not os.path.exists(os.path.join(index_dir, self.CHUNKS_FILE)):
+                    self._build(file_path, index_dir, embeddings)
+                vectorstore = self._load(index_dir, embeddings)
+                with self._lock:
+                    self._vectorstores[key] = vectorstore
+        return self._vectorstores[key]
+
+    def _build(self, file_path: str, index_dir: str, embeddings: Embeddings) -> None:
+        """ splits and embeds the document, writes the index and the chunks"""
+        # PDF loader, splitter and FAISS are loaded with the first document, not with the tools
+        from langchain_community.document_loaders import PyMuPDFLoader
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        import faiss
+
+        docs = PyMuPDFLoader(file_path).load()
+        documents = RecursiveCharacterTextSplitter(
+            chunk_size=self.chunk_size, chunk_overlap=self.chunk_overlap
+        ).split_documents(docs)
+
+        vectors = np.array(embeddings.embed_documents([doc.page_content for doc in documents]), dtype=np.float32)
+        # same index type as FAISS.from_documents (exact search, euclidean distance)
+        index = faiss.IndexFlatL2(vectors.shape[1])
+        index.add(vectors)
+
+        # write into a temporary folder first, concurrent processes never see partial indexes
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = f"{index_dir}.{uuid.uuid4().hex}.tmp"
+        os.makedirs(tmp_dir)
+        faiss.write_index(index, os.path.join(tmp_dir, self.INDEX_FILE))
+        with open(os.path.join(tmp_dir, self.CHUNKS_FILE), "w", encoding="utf-8") as file:
+            json.dump([{"page_content": doc.page_content, "metadata": doc.metadata} for doc in documents], file)
+        try:
+            os.replace(tmp_dir, index_dir)
+        except OSError:
+            # another process stored the same index in the meantime
+            for name in os.listdir(tmp_dir):
+                os.remove(os.path.join(tmp_dir, name))
+            os.rmdir(tmp_dir)
+
+    def _load(self, index_dir: str, embeddings: Embeddings) -> VectorStore:
+        """ loads the index memory-mapped (falls back to reading it, if the index type cannot be mapped)"""
+        from langchain_community.docstore.in_memory import InMemoryDocstore
+        from langchain_community.vectorstores import FAISS
+        import faiss
+
+        index_path = os.path.join(index_dir, self.INDEX_FILE)
+        try:
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            index = faiss.read_index(index_path)
+
+        with open(os.path.join(index_dir, self.CHUNKS_FILE), "r", encoding="utf-8") as file:
+            chunks = json.load(file)
+        ids = [str(i) for i in range(len(chunks))]
+        docstore = InMemoryDocstore({doc_id: Document(**chunk) for doc_id, chunk in zip(ids, chunks)})
+        return FAISS(embeddings, index, docstore, dict(enumerate(ids)))
+
+
+_document_index_store = None
+_document_index_store_lock = threading.Lock()
+
+
+def get_document_index_store() -> DocumentIndexStore:
+    """ returns the process wide document index store"""
+    global _document_index_store
+    with _document_index_store_lock:
+        if _document_index_store is None:
+            _document_index_store = DocumentIndexStore()
+    return _document_index_store
@@ -0,0 +1,264 @@
+from typing import Dict, List
+
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+import numpy as np
+
+from modules.llm.llm_settings import LLMSettings
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+class EmbeddingCache:
+
+    """
+    Disk-backed store of embedding vectors, keyed by the embedding model and the hash of the text.
+
+    A text always gets the same vector from the same model, so entries never get stale and the SQLite file
+    is shared by all processes on the machine. The total size is kept below a budget by evicting the least
+    recently used vectors, hits and misses are counted.
+    """
+
+    # SQLite allows a limited number of host parameters per statement
+    SQL_CHUNK_SIZE = 900
+
+    def __init__(self, path: str = None, max_mb: int = None) -> None:
+        """ open (or create) the cache database at the given path"""
+        self.path = path if path else LLMSettings.EMBEDDING_CACHE_PATH
+        self.max_bytes = (max_mb if max_mb else LLMSettings.EMBEDDING_CACHE_MAX_MB) * 1024 * 1024
+        self._lock = threading.RLock()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._initialise()
+
+    def _initialise(self) -> None:
+        """ creates the database file and the table"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS embeddings(
+                model TEXT NOT NULL,
+                hash TEXT NOT NULL,
+                vector BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, hash))"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_access ON embeddings(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """ returns the stored vectors of the given text hashes, missing hashes are not in the result"""
+        vectors = {}
+        with self._lock:
+            for start in range(0, len(hashes), self.SQL_CHUNK_SIZE):
+                chunk = hashes[start:start + self.SQL_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})", [model] + chunk)
+                vectors.update((text_hash, np.frombuffer(vector, dtype=np.float32)) for text_hash, vector in rows)
+            now = time.time()
+            self._conn.executemany("UPDATE embeddings SET last_access = ? WHERE model = ? AND hash = ?",
+                                   [(now, model, text_hash) for text_hash in vectors])
+            self._conn.commit()
+        self.hits += len(vectors)
+        self.misses += len(hashes) - len(vectors)
+        return vectors
+
+    def put_many(self, model: str, vectors: Dict[str, np.ndarray]) -> None:
+        """ stores the vectors and evicts cold vectors if the budget is exceeded"""
+        now = time.time()
+        rows = []
+        for text_hash, vector in vectors.items():
+            blob = np.asarray(vector, dtype=np.float32).tobytes()
+            rows.append((model, text_hash, blob, len(blob), now))
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.commit()
+            self._evict()
+
+    def get_total_bytes(self) -> int:
+        """ returns the size of all stored vectors"""
+        with self._lock:
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+        return row[0]
+
+    def get_stats(self) -> dict:
+        """ returns the counters of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "total_bytes": self.get_total_bytes(),
+            "max_bytes": self.max_bytes,
+        }
+
+    def _evict(self) -> None:
+        """ deletes least recently used vectors until the cache is below 90% of the budget, callers hold the lock"""
+        total = self.get_total_bytes()
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        to_delete = []
+        for model, text_hash, size in self._conn.execute("SELECT model, hash, size FROM embeddings ORDER BY last_access ASC"):
+            if total <= target:
+                break
+            to_delete.append((model, text_hash))
+            total -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND hash = ?", to_delete)
+        self._conn.commit()
+        self.evictions += len(to_delete)
+
+
+class CachedEmbeddings(Embeddings):
+
+    """
+    Embedding model with the embedding cache in front.
+
+    Only texts which are not cached are sent to the model: duplicates are removed and the remaining
+    texts are sent in batches (bounded by number of texts and characters), several batches at once.
+    Re-indexing a slightly changed document therefore only embeds the new chunks.
+    """
+
+    def __init__(self, embeddings: Embeddings, model_name: str, cache: EmbeddingCache = None) -> None:
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache = cache if cache else get_embedding_cache()
+
+        # counters of the requests to the embedding model
+        self.batches = 0
+        self.texts_embedded = 0
+        self.embed_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """ returns the vectors of the texts, only cache misses are embedded"""
+        hashes = [self.cache.hash_text(text) for text in texts]
+        vectors = self.cache.get_many(self.model_name, list(dict.fromkeys(hashes)))
+
+        # deduplicated misses in order of their first appearance
+        missing = {}
+        for text_hash, text in zip(hashes, texts):
+            if text_hash not in vectors and text_hash not in missing:
+                missing[text_hash] = text
+
+        if missing:
+            new_vectors = self._embed_missing(missing)
+            self.cache.put_many(self.model_name, new_vectors)
+            vectors.update(new_vectors)
+
+        return [vectors[text_hash].tolist() for text_hash in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        """ returns the vector of a query, queries are cached separately (some models embed them differently)"""
+        model = f"{self.model_name}:query"
+        text_hash = self.cache.hash_text(text)
+        vector = self.cache.get_many(model, [text_hash]).get(text_hash)
+        if vector is None:
+            start = time.perf_counter()
+            vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+            self._count(1, 1, time.perf_counter() - start)
+            self.cache.put_many(model, {text_hash: vector})
+        return vector.tolist()
+
+    def _embed_missing(self, missing: Dict[str, str]) -> Dict[str, np.ndarray]:
+        """ embeds the texts in size-bounded batches, the batches are sent concurrently"""
+        batches = self._split_batches(list(missing.items()))
+        if len(batches) == 1:
+            results = [self._embed_batch(batches[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=LLMSettings.EMBEDDING_CONCURRENCY) as executor:
+                results = list(executor.map(self._embed_batch, batches))
+        vectors = {}
+        for result in results:
+            vectors.update(result)
+        return vectors
+
+    @staticmethod
+    def _split_batches(items: list[tuple[str, str]]) -> list[list[tuple[str, str]]]:
+        batches = [[]]
+        chars = 0
+        for item in items:
+            batch = batches[-1]
+            if batch and (len(batch) >= LLMSettings.EMBEDDING_BATCH_SIZE
+                          or chars + len(item[1]) > LLMSettings.EMBEDDING_BATCH_MAX_CHARS):
+                batches.append([])
+                chars = 0
+            batches[-1].append(item)
+            chars += len(item[1])
+        return batches
+
+    def _embed_batch(self, batch: list[tuple[str, str]]) -> Dict[str, np.ndarray]:
+        start = time.perf_counter()
+        result = self.embeddings.embed_documents([text for _, text in batch])
+        self._count(1, len(batch), time.perf_counter() - start)
+        return {text_hash: np.asarray(vector, dtype=np.float32) for (text_hash, _), vector in zip(batch, result)}
+
+    def _count(self, batches: int, texts: int, seconds: float) -> None:
+        with self._lock:
+            self.batches += batches
+            self.texts_embedded += texts
+            self.embed_seconds += seconds
+
+    def get_stats(self) -> dict:
+        """ returns the counters of the cache and of the requests to the embedding model"""
+        stats = self.cache.get_stats()
+        stats.update({
+            "model": self.model_name,
+            "batches": self.batches,
+            "texts_embedded": self.texts_embedded,
+            "embed_seconds": self.embed_seconds,
+            "avg_batch_latency": self.embed_seconds / self.batches if self.batches else 0.0,
+        })
+        return stats
+
+
+_embedding_cache = None
+_cached_embeddings = {}
+_embedding_cache_lock = threading.Lock()
+
+
+def get_embedding_cache() -> EmbeddingCache:
+    """ returns the process wide embedding cache"""
+    global _embedding_cache
+    with _embedding_cache_lock:
+        if _embedding_cache is None:
+            _embedding_cache = EmbeddingCache()
+    return _embedding_cache
+
+
+def get_cached_embeddings(model: str = None) -> CachedEmbeddings:
+    """ returns the process wide cached embedding model (OpenAI), one per model name
+
+    with the fake backend, the vectors are derived from the hash of the text (no network, e.g. for benchmarks),
+    they are cached under their own model name"""
+    model = model if model else LLMSettings.EMBEDDING_MODEL
+    if LLMSettings.EMBEDDING_BACKEND == "fake":
+        model = f"fake-{LLMSettings.FAKE_EMBEDDING_SIZE}:{model}"
+    cache = get_embedding_cache()
+    with _embedding_cache_lock:
+        if model not in _cached_embeddings:
+            if LLMSettings.EMBEDDING_BACKEND == "fake":
+                embeddings = DeterministicFakeEmbedding(size=LLMSettings.FAKE_EMBEDDING_SIZE)
+            else:
+                embeddings = OpenAIEmbeddings(model=model)
+            _cached_embeddings[model] = CachedEmbeddings(embeddings, model, cache)
+        return _cached_embeddings[model]
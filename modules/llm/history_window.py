@@ -0,0 +1,140 @@
+from typing import Callable
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+import tiktoken
+
+from modules.llm.llm_settings import LLMSettings
+
+import re
+
+
+class HistoryWindow:
+
+    """
+    Bounds the chat history which is sent to the agent.
+
+    The last LLMSettings.HISTORY_TURNS turns are kept verbatim, older messages are folded into a running summary.
+    The summary is updated incrementally: only the messages which left the window since the last update are
+    summarized together with the previous summary. If the summary and the kept turns exceed the token budget of
+    the model, the oldest of them are folded as well. Bulky outputs (tables, long answers) are replaced by a short
+    reference in the prompt, the full output stays in the chat history of the page.
+
+    The state (summary, number of summarized messages) is a plain dict, so it can be kept in the session state.
+    """
+
+    SUMMARY_PROMPT = """Update the summary of a conversation between a user and an assistant about a BIM model.
+Keep the facts the user may refer to later: asked questions, numbers, categories, elements and decisions.
+Answer only with the new summary (at most 150 words).
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+
+New summary:"""
+
+    # markdown tables with more rows are replaced by a reference
+    MAX_TABLE_ROWS = 10
+
+    _encodings = {}
+
+    def __init__(self, settings: LLMSettings, state: dict = None, summarizer: Callable[[str], str] = None) -> None:
+        """
+        Args:
+            settings (LLMSettings): the settings of the agent (the token budget depends on the model)
+            state (dict, optional): the state of the window of this chat, updated in place
+            summarizer (Callable, optional): returns the completion of a prompt, defaults to the summary model
+        """
+        self.settings = settings
+        self.state = state if state is not None else {}
+        self.state.setdefault("summary", "")
+        self.state.setdefault("summarized", 0)
+        self._summarizer = summarizer
+
+    def get_messages(self, history: list[BaseMessage]) -> list[BaseMessage]:
+        """ returns the summary of the older turns (as system message) and the last turns of the history"""
+        if len(history) < self.state["summarized"]:
+            # the history was reset
+            self.state.update(summary="", summarized=0)
+
+        # whole turns (user message and answer) are kept
+        start = max(len(history) - 2 * LLMSettings.HISTORY_TURNS, self.state["summarized"])
+        recent = [self.compact(message) for message in history[start:]]
+        budget = self.settings.get_history_token_budget()
+        while True:
+            # the summary counts against the budget, folding turns changes it, so the window is checked again
+            summary = self._get_summary_messages()
+            while len(recent) > 2 and self.count_tokens(summary + recent) > budget:
+                recent = recent[2:]
+                start += 2
+            if start <= self.state["summarized"]:
+                return summary + recent
+            self._update_summary(history[self.state["summarized"]:start])
+            self.state["summarized"] = start
+
+    def compact(self, message: BaseMessage) -> BaseMessage:
+        """ replaces large tables and the end of long messages by a reference to the output shown in the chat"""
+        content = message.content
+        if not isinstance(content, str):
+            return message
+
+        def replace_table(match: re.Match) -> str:
+            rows = match.group(0).strip().split("\n")
+            if len(rows) <= self.MAX_TABLE_ROWS + 2:
+                return match.group(0)
+            # header, separator and the first rows
+            return "\n".join(rows[:5]) + f"\n[table with {len(rows) - 2} rows, shown to the user]\n"
+
+        content = re.sub(r"(?:^\|.*\|[ \t]*(?:\n|$))+", replace_table, content, flags=re.MULTILINE)
+        if len(content) > LLMSettings.HISTORY_MAX_MESSAGE_CHARS:
+            content = content[:LLMSettings.HISTORY_MAX_MESSAGE_CHARS] + \
+                f"\n[... {len(content) - LLMSettings.HISTORY_MAX_MESSAGE_CHARS} more characters, shown to the user]"
+        if content == message.content:
+            return message
+        return message.__class__(content=content)
+
+    def count_tokens(self, messages: list[BaseMessage]) -> int:
+        """ counts the tokens of the messages with the tokenizer of the model (cl100k for other models)"""
+        model = self.settings.model
+        if model not in self._encodings:
+            try:
+                self._encodings[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                self._encodings[model] = tiktoken.get_encoding("cl100k_base")
+        encoding = self._encodings[model]
+        # about four tokens per message for the role and separators
+        return sum(len(encoding.encode(str(message.content))) + 4 for message in messages)
+
+    def _update_summary(self, messages: list[BaseMessage]) -> None:
+        """ folds the messages into the summary"""
+        text = "\n".join(f"{self._get_role(message)}: {self.compact(message).content}" for message in messages)
+        prompt = self.SUMMARY_PROMPT.format(summary=self.state["summary"] or "-", messages=text)
+        try:
+            self.state["summary"] = self._summarize(prompt).strip()
+        except Exception as e:
+            # without summary model, the shortened messages are appended
+            print(f"History summary failed, appending the messages: {e}")
+            summary = self.state["summary"] + "\n" + text[:LLMSettings.HISTORY_MAX_MESSAGE_CHARS]
+            # the latest messages are kept
+            self.state["summary"] = summary[-LLMSettings.HISTORY_SUMMARY_MAX_CHARS:].strip()
+
+    def _get_summary_messages(self) -> list[BaseMessage]:
+        """ returns the summary of the older turns as system message (none without summary)"""
+        if not self.state["summary"]:
+            return []
+        return [SystemMessage(content=f"Summary of the earlier conversation: {self.state['summary']}")]
+
+    def _summarize(self, prompt: str) -> str:
+        if self._summarizer is not None:
+            return self._summarizer(prompt)
+        llm = LLMSettings.create_chat_model(LLMSettings.HISTORY_SUMMARY_MODEL, temperature=0)
+        return llm.invoke(prompt).content
+
+    @staticmethod
+    def _get_role(message: BaseMessage) -> str:
+        if isinstance(message, HumanMessage):
+            return "User"
+        if isinstance(message, AIMessage):
+            return "Assistant"
+        return message.type
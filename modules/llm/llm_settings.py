@@ -1,21 +1,10 @@
-import backoff  # for exponential backoff
-import openai
 from dotenv import load_dotenv
 import os
 
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
+# the model clients (LangChain, PandasAI) are imported when the first model is created,
+# so pages without a chat (e.g. the data view) do not load the LLM stack
 
-from pandasai.llm import OpenAI
-
-
-# from pandasai.llm import OpenAI
-
-client = OpenAI()  
-
-@backoff.on_exception(backoff.expo, openai.RateLimitError)
-def completions_with_backoff(**kwargs):
-    return client.chat.completions.create(**kwargs)
+load_dotenv()
 
 
 class LLMSettings():
@@ -31,6 +20,98 @@ class LLMSettings():
     TEMPERATURE_DEFAULT_VALUE = 0.0
     TEMPERATURE_STEP = 0.01
 
+    # local cache directory (shared with the Speckle module)
+    CACHE_DIR = os.getenv("BIM_IR_CACHE_DIR", ".cache")
+
+    # source of the completions: "live", "record" (live, the completions are recorded) or "replay"
+    # (recorded completions only, no network, e.g. for the pipeline benchmark)
+    LLM_BACKEND = os.getenv("BIM_IR_LLM_BACKEND", "live")
+    REPLAY_PATH = os.getenv("BIM_IR_REPLAY_PATH", os.path.join(CACHE_DIR, "recordings", "completions.jsonl"))
+    # embedding backend: "openai" or "fake" (deterministic vectors from the hash of the text, no network)
+    EMBEDDING_BACKEND = os.getenv("BIM_IR_EMBEDDING_BACKEND", "openai")
+    FAKE_EMBEDDING_SIZE = 1536
+
+    # document retrieval: embedding model and splitting of the documents
+    EMBEDDING_MODEL = os.getenv("BIM_IR_EMBEDDING_MODEL", "text-embedding-ada-002")
+    CHUNK_SIZE = 1000
+    CHUNK_OVERLAP = 200
+    RETRIEVAL_K = 4
+    DOCUMENT_INDEX_DIR = os.path.join(CACHE_DIR, "document_indexes")
+
+    # embedding cache (keyed by embedding model and text hash)
+    EMBEDDING_CACHE_PATH = os.path.join(CACHE_DIR, "llm", "embeddings.db")
+    EMBEDDING_CACHE_MAX_MB = int(os.getenv("BIM_IR_EMBEDDING_CACHE_MAX_MB", 1024))
+    # texts and characters per embedding request, number of concurrent requests
+    EMBEDDING_BATCH_SIZE = 256
+    EMBEDDING_BATCH_MAX_CHARS = 400_000
+    EMBEDDING_CONCURRENCY = 4
+
+    # category router: minimum cosine similarity and margin to the second category, otherwise the LLM decides
+    CATEGORY_ROUTER_MIN_SCORE = float(os.getenv("BIM_IR_ROUTER_MIN_SCORE", 0.82))
+    CATEGORY_ROUTER_MIN_MARGIN = 0.01
+    # parameter names per category which are embedded
+    CATEGORY_ROUTER_MAX_PARAMETERS = 30
+
+    # local copies of the LangChain hub prompts, seconds until a prompt is pulled again
+    PROMPT_CACHE_DIR = os.path.join(CACHE_DIR, "prompts")
+    PROMPT_REFRESH_SECONDS = float(os.getenv("BIM_IR_PROMPT_REFRESH_SECONDS", 3600))
+    # seconds until a failed pull is tried again, the local copy is used in between
+    PROMPT_RETRY_SECONDS = float(os.getenv("BIM_IR_PROMPT_RETRY_SECONDS", 60))
+
+    # number of agent executors which are kept warm
+    AGENT_CACHE_SIZE = 16
+
+    # async mode of the central agent: the tool calls of one agent step run concurrently
+    ASYNC_TOOLS = os.getenv("BIM_IR_ASYNC_TOOLS", "true").lower() == "true"
+    # seconds until a tool call is cancelled (async mode), the agent answers without its result
+    TOOL_TIMEOUT_DEFAULT = float(os.getenv("BIM_IR_TOOL_TIMEOUT", 60))
+    # threads for the blocking work of the tools, shared by all sessions
+    TOOL_WORKERS = int(os.getenv("BIM_IR_TOOL_WORKERS", 8))
+    TOOL_TIMEOUTS = {
+        "BIM_IR_Tool": 180.0,
+        "BIM_SQL_Tool": 30.0,
+        "BIM_Schema_Tool": 10.0,
+        "document_retrieval": 20.0,
+        "Information_Tool": 30.0,
+    }
+
+    # semantic answer cache: minimum cosine similarity of a cached question, number of stored answers
+    ANSWER_CACHE_ENABLED = os.getenv("BIM_IR_ANSWER_CACHE", "true").lower() == "true"
+    ANSWER_CACHE_PATH = os.path.join(CACHE_DIR, "llm", "answers.db")
+    ANSWER_CACHE_THRESHOLD = float(os.getenv("BIM_IR_ANSWER_CACHE_THRESHOLD", 0.95))
+    ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("BIM_IR_ANSWER_CACHE_MAX_ENTRIES", 5000))
+
+    # plan cache: generated pandas code per table schema and question, re-executed without the LLM
+    PLAN_CACHE_ENABLED = os.getenv("BIM_IR_PLAN_CACHE", "true").lower() == "true"
+    PLAN_CACHE_PATH = os.path.join(CACHE_DIR, "llm", "plans.db")
+    PLAN_CACHE_MAX_ENTRIES = int(os.getenv("BIM_IR_PLAN_CACHE_MAX_ENTRIES", 5000))
+
+    # code sandbox: worker processes for the generated code, CPU seconds per call, private memory per worker
+    SANDBOX_ENABLED = os.getenv("BIM_IR_SANDBOX", "true").lower() == "true"
+    SANDBOX_WORKERS = int(os.getenv("BIM_IR_SANDBOX_WORKERS", 2))
+    SANDBOX_CPU_SECONDS = float(os.getenv("BIM_IR_SANDBOX_CPU_SECONDS", 30))
+    SANDBOX_MEMORY_MB = int(os.getenv("BIM_IR_SANDBOX_MEMORY_MB", 2048))
+    # tables shared with the workers (Arrow files), rows per streamed result chunk
+    SANDBOX_SPOOL_DIR = os.path.join(CACHE_DIR, "sandbox")
+    SANDBOX_CHUNK_ROWS = 500
+
+    # chat history of the agent: verbatim turns, older turns are folded into a summary by the summary model
+    HISTORY_TURNS = int(os.getenv("BIM_IR_HISTORY_TURNS", 4))
+    HISTORY_SUMMARY_MODEL = os.getenv("BIM_IR_HISTORY_SUMMARY_MODEL", "gpt-3.5-turbo")
+    # longer messages (tables, long answers) are shortened in the prompt, the full output stays in the chat
+    HISTORY_MAX_MESSAGE_CHARS = 1500
+    # the summary of the older turns keeps its end within this length (e.g. without summary model)
+    HISTORY_SUMMARY_MAX_CHARS = int(os.getenv("BIM_IR_HISTORY_SUMMARY_MAX_CHARS", 2000))
+    # tokens of the history in the prompt per model
+    HISTORY_TOKEN_BUDGETS = {
+        "gpt-4": 2000,
+        "gpt-3.5-turbo": 3000,
+        "claude-3-opus-20240229": 6000,
+    }
+    HISTORY_TOKEN_BUDGET_DEFAULT = int(os.getenv("BIM_IR_HISTORY_TOKEN_BUDGET", 2000))
+    # outputs of the chat pages (tables) which are stored on disk instead of the session state
+    CHAT_ARTIFACT_DIR = os.path.join(CACHE_DIR, "chat")
+
     def __init__(self, model=None, temperature = None) -> None:
         """initialize the LLM settings, set default values if not given"""
         self.model = model if model else self.MODEL_OPTIONS[0]
@@ -40,6 +121,10 @@ class LLMSettings():
         """return the possible models"""
         return self.MODEL_OPTIONS
     
+    def get_history_token_budget(self) -> int:
+        """ return the token budget of the chat history for the current model"""
+        return self.HISTORY_TOKEN_BUDGETS.get(self.model, self.HISTORY_TOKEN_BUDGET_DEFAULT)
+
     def use_claude_as_model(self):
         """ get the current claude model """
         self.model = "claude-3-opus-20240229"
@@ -53,19 +138,39 @@ class LLMSettings():
             return os.getenv("ANTHROPIC_API_KEY")
         
     def get_correct_langchain_llm(self):
-        """ provide the correct LLM for the langchain chatbots"""
-        if "gpt" in self.model:
-            return ChatOpenAI(model=self.model, temperature=self.temperature)
-        elif "claude" in self.model:
-            return ChatAnthropic(model=self.model, temperature=self.temperature)
-        else:
-            raise ValueError("Model not supported")
+        """ provide the correct LLM for the langchain chatbots, the tokens are streamed to the callbacks"""
+        return self.create_chat_model(self.model, self.temperature, streaming=True)
+
+    @classmethod
+    def create_chat_model(cls, model: str = "gpt-3.5-turbo", temperature: float = 0.0, streaming: bool = False):
+        """ creates a langchain chat model, with the replay backend it answers with recorded completions"""
+        if cls.LLM_BACKEND not in ["live", "record", "replay"]:
+            raise ValueError(f"LLM backend not supported: {cls.LLM_BACKEND}")
+        live_model = None
+        if cls.LLM_BACKEND != "replay":
+            if "gpt" in model:
+                from langchain_openai import ChatOpenAI
+                live_model = ChatOpenAI(model=model, temperature=temperature, streaming=streaming)
+            elif "claude" in model:
+                from langchain_anthropic import ChatAnthropic
+                live_model = ChatAnthropic(model=model, temperature=temperature, streaming=streaming)
+            else:
+                raise ValueError("Model not supported")
+        if cls.LLM_BACKEND == "live":
+            return live_model
+        from modules.llm.replay import ReplayChatModel, get_replay_store
+        return ReplayChatModel(store=get_replay_store(cls.REPLAY_PATH), model_name=f"{model}@{temperature}",
+                               live_model=live_model, streaming=streaming)
         
     def get_correct_pandasai_llm(self):
         """ provide the correct LLM for the pandasai agent
         
         PandasAI allows Langchain model as input"""
+        if self.LLM_BACKEND != "live":
+            from pandasai.llm.langchain import LangchainLLM
+            return LangchainLLM(self.create_chat_model(self.model, self.temperature))
         if "gpt" in self.model:
+            from pandasai.llm import OpenAI
             return OpenAI(model=self.model, temperature=self.temperature, openai_api_key=self.get_correct_api_key())
         # Anthropic currently not supported
         # elif "claude" in self.model:
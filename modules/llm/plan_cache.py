@@ -0,0 +1,145 @@
+from typing import Optional
+
+from pandas import DataFrame
+
+from modules.llm.llm_settings import LLMSettings
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+class PlanCache:
+
+    """
+    Generated pandas code (the plan of an answer), keyed by the schema fingerprint of the tables and the question.
+
+    Before an agent is asked, the cached code of the question is executed directly on the current tables,
+    which needs no LLM call. The fingerprint contains the column names and types of all tables, so a plan is only
+    used as long as the schema matches. If the execution fails, the plan is dropped and the agent generates it again.
+    Plans are stored per framework ("pandas_agent" for the LangChain pandas agent, "pandasai" for PandasAI).
+    """
+
+    # observation of the python tool of the pandas agent for failed code ("KeyError: 'Fläche'")
+    ERROR_OBSERVATION = re.compile(r"^\w*(Error|Exception)\b")
+
+    def __init__(self, path: str = None, max_entries: int = None) -> None:
+        self.path = path if path else LLMSettings.PLAN_CACHE_PATH
+        self.max_entries = max_entries if max_entries else LLMSettings.PLAN_CACHE_MAX_ENTRIES
+        self._lock = threading.Lock()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.failures = 0
+        self.evictions = 0
+
+        self._initialise()
+
+    def _initialise(self) -> None:
+        """ creates the database file and the table"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS plans(
+                framework TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                question TEXT NOT NULL,
+                code TEXT NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (framework, fingerprint, question))"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_plans_access ON plans(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def schema_fingerprint(dfs: list[DataFrame]) -> str:
+        """ hash of the column names and types of the tables (in order)"""
+        schema = [[[str(name), str(dtype)] for name, dtype in df.dtypes.items()] for df in dfs]
+        return hashlib.sha256(json.dumps(schema).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """ lower case, single spaces, without surrounding punctuation"""
+        return re.sub(r"\s+", " ", question.strip().lower()).strip(" ?!.")
+
+    def get(self, framework: str, dfs: list[DataFrame], question: str) -> Optional[str]:
+        """ returns the cached code for the question and the schema of the tables, None if there is none"""
+        key = (framework, self.schema_fingerprint(dfs), self.normalize_question(question))
+        with self._lock:
+            row = self._conn.execute("SELECT code FROM plans WHERE framework = ? AND fingerprint = ? AND question = ?",
+                                     key).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE plans SET last_access = ? WHERE framework = ? AND fingerprint = ? AND question = ?",
+                               (time.time(),) + key)
+            self._conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def put(self, framework: str, dfs: list[DataFrame], question: str, code: str) -> None:
+        """ stores the code which answered the question, the least recently used plans are evicted"""
+        if not code:
+            return
+        key = (framework, self.schema_fingerprint(dfs), self.normalize_question(question))
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO plans VALUES (?, ?, ?, ?, ?)", key + (code, time.time()))
+            self._conn.commit()
+            self._evict()
+
+    def drop(self, framework: str, dfs: list[DataFrame], question: str) -> None:
+        """ removes a plan whose execution failed"""
+        key = (framework, self.schema_fingerprint(dfs), self.normalize_question(question))
+        with self._lock:
+            self._conn.execute("DELETE FROM plans WHERE framework = ? AND fingerprint = ? AND question = ?", key)
+            self._conn.commit()
+        self.failures += 1
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "failures": self.failures, "evictions": self.evictions}
+
+    def _evict(self) -> None:
+        """ deletes the least recently used plans above the maximum number of entries, callers hold the lock"""
+        count = self._conn.execute("SELECT COUNT(*) FROM plans").fetchone()[0]
+        if count <= self.max_entries:
+            return
+        self._conn.execute("DELETE FROM plans WHERE rowid IN (SELECT rowid FROM plans ORDER BY last_access ASC LIMIT ?)",
+                           (count - self.max_entries,))
+        self._conn.commit()
+        self.evictions += count - self.max_entries
+
+    # --- code of the agents, executed by the code sandbox (see code_executor) ---
+
+    @staticmethod
+    def extract_agent_code(intermediate_steps: list) -> Optional[str]:
+        """ returns the code of the successful python tool calls of the LangChain pandas agent"""
+        code = []
+        for action, observation in intermediate_steps:
+            tool_input = action.tool_input
+            if action.tool != "python_repl_ast":
+                continue
+            query = tool_input.get("query") if isinstance(tool_input, dict) else tool_input
+            if query and not PlanCache.ERROR_OBSERVATION.match(str(observation)):
+                code.append(query)
+        return "\n\n".join(code) if code else None
+
+
+_plan_cache = None
+_plan_cache_lock = threading.Lock()
+
+
+def get_plan_cache() -> PlanCache:
+    """ returns the process wide plan cache"""
+    global _plan_cache
+    with _plan_cache_lock:
+        if _plan_cache is None:
+            _plan_cache = PlanCache()
+    return _plan_cache
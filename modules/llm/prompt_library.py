@@ -0,0 +1,117 @@
+from langchain import hub
+from langchain_core.load import dumps, loads
+from langchain_core.prompts import BasePromptTemplate
+
+from modules.llm.llm_settings import LLMSettings
+
+from abc import ABC
+from urllib.parse import quote
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+
+class PromptLibrary(ABC):
+
+    """
+    Local registry of the prompts from the LangChain hub.
+
+    Every pulled prompt is stored on disk as a version (hash of the serialized prompt), the pointer latest.json
+    refers to the newest version. A prompt is only pulled again after LLMSettings.PROMPT_REFRESH_SECONDS, in between
+    (and whenever the hub cannot be reached) the stored version is used. A failed pull is only tried again after
+    LLMSettings.PROMPT_RETRY_SECONDS. Loaded prompts are kept in memory.
+    Layout: <PROMPT_CACHE_DIR>/<prompt name>/<version>.json and latest.json
+    """
+
+    # (name, version) -> prompt
+    _prompts = {}
+    # name -> time of the next pull after a failed one
+    _retry_at = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get_from_langchain_hub(name: str) -> BasePromptTemplate:
+        """ returns the prompt, pulled from the hub or loaded from the local copy"""
+        return PromptLibrary.get_versioned_prompt(name)[0]
+
+    @staticmethod
+    def get_versioned_prompt(name: str) -> tuple[BasePromptTemplate, str]:
+        """ returns the prompt and its version
+
+        Args:
+            name (str): the hub name of the prompt (owner/repo or owner/repo:commit)
+
+        Returns:
+            tuple[BasePromptTemplate, str]: the prompt, the version of the prompt
+        """
+        with PromptLibrary._lock:
+            latest = PromptLibrary._read_latest(name)
+            now = time.time()
+            fresh = latest is not None and now - latest["fetched_at"] < LLMSettings.PROMPT_REFRESH_SECONDS
+            if not fresh and now >= PromptLibrary._retry_at.get(name, 0):
+                pulled = PromptLibrary._pull(name)
+                if pulled is None:
+                    PromptLibrary._retry_at[name] = now + LLMSettings.PROMPT_RETRY_SECONDS
+                else:
+                    PromptLibrary._retry_at.pop(name, None)
+                latest = pulled or latest
+            if latest is None:
+                raise ConnectionError(f"Prompt {name} can not be pulled from the LangChain hub and has no local copy")
+
+            key = (name, latest["version"])
+            if key not in PromptLibrary._prompts:
+                PromptLibrary._prompts[key] = PromptLibrary._load_version(name, latest["version"])
+            return PromptLibrary._prompts[key], latest["version"]
+
+    @staticmethod
+    def get_prompt_version(name: str) -> str:
+        """ returns the version of the prompt which is currently used"""
+        return PromptLibrary.get_versioned_prompt(name)[1]
+
+    @staticmethod
+    def _prompt_dir(name: str) -> str:
+        return os.path.join(LLMSettings.PROMPT_CACHE_DIR, quote(name, safe=""))
+
+    @staticmethod
+    def _read_latest(name: str):
+        path = os.path.join(PromptLibrary._prompt_dir(name), "latest.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    @staticmethod
+    def _pull(name: str):
+        """ pulls the prompt and stores it as new version, returns the latest pointer (None if the hub is not reachable)"""
+        try:
+            prompt = hub.pull(name)
+        except Exception as e:
+            print(f"Prompt {name} could not be pulled, using the local copy: {e}")
+            return None
+
+        serialized = dumps(prompt)
+        version = hashlib.sha256(serialized.encode("utf-8")).hexdigest()[:12]
+        prompt_dir = PromptLibrary._prompt_dir(name)
+        os.makedirs(prompt_dir, exist_ok=True)
+
+        latest = {"version": version, "fetched_at": time.time()}
+        PromptLibrary._write(os.path.join(prompt_dir, f"{version}.json"), serialized)
+        PromptLibrary._write(os.path.join(prompt_dir, "latest.json"), json.dumps(latest))
+        PromptLibrary._prompts.setdefault((name, version), prompt)
+        return latest
+
+    @staticmethod
+    def _load_version(name: str, version: str) -> BasePromptTemplate:
+        with open(os.path.join(PromptLibrary._prompt_dir(name), f"{version}.json"), "r", encoding="utf-8") as file:
+            return loads(file.read())
+
+    @staticmethod
+    def _write(path: str, content: str) -> None:
+        """ writes the file atomically, other processes never read partial files"""
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(tmp_path, path)
@@ -0,0 +1,169 @@
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+import hashlib
+import json
+import os
+import re
+import threading
+
+
+class ReplayMissError(KeyError):
+    pass
+
+
+class ReplayStore:
+
+    """
+    Recorded completions of the chat models, keyed by the hash of the model name, the prompt and the bound tools.
+
+    The recordings are a JSON lines file (one completion per line), so they can be kept next to a benchmark and
+    replayed without network. New recordings are appended, the last recording of a prompt wins.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = {}
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        record = json.loads(line)
+                        self._records[record["key"]] = record
+
+    @staticmethod
+    def get_key(model: str, messages: List[BaseMessage], stop: Optional[List[str]], kwargs: dict) -> str:
+        """ hash of the request, only the parts which determine the completion are used"""
+        prompt = []
+        for message in messages:
+            # streamed messages are chunks (e.g. AIMessageChunk), they are keyed like the complete messages
+            role = re.sub(r"MessageChunk$", "", message.type).lower()
+            extra = {name: message.additional_kwargs[name] for name in ["tool_calls", "function_call"]
+                     if name in message.additional_kwargs}
+            prompt.append([role, message.content, extra, getattr(message, "tool_call_id", None)])
+        request = {
+            "model": model,
+            "prompt": prompt,
+            "stop": stop,
+            "tools": {name: kwargs[name] for name in ["tools", "functions", "tool_choice"] if name in kwargs},
+        }
+        return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[BaseMessage]:
+        """ returns the recorded message or None"""
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return messages_from_dict([record["message"]])[0]
+
+    def put(self, key: str, model: str, messages: List[BaseMessage], message: BaseMessage) -> BaseMessage:
+        """ appends the completion to the recordings, returns the message like it is replayed"""
+        # chunks of a streamed completion are stored as complete message
+        message = AIMessage(content=message.content, additional_kwargs=message.additional_kwargs)
+        record = {
+            "key": key,
+            "model": model,
+            # the end of the prompt helps to find a recording in the file
+            "prompt": str(messages[-1].content)[-200:] if messages else "",
+            "message": message_to_dict(message),
+        }
+        with self._lock:
+            self._records[key] = record
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self.recorded += 1
+        return message
+
+    def get_stats(self) -> dict:
+        """ returns the counters of the store"""
+        return {"records": len(self._records), "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+class ReplayChatModel(BaseChatModel):
+
+    """
+    Chat model which answers with recorded completions, no network is needed.
+
+    With a live model, missing completions are requested from it and recorded (record mode), without one
+    a missing completion raises a ReplayMissError. With streaming, the replayed completion is sent to the
+    callbacks token by token like a streamed completion of the live model.
+    """
+
+    store: Any
+    model_name: str = "replay"
+    live_model: Optional[BaseChatModel] = None
+    streaming: bool = False
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay-chat-model"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Optional[CallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        key = self.store.get_key(self.model_name, messages, stop, kwargs)
+        message = self.store.get(key)
+        if message is None:
+            live_result = self._get_live_model()._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return self._result(self.store.put(key, self.model_name, messages, live_result.generations[0].message))
+        if self.streaming and run_manager is not None:
+            for token in self._tokens(message):
+                run_manager.on_llm_new_token(token)
+        return self._result(message)
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                         run_manager: Optional[AsyncCallbackManagerForLLMRun] = None, **kwargs: Any) -> ChatResult:
+        key = self.store.get_key(self.model_name, messages, stop, kwargs)
+        message = self.store.get(key)
+        if message is None:
+            live_result = await self._get_live_model()._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            return self._result(self.store.put(key, self.model_name, messages, live_result.generations[0].message))
+        if self.streaming and run_manager is not None:
+            for token in self._tokens(message):
+                await run_manager.on_llm_new_token(token)
+        return self._result(message)
+
+    def _get_live_model(self) -> BaseChatModel:
+        if self.live_model is None:
+            raise ReplayMissError(f"No recorded completion of {self.model_name} for this prompt "
+                                  f"(record it with BIM_IR_LLM_BACKEND=record)")
+        return self.live_model
+
+    @staticmethod
+    def _tokens(message: BaseMessage) -> Iterator[str]:
+        return iter(re.findall(r"\S+\s*|\s+", message.content if isinstance(message.content, str) else ""))
+
+    @staticmethod
+    def _result(message: BaseMessage) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+_replay_stores = {}
+_replay_stores_lock = threading.Lock()
+
+
+def get_replay_store(path: str) -> ReplayStore:
+    """ returns the process wide store of the recordings file"""
+    path = os.path.abspath(path)
+    with _replay_stores_lock:
+        if path not in _replay_stores:
+            _replay_stores[path] = ReplayStore(path)
+        return _replay_stores[path]
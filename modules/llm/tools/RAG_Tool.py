@@ -1,45 +1,51 @@
 from langchain.pydantic_v1 import BaseModel, Field
-from langchain.tools import tool
+from langchain_core.tools import StructuredTool
 
-from langchain_community.document_loaders import PyMuPDFLoader
-from langchain_community.vectorstores import FAISS
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-
-from langchain_core.tools import create_retriever_tool, Tool
-from langchain_openai import OpenAIEmbeddings
+from modules.llm.document_index import get_document_index_store
+from modules.llm.llm_settings import LLMSettings
+from modules.llm.tools.async_tools import run_in_thread
 
 
 """ tools for Retrieval Augmented Generation """
 
+# the document of the local building code
+BAYBO_PATH = "documents/BayBO.pdf"
+
+
 class RAGToolInput(BaseModel):
     query: str = Field(description="The knowledge query to the agent")
 
 
-@tool("document_retrieval", args_schema=RAGToolInput)
-def rag_tool(query: str):
+def search_building_code(query: str) -> str:
     """Search for information about the local building code.
     For any questions about the local building code, you must use this tool!
     """
-    
-    baybo_description = """Search for information about the local building code.
-    For any questions about the local building code, you must use this tool!
-    """
 
-    # Get the PDF loader and load the document
-    loader = PyMuPDFLoader("documents/BayBO.pdf")
-    docs = loader.load()
+    # the index of the document is built once and then loaded from disk
+    vector_db = get_document_index_store().get_vectorstore(BAYBO_PATH)
+
+    # one query embedding and one search
+    documents = vector_db.similarity_search(query, k=LLMSettings.RETRIEVAL_K)
+
+    return _format_documents(documents)
+
+
+async def asearch_building_code(query: str) -> str:
+    """ asynchronous version of search_building_code, for the parallel tool calls of the central agent"""
+    vector_db = await run_in_thread(get_document_index_store().get_vectorstore, BAYBO_PATH)
+    documents = await vector_db.asimilarity_search(query, k=LLMSettings.RETRIEVAL_K)
+    return _format_documents(documents)
 
-    # split the documents into chunks
-    documents = RecursiveCharacterTextSplitter(
-        chunk_size=1000, chunk_overlap=200
-    ).split_documents(docs)
 
-    # get the embeddings for the documents via FAISS
-    vector_db = FAISS.from_documents(documents, OpenAIEmbeddings())
-    # use vectors as retriever
-    retriever = vector_db.as_retriever()
+def _format_documents(documents: list) -> str:
+    # return the retrieved passages with their page
+    return "\n\n".join(f"[page {doc.metadata.get('page', '?')}] {doc.page_content}" for doc in documents)
 
-    # initialize the retriever tool
-    tool = create_retriever_tool(retriever, "baybo_retrieval", baybo_description)
 
-    return tool
\ No newline at end of file
+rag_tool = StructuredTool.from_function(
+    func=search_building_code,
+    coroutine=asearch_building_code,
+    name="document_retrieval",
+    description=search_building_code.__doc__,
+    args_schema=RAGToolInput,
+)
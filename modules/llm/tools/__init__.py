@@ -1,5 +1,28 @@
-from .RAG_Tool import rag_tool
-from .pandas_extraction_tool import pandas_extraction
-from .bim_ir_tool import bim_ir_tool
-from .information_tool import information_tool
-from .retriever_tool import get_retriever_tool
+from importlib import import_module
+
+# the tools (and their dependencies) are imported on first access, e.g. by the LangChain agent
+# the submodules bim_ir_tool and information_tool have the name of their tool, once a submodule is imported
+# directly the package attribute is the module, so the agents import the tools from the submodules
+_TOOLS = {
+    "rag_tool": ".RAG_Tool",
+    "pandas_extraction": ".pandas_extraction_tool",
+    "bim_ir_tool": ".bim_ir_tool",
+    "information_tool": ".information_tool",
+    "get_retriever_tool": ".retriever_tool",
+    "bim_sql_tool": ".sql_tool",
+    "bim_schema_tool": ".sql_tool",
+}
+
+__all__ = list(_TOOLS)
+
+
+def __getattr__(name: str):
+    if name not in _TOOLS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_TOOLS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
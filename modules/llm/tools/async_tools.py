@@ -0,0 +1,128 @@
+from typing import Any, Callable, Coroutine, Optional
+
+from streamlit.runtime.scriptrunner.script_run_context import (
+    SCRIPT_RUN_CONTEXT_ATTR_NAME, add_script_run_ctx, get_script_run_ctx
+)
+
+from modules.llm.llm_settings import LLMSettings
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+import asyncio
+import contextvars
+import threading
+
+
+""" helper for the asynchronous implementations of the tools """
+
+
+# Streamlit script context of the session which started the agent run (the event loop thread has none)
+_script_run_ctx: ContextVar = ContextVar("bim_ir_script_run_ctx", default=None)
+# set when the awaiting tool call was cancelled (timeout), long running work can stop early
+_cancel_event: ContextVar[Optional[threading.Event]] = ContextVar("bim_ir_cancel_event", default=None)
+
+
+def get_cancel_event() -> Optional[threading.Event]:
+    """ returns the cancel event of the running tool call (None outside of run_in_thread)"""
+    return _cancel_event.get()
+
+
+@contextmanager
+def script_run_context(ctx):
+    """ gives the current thread the Streamlit script context for the time of the block"""
+    thread = threading.current_thread()
+    previous = getattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, None)
+    if ctx is not None:
+        add_script_run_ctx(thread, ctx)
+    try:
+        yield
+    finally:
+        # event loop and executor threads are shared by all sessions
+        setattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME, previous)
+
+
+def get_current_script_run_ctx():
+    """ the script context of the session, also inside the agent event loop"""
+    ctx = _script_run_ctx.get()
+    return ctx if ctx is not None else get_script_run_ctx()
+
+
+_tool_executor = None
+_agent_loop = None
+_lock = threading.Lock()
+
+
+def get_tool_executor() -> ThreadPoolExecutor:
+    """ returns the process wide thread pool of the tools
+
+    unlike the default executor of an event loop it is never shut down, so a run does not wait for tool calls
+    which were abandoned after their timeout"""
+    global _tool_executor
+    with _lock:
+        if _tool_executor is None:
+            _tool_executor = ThreadPoolExecutor(max_workers=LLMSettings.TOOL_WORKERS, thread_name_prefix="bim-ir-tool")
+    return _tool_executor
+
+
+def get_agent_loop() -> asyncio.AbstractEventLoop:
+    """ returns the long-lived event loop of the agent runs (background thread)
+
+    the async clients of the cached chat models are bound to the loop of their first request,
+    so all runs of the process use the same loop"""
+    global _agent_loop
+    with _lock:
+        if _agent_loop is None:
+            _agent_loop = asyncio.new_event_loop()
+            threading.Thread(target=_agent_loop.run_forever, name="bim-ir-agent-loop", daemon=True).start()
+    return _agent_loop
+
+
+def run_on_agent_loop(coroutine: Coroutine) -> Any:
+    """ runs the coroutine on the agent event loop and waits for its result
+
+    the coroutine gets the context variables of the caller (e.g. the running trace span) and the Streamlit
+    script context of the session (see get_current_script_run_ctx)"""
+    loop = get_agent_loop()
+    context = contextvars.copy_context()
+    context.run(_script_run_ctx.set, get_script_run_ctx())
+    result = Future()
+
+    def start():
+        # the task copies the context of this callback
+        task = loop.create_task(coroutine)
+
+        def done(task: asyncio.Task):
+            if task.cancelled():
+                result.cancel()
+            elif task.exception() is not None:
+                result.set_exception(task.exception())
+            else:
+                result.set_result(task.result())
+        task.add_done_callback(done)
+
+    loop.call_soon_threadsafe(start, context=context)
+    return result.result()
+
+
+async def run_in_thread(func: Callable, *args, **kwargs) -> Any:
+    """ runs blocking work (SQLite, DuckDB, embeddings, the Speckle API) in the thread pool of the tools
+
+    the thread gets the Streamlit script context of the session for the time of the call, so the work can read the
+    session state and write into the elements of the session, and the context variables of the caller
+    (e.g. the running trace span). If the call is cancelled (tool timeout), its cancel event is set
+    (see get_cancel_event), e.g. the code sandbox then kills its worker"""
+    ctx = get_current_script_run_ctx()
+    cancel = threading.Event()
+    context = contextvars.copy_context()
+    context.run(_cancel_event.set, cancel)
+
+    def run():
+        with script_run_context(ctx):
+            return context.run(func, *args, **kwargs)
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(get_tool_executor(), run)
+    except asyncio.CancelledError:
+        cancel.set()
+        raise
@@ -1,39 +1,182 @@
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
-from langchain_experimental.agents import create_pandas_dataframe_agent
-from langchain_core.tools import tool
+from langchain.prompts import ChatPromptTemplate
+from langchain.schema import StrOutputParser
+from langchain_core.callbacks import Callbacks
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.tools import StructuredTool
 from langchain_core.pydantic_v1 import BaseModel, Field
-from langchain_openai import ChatOpenAI
 
-from modules.llm.tools import pandas_extraction
+from modules.llm.answer_cache import get_answer_cache
+from modules.llm.code_executor import SandboxError, execute_code
+from modules.llm.llm_settings import LLMSettings
+from modules.llm.plan_cache import PlanCache, get_plan_cache
+from modules.llm.tools.pandas_extraction_tool import extract_dataframes
+from modules.llm.tools.async_tools import run_in_thread
+from modules.llm.tools.sandbox_tool import use_sandboxed_python_tool
+from modules.speckle.data_handler.base_handler import BaseHandler
+from modules.speckle.projects import SpeckleProject
+from modules.tracing import span
+
+from pandas import DataFrame
+import streamlit as st
+
+
+# characters of the result of a cached plan which are given to the LLM
+PLAN_RESULT_MAX_CHARS = 4000
+
+# prompt which phrases the result of a cached plan as answer
+PLAN_ANSWER_TEMPLATE = """Answer the question "{input}" about the BIM model in the language of the question.
+
+The following pandas code was executed on the tables of the model to answer it:
+{code}
+
+Result of the code:
+{result}
+
+Answer only with the information of the result."""
 
 
 class BIMIR_ToolInput(BaseModel):
     question: str = Field(description="should be the question")
 
 
-@tool("BIM_IR_Tool", args_schema=BIMIR_ToolInput, return_direct=False)
-def bim_ir_tool(question: str) -> dict[str, Any]:
+def answer_bim_question(question: str, callbacks: Callbacks = None) -> dict[str, Any]:
     """This tool can answer questions based on project data. It returns the answer to the question."""
+    cached_result, agent_executor, state = _prepare_answer(question)
+    if cached_result is not None:
+        return cached_result
+
+    result = agent_executor.invoke({"input": question}, config={"callbacks": callbacks})
+
+    _store_answer(question, result, state)
+    return result
+
+
+async def aanswer_bim_question(question: str, callbacks: Callbacks = None) -> dict[str, Any]:
+    """ asynchronous version of answer_bim_question, for the parallel tool calls of the central agent"""
+    # cache lookups, category routing and loading of the tables block
+    cached_result, agent_executor, state = await run_in_thread(_prepare_answer, question)
+    if cached_result is not None:
+        return cached_result
+
+    result = await agent_executor.ainvoke({"input": question}, config={"callbacks": callbacks})
+
+    await run_in_thread(_store_answer, question, result, state)
+    return result
+
+
+def _prepare_answer(question: str, project: SpeckleProject = None) -> tuple[Optional[dict], Any, tuple]:
+    """ returns the cached result of the question or the pandas agent which answers it (about the project of the
+    session if no project is given). If a cached plan of the question runs, the chain which phrases its value is
+    returned instead of the agent.
+
+    Returns:
+        tuple: the cached result (None if there is none), the agent executor (or chain), the state for _store_answer
+    """
+    # answers of the same or a similar question about the same model version are reused
+    project = project if project else SpeckleProject(st.session_state.get("project_name"))
+    version_id = project.get_version_id()
+    answer_cache = get_answer_cache() if LLMSettings.ANSWER_CACHE_ENABLED else None
+    if answer_cache is not None:
+        cached = answer_cache.lookup(version_id, "bim_ir", question)
+        if cached is not None:
+            return {"input": question, "output": cached.answer, "intermediate_steps": [], "cached": True,
+                    "cached_question": cached.question, "code": cached.code, "cached_steps": cached.steps}, None, ()
+
+    # the pandas agent (langchain_experimental) is loaded with the first question which is not cached
+    from langchain_experimental.agents import create_pandas_dataframe_agent
+    from langchain_experimental.agents.agent_toolkits.pandas.prompt import PREFIX_FUNCTIONS, MULTI_DF_PREFIX_FUNCTIONS
 
     # get the correct project categories
     # returns list of dataframes, see category_extraction tool
-    df_list = pandas_extraction(question)
+    df_list = extract_dataframes(question, project)
+    basehandler = project.get_basehandler()
+
+    # a single dataframe is passed as df, several ones as df1, df2, ...
+    if len(df_list) == 1:
+        prefix = PREFIX_FUNCTIONS + _describe_schema(basehandler, df_list[0])
+    else:
+        # the multi dataframe prefix is formatted with the number of dataframes
+        schemas = "".join(_describe_schema(basehandler, df, f"df{i + 1}") for i, df in enumerate(df_list))
+        prefix = MULTI_DF_PREFIX_FUNCTIONS + schemas.replace("{", "{{").replace("}", "}}")
 
-    # take only the first dataframe
-    if len(df_list) >= 1:
-        df_list = df_list[0]
+    # the cached code of the question is executed directly as long as the schema of the tables matches
+    plan_cache = get_plan_cache() if LLMSettings.PLAN_CACHE_ENABLED else None
+    code = plan_cache.get("pandas_agent", df_list, question) if plan_cache else None
+    if code is not None:
+        with span("plan_cache.execute", kind="code") as plan_span:
+            try:
+                value = execute_code(code, df_list, "pandas_agent")
+            except SandboxError as e:
+                # the plan does not fit the data anymore, the agent generates it again
+                if plan_span is not None:
+                    plan_span.error = f"{type(e).__name__}: {e}"
+                plan_cache.drop("pandas_agent", df_list, question)
+            else:
+                # the value of the code is phrased as answer, the answer is stored by _store_answer
+                return None, _create_plan_answer_chain(question, code, value), (version_id, df_list, answer_cache, None)
 
-    # assign LLM
-    llm = ChatOpenAI()
+    # assign LLM, the tokens are streamed to the callbacks of the calling agent
+    llm = LLMSettings.create_chat_model(temperature=0.7, streaming=True)
 
-    # use the pandas dataframe agent
+    # the python tool of the agent runs the code on its tables in this process unless the sandbox is used,
+    # the tables are shared by all sessions, so it then gets copies
+    agent_dfs = df_list if LLMSettings.SANDBOX_ENABLED else [df.copy() for df in df_list]
+
+    # use the pandas dataframe agent, the prompt contains the precomputed parameter schema
     agent_executor = create_pandas_dataframe_agent(
         llm,
-        df_list,
+        agent_dfs[0] if len(agent_dfs) == 1 else agent_dfs,
+        prefix=prefix,
         agent_type="openai-tools",
         return_intermediate_steps=True,
         verbose=True
     )
+    # the generated code runs in the worker processes of the code sandbox, not in the Streamlit server
+    if LLMSettings.SANDBOX_ENABLED:
+        use_sandboxed_python_tool(agent_executor, df_list)
+
+    return None, agent_executor, (version_id, df_list, answer_cache, plan_cache)
+
+
+def _create_plan_answer_chain(question: str, code: str, value: Any) -> Runnable:
+    """ returns the chain which phrases the value of a cached plan as answer, its result is shaped like the result of
+    the pandas agent"""
+    result = value.to_string(max_rows=50) if isinstance(value, DataFrame) else str(value)
+    prompt = ChatPromptTemplate.from_template(PLAN_ANSWER_TEMPLATE).partial(
+        code=code, result=result[:PLAN_RESULT_MAX_CHARS])
+    llm = LLMSettings.create_chat_model(temperature=0, streaming=True)
+    return prompt | llm | StrOutputParser() | RunnableLambda(
+        lambda answer: {"input": question, "output": answer, "intermediate_steps": [], "plan_cached": True, "code": code})
+
+
+def _store_answer(question: str, result: dict, state: tuple) -> None:
+    """ stores the generated code and the answer of the pandas agent (or of a cached plan)"""
+    version_id, df_list, answer_cache, plan_cache = state
+    intermediate_steps = result.get("intermediate_steps", [])
+    if plan_cache is not None:
+        plan_cache.put("pandas_agent", df_list, question, PlanCache.extract_agent_code(intermediate_steps))
+    if answer_cache is not None:
+        code, steps = answer_cache.from_intermediate_steps(intermediate_steps)
+        answer_cache.store(version_id, "bim_ir", question, result["output"], code=code or result.get("code"),
+                           steps=steps)
+
+
+bim_ir_tool = StructuredTool.from_function(
+    func=answer_bim_question,
+    coroutine=aanswer_bim_question,
+    name="BIM_IR_Tool",
+    description=answer_bim_question.__doc__,
+    args_schema=BIMIR_ToolInput,
+    return_direct=False,
+)
+
 
-    return agent_executor.invoke({"input": question})
+def _describe_schema(basehandler: BaseHandler, df: DataFrame, name: str = "The dataframe") -> str:
+    """ describes the parameters of the dataframe's category (dtype, fill rate, units) for the prompt"""
+    category = df.attrs.get("category") if isinstance(df, DataFrame) else None
+    if category is None:
+        return ""
+    schema = basehandler.get_category_schema(category)
+    return f"\n{name} contains the elements of the category {category}, its columns are:\n{schema.describe(max_parameters=50)}\n"
@@ -1,11 +1,12 @@
 from langchain.prompts import ChatPromptTemplate
 from langchain.schema import StrOutputParser
-from langchain_community.chat_models import ChatOpenAI
 from langchain.callbacks.tracers import ConsoleCallbackHandler
 from langchain.pydantic_v1 import BaseModel, Field
-from langchain.tools import tool
+from langchain_core.tools import StructuredTool
 
 
+from modules.llm.llm_settings import LLMSettings
+from modules.llm.tools.async_tools import run_in_thread
 from modules.speckle.projects import SpeckleProject
 
 import streamlit as st
@@ -14,8 +15,7 @@ class Information_ToolInput(BaseModel):
     question: str = Field(description="should be the question")
 
 
-@tool("Information_Tool", args_schema=Information_ToolInput)
-def information_tool(question: str) -> str:
+def answer_project_information(question: str) -> str:
     """This tool can answer basic information about the project. 
     
     Following things are given in the Project Information: Author, Name, Adresse, Latitude, Organization Name of the Software, and other similar ones.
@@ -24,6 +24,20 @@ def information_tool(question: str) -> str:
 
     It returns the answer to the question."""
 
+    chain, inputs = _build_chain(question)
+    return chain.invoke(inputs, config={'callbacks': [ConsoleCallbackHandler()]})
+
+
+async def aanswer_project_information(question: str) -> str:
+    """ asynchronous version of answer_project_information, for the parallel tool calls of the central agent"""
+    # the project information is loaded from the Speckle model (blocking)
+    chain, inputs = await run_in_thread(_build_chain, question)
+    return await chain.ainvoke(inputs, config={'callbacks': [ConsoleCallbackHandler()]})
+
+
+def _build_chain(question: str):
+    """ returns the chain and its inputs for the question"""
+
     template = """In the following I provide you with information about the project. Please ask me a question about the project.
 
     Project Information: {information}
@@ -44,7 +58,7 @@ def information_tool(question: str) -> str:
 
     # build up LLM
     prompt = ChatPromptTemplate.from_template(template)
-    model = ChatOpenAI()
+    model = LLMSettings.create_chat_model(temperature=0.7)
     output_parser = StrOutputParser()
 
     chain = (
@@ -53,5 +67,13 @@ def information_tool(question: str) -> str:
             | output_parser
     )
 
-    return chain.invoke({"question": question, "information": project_information},
-                           config={'callbacks': [ConsoleCallbackHandler()]})
+    return chain, {"question": question, "information": project_information}
+
+
+information_tool = StructuredTool.from_function(
+    func=answer_project_information,
+    coroutine=aanswer_project_information,
+    name="Information_Tool",
+    description=answer_project_information.__doc__,
+    args_schema=Information_ToolInput,
+)
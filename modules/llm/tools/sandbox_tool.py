@@ -0,0 +1,52 @@
+from langchain_core.tools import StructuredTool
+from langchain_core.pydantic_v1 import BaseModel, Field
+
+from modules.llm.code_executor import SandboxError, execute_code
+from modules.llm.tools.async_tools import run_in_thread
+
+from pandas import DataFrame
+
+
+# name and input of the python tool of the pandas dataframe agent, the agent's prompt refers to them
+PYTHON_TOOL_NAME = "python_repl_ast"
+
+
+class SandboxedPython_ToolInput(BaseModel):
+    query: str = Field(description="code snippet to run")
+
+
+def create_sandboxed_python_tool(dfs: list[DataFrame]) -> StructuredTool:
+    """ creates a replacement of the python tool of the pandas dataframe agent which runs the code in the code sandbox
+
+    the sandbox keeps no state between calls, the successful earlier snippets are executed again (without output)
+    before each snippet, so variables defined in earlier steps are available"""
+    history = []
+
+    def run_code(query: str) -> str:
+        try:
+            result = execute_code(query, dfs, "pandas_agent", setup=list(history))
+        except SandboxError as e:
+            # same observation as the python tool, the agent can correct the code with it
+            return str(e)
+        history.append(query)
+        return str(result)
+
+    async def arun_code(query: str) -> str:
+        # waiting for the worker blocks
+        return await run_in_thread(run_code, query)
+
+    return StructuredTool.from_function(
+        func=run_code,
+        coroutine=arun_code,
+        name=PYTHON_TOOL_NAME,
+        description="A Python shell. Use this to execute python commands. Input should be a valid python command. "
+                    "When using this tool, sometimes output is abbreviated - make sure it does not look abbreviated "
+                    "before using it in your answer.",
+        args_schema=SandboxedPython_ToolInput,
+    )
+
+
+def use_sandboxed_python_tool(agent_executor, dfs: list[DataFrame]) -> None:
+    """ replaces the python tool of a pandas dataframe agent (the LLM only knows its name and input)"""
+    sandboxed_tool = create_sandboxed_python_tool(dfs)
+    agent_executor.tools = [sandboxed_tool if tool.name == PYTHON_TOOL_NAME else tool for tool in agent_executor.tools]
@@ -0,0 +1,76 @@
+from typing import Callable
+
+from langchain_core.tools import StructuredTool
+from langchain_core.pydantic_v1 import BaseModel, Field
+
+from modules.llm.tools.async_tools import run_in_thread
+from modules.speckle.data_handler.query_engine import DuckDBQueryEngine
+from modules.speckle.projects import SpeckleProject
+
+import streamlit as st
+
+
+# rows of a query result which are returned to the agent
+MAX_RESULT_ROWS = 50
+
+
+class BIMSQL_ToolInput(BaseModel):
+    query: str = Field(description="should be a read-only DuckDB SQL query over the tables of the BIM_Schema_Tool")
+
+
+class BIMSchema_ToolInput(BaseModel):
+    table: str = Field(default="", description="should be a table name, leave it empty to describe all tables")
+
+
+def create_sql_tools(get_engine: Callable[[], DuckDBQueryEngine]) -> list[StructuredTool]:
+    """ creates the SQL and the schema tool for the query engine returned by get_engine"""
+
+    def run_query(query: str) -> str:
+        try:
+            df = get_engine().query(query, max_rows=MAX_RESULT_ROWS + 1)
+        except Exception as e:
+            # the agent can correct the query with the error message
+            return f"Error: {e}"
+        if len(df) > MAX_RESULT_ROWS:
+            return df.head(MAX_RESULT_ROWS).to_string(index=False) + f"\n(only the first {MAX_RESULT_ROWS} rows are shown, aggregate the result)"
+        return df.to_string(index=False)
+
+    def describe_tables(table: str = "") -> str:
+        description = get_engine().describe_tables(table or None)
+        return description if description else f"Error: unknown table {table}"
+
+    # DuckDB blocks, the asynchronous versions run in a thread (one cursor per thread)
+    async def arun_query(query: str) -> str:
+        return await run_in_thread(run_query, query)
+
+    async def adescribe_tables(table: str = "") -> str:
+        return await run_in_thread(describe_tables, table)
+
+    sql_tool = StructuredTool.from_function(
+        func=run_query,
+        coroutine=arun_query,
+        name="BIM_SQL_Tool",
+        description="""This tool runs a SQL query (DuckDB dialect, only SELECT) over the project data.
+        Every category of the model is a table, one row per element, the columns are the parameters of the elements.
+        Use it for counts, sums, filters and comparisons across categories. Get the tables and columns with the BIM_Schema_Tool first.
+        The table elements contains the level, family, type and host (host_id) of every element, join it over element_id
+        for questions across categories (e.g. doors hosted by walls on a level).
+        Quote column names with double quotes. It returns the result table.""",
+        args_schema=BIMSQL_ToolInput,
+    )
+    schema_tool = StructuredTool.from_function(
+        func=describe_tables,
+        coroutine=adescribe_tables,
+        name="BIM_Schema_Tool",
+        description="This tool returns the tables of the project data (one per category) with their columns and types.",
+        args_schema=BIMSchema_ToolInput,
+    )
+    return [sql_tool, schema_tool]
+
+
+def _get_session_engine() -> DuckDBQueryEngine:
+    # the engine of the project of the current page
+    return SpeckleProject(name=st.session_state.get("project_name")).get_query_engine()
+
+
+bim_sql_tool, bim_schema_tool = create_sql_tools(_get_session_engine)
@@ -0,0 +1,103 @@
+from typing import Optional
+
+from specklepy.api.client import SpeckleClient
+from specklepy.api.models import Commit
+from specklepy.transports.server import ServerTransport
+
+from modules.speckle.speckle_settings import SpeckleSettings
+
+from cachetools import TTLCache
+from requests.adapters import HTTPAdapter
+import hashlib
+import threading
+
+
+class SpeckleClientPool:
+
+    """
+    Reuses authenticated Speckle clients and server transports.
+
+    Clients are keyed by host and token, transports additionally by stream id. The HTTP session
+    of a transport is kept alive, so the objects of later requests are downloaded over the already
+    open connections. The resolution stream -> branch -> latest commit is cached for a short time.
+    """
+
+    def __init__(self, resolve_ttl: float = None) -> None:
+        self._clients = {}
+        self._transports = {}
+        self._latest_commits = TTLCache(maxsize=256, ttl=resolve_ttl if resolve_ttl else SpeckleSettings.VERSION_RESOLVE_TTL)
+        self._lock = threading.RLock()
+
+    def get_client(self, host: str, token: str) -> SpeckleClient:
+        """ returns an authenticated client for the host, authenticates only once per host and token"""
+        key = (host, self._hash_token(token))
+        with self._lock:
+            if key not in self._clients:
+                client = SpeckleClient(host=host)
+                client.authenticate_with_token(token)
+                self._clients[key] = client
+            return self._clients[key]
+
+    def get_transport(self, host: str, token: str, stream_id: str) -> ServerTransport:
+        """ returns a server transport for the stream, its HTTP session is reused with keep-alive"""
+        key = (host, self._hash_token(token), stream_id)
+        with self._lock:
+            if key not in self._transports:
+                transport = ServerTransport(client=self.get_client(host, token), stream_id=stream_id)
+                # keep more connections open for concurrent downloads
+                adapter = HTTPAdapter(pool_connections=SpeckleSettings.HTTP_POOL_SIZE,
+                                      pool_maxsize=SpeckleSettings.HTTP_POOL_SIZE, max_retries=3)
+                transport.session.mount("https://", adapter)
+                transport.session.mount("http://", adapter)
+                self._transports[key] = transport
+            return self._transports[key]
+
+    def get_latest_commit(self, host: str, token: str, stream_id: str, model_id: str) -> Optional[Commit]:
+        """ returns the latest commit of a model (branch), cached for a short time
+
+        Args:
+            host (str): the Speckle server
+            token (str): the auth token
+            stream_id (str): id of the stream (project)
+            model_id (str): id of the branch (model)
+
+        Returns:
+            Commit: the latest commit, None if the model has no commits
+        """
+        key = (host, self._hash_token(token), stream_id, model_id)
+        with self._lock:
+            if key in self._latest_commits:
+                return self._latest_commits[key]
+
+        client = self.get_client(host, token)
+        stream = client.stream.get(stream_id)
+        model = next((branch for branch in stream.branches.items
+                    if branch.id == model_id), None)
+        commit = model.commits.items[0] if model and model.commits.items else None
+
+        with self._lock:
+            self._latest_commits[key] = commit
+        return commit
+
+    def invalidate_latest_commits(self) -> None:
+        """ forgets the cached commit resolutions, e.g. after a new version was pushed"""
+        with self._lock:
+            self._latest_commits.clear()
+
+    @staticmethod
+    def _hash_token(token: str) -> str:
+        """ the token itself is not used as key"""
+        return hashlib.sha256((token or "").encode("utf-8")).hexdigest()
+
+
+_client_pool = None
+_client_pool_lock = threading.Lock()
+
+
+def get_client_pool() -> SpeckleClientPool:
+    """ returns the process wide client pool"""
+    global _client_pool
+    with _client_pool_lock:
+        if _client_pool is None:
+            _client_pool = SpeckleClientPool()
+    return _client_pool
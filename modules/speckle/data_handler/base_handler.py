@@ -2,14 +2,25 @@ from specklepy.objects.base import Base
 from pandas import DataFrame
 import pandas as pd
 
-from .built_element_handler import BuiltElementsHandler
+from .columnar_builder import ColumnarTableBuilder
+from .element_index import ElementIndex
+from .schema_index import SchemaIndex, CategorySchema
+from .table_store import ParquetTableStore, get_table_store
+from modules.tracing import traced
+
+import threading
 
 
 class BaseHandler:
     """ this class handles all operations regarding the overall base object"""
 
-    def __init__(self, base: Base) -> None:
-        """ initialize the BaseHandler with a Base object, load all detachable categories from the Base object"""
+    # name of the materialized element index (not a category)
+    ELEMENT_INDEX_TABLE = "__elements"
+
+    def __init__(self, base: Base, version_id: str = None, table_store: ParquetTableStore = None) -> None:
+        """ initialize the BaseHandler with a Base object, load all detachable categories from the Base object
+
+        with a version id, the category tables are materialized as Parquet files keyed by version and category"""
         if "@Types" in base.get_dynamic_member_names():
             # new Speckle data format
             self.base = base["@Types"]
@@ -23,6 +34,29 @@ class BaseHandler:
             if name in self.categories:
                 self.categories.remove(name)
 
+        # cached tables with all parameters and the element ids of their rows
+        self._dataframes = {}
+        self._row_ids = {}
+        # tables with the keys of the element index, kept so the same object is shared (e.g. with the code sandbox)
+        self._linked_dataframes = {}
+        # estimated memory of the cached tables, measured once per table
+        self._table_nbytes = {}
+        # called after a table was cached (e.g. the memory budget of the model registry is checked)
+        self.on_table_cached = None
+
+        # materialized tables of the version (shared by all processes)
+        self.version_id = version_id
+        self.table_store = None
+        if version_id is not None:
+            self.table_store = table_store if table_store else get_table_store()
+
+        # parameter schema of the categories, built once per category
+        self.schema_index = SchemaIndex(self.base, version_id, self.table_store)
+
+        # cross-category element index, built once on first request
+        self._element_index = None
+        self._element_index_lock = threading.Lock()
+
     def get_parameters_from_category(self, selected_category: str) -> list[str]:
         # list of all parameters
         output_list = []
@@ -43,6 +77,7 @@ class BaseHandler:
 
         return sorted(output_list)
 
+    @traced(kind="data", attributes=["selected_category"])
     def get_ASparameters_from_category(self, selected_category: str) -> list[str]:
         """outputs a list of all parameters in a certain category
         goes in the parameter list and looks for all (authoring software specific) parameters which are appended
@@ -54,30 +89,18 @@ class BaseHandler:
         Returns:
             list[str]: list of all authoring software specific parameters in the category
         """
-        # list of all parameters
-        output_list = []
-        # get all elements from the category
-        category_elements = self.base[selected_category]
-        # get the parameter_name
+        # served from the schema index, which is built once per category
+        return self.schema_index.get_parameter_names(selected_category)
 
-        # iterate over all elements
-        for element in category_elements:
-            assert hasattr(element, "parameters"), "No parameters found in element"
-            # get all parameters from the element (which are in an extra list)
-            parameters = element["parameters"].get_dynamic_member_names()
-            # iterate over all parameters
-            for parameter in parameters:
-                # get the name of the parameter
-                parameter_name = element["parameters"][parameter]["name"]
-                # append if not already in the list
-                if parameter_name not in output_list:
-                    output_list.append(parameter_name)
-        return sorted(output_list)
+    def get_category_schema(self, category: str) -> CategorySchema:
+        """ returns the schema of the category: parameter name -> internal key, dtype, fill rate, distinct count and units"""
+        return self.schema_index.get_category_schema(category)
 
     def get_notASparameter_values(self, elements: list[Base], parameters: list[str]) -> DataFrame:
         """ not all Base Objectg have authoring software specific parameters, this function returns the parameters which are not AS specific"""
         raise ValueError("No Parameters folder there")
 
+    @traced(kind="data", attributes=["category"])
     def get_category_dataframe(self, category: str, parameters: list[str] = None) -> DataFrame:
         """Get the pandas dataframe by specifying the category
 
@@ -89,14 +112,161 @@ class BaseHandler:
             DataFrame: Resulting dataframe.
         """
 
+        # tables with all parameters are built once per category
+        # tables can be released by the memory budget of the model registry at any time
+        cached = self._dataframes.get(category) if parameters is None else None
+        if cached is not None:
+            return cached
+
+        # materialized tables are read memory-mapped, only the selected parameters are loaded
+        if self.table_store is not None and self.table_store.has_table(self.version_id, category):
+            result_DF, row_ids = self.table_store.read_table(self.version_id, category, parameters)
+            if parameters is None:
+                self._dataframes[category] = result_DF
+                self._row_ids[category] = row_ids
+                self._table_cached()
+            return result_DF
+
         # get list of base objects from the category
         entries = self.base[category]
 
         # potentially search for all parameters
         result_DF = self._create_dataframe_from_elements(entries, parameters)
 
+        if parameters is None:
+            self._store_dataframe(category, result_DF, [element.id for element in entries])
+
         return result_DF
 
+    def get_row_ids(self, category: str) -> list[str]:
+        """ returns the element (object) ids of the rows of the category table"""
+        row_ids = self._row_ids.get(category)
+        if row_ids is None:
+            self.get_category_dataframe(category)
+            row_ids = self._row_ids[category]
+        return row_ids
+
+    def get_element_index(self) -> ElementIndex:
+        """ returns the index of all elements: id/applicationId -> category and row, grouped by level, family, type and host
+
+        the index is built in one pass over all categories (receives all categories of lazy models)
+        and is materialized next to the category tables"""
+        with self._element_index_lock:
+            if self._element_index is None:
+                self._element_index = self._load_or_build_element_index()
+            return self._element_index
+
+    @traced(kind="data", attributes=["category"])
+    def get_linked_dataframe(self, category: str) -> DataFrame:
+        """ returns the table of the category with the keys of the element index (element_id, host_id) as first columns,
+        so the tables of several categories can be joined (e.g. doors with their host walls)"""
+        cached = self._linked_dataframes.get(category)
+        if cached is not None:
+            return cached
+        df = self.get_category_dataframe(category).copy(deep=False)
+        records = self.get_element_index().to_dataframe()
+        records = records[records["category"] == category].set_index("row")
+        rows = range(len(df))
+        df.insert(0, "host_id", records["host_id"].reindex(rows).to_numpy(), allow_duplicates=True)
+        df.insert(0, "element_id", records["element_id"].reindex(rows).to_numpy(), allow_duplicates=True)
+        # the category of the table, e.g. for the schema lookup of the prompts
+        df.attrs["category"] = category
+        self._linked_dataframes[category] = df
+        return df
+
+    @traced(kind="data")
+    def _load_or_build_element_index(self) -> ElementIndex:
+        if self.table_store is not None and self.table_store.has_table(self.version_id, self.ELEMENT_INDEX_TABLE):
+            records, _ = self.table_store.read_table(self.version_id, self.ELEMENT_INDEX_TABLE)
+            return ElementIndex.from_dataframe(records)
+        element_index = ElementIndex.build(self.base, self.categories)
+        if self.table_store is not None:
+            records = element_index.to_dataframe()
+            self.table_store.write_table(self.version_id, self.ELEMENT_INDEX_TABLE, records, list(records["element_id"]))
+        return element_index
+
+    def _store_dataframe(self, category: str, df: DataFrame, row_ids: list[str]) -> None:
+        """ caches the full table of a category in memory and materializes it for the version"""
+        self._dataframes[category] = df
+        self._row_ids[category] = row_ids
+        self._table_nbytes.pop(category, None)
+        if self.table_store is not None:
+            self.table_store.write_table(self.version_id, category, df, row_ids)
+        self._table_cached()
+
+    def _table_cached(self) -> None:
+        if self.on_table_cached is not None:
+            self.on_table_cached()
+
+    def release_tables(self, max_bytes: int) -> None:
+        """ drops the least recently cached tables until the cached tables fit into max_bytes, the last cached table
+        is kept. Dropped tables are read from the table store (or built) again on their next request"""
+        total = self.get_table_nbytes()
+        for category in list(self._dataframes)[:-1]:
+            if total <= max_bytes:
+                break
+            total -= self._table_nbytes.pop(category, 0)
+            self._dataframes.pop(category, None)
+            self._row_ids.pop(category, None)
+            self._linked_dataframes.pop(category, None)
+
+    def get_table_nbytes(self) -> int:
+        """ returns the estimated memory of the cached category tables (the linked tables share their columns)"""
+        for category, df in list(self._dataframes.items()):
+            if category not in self._table_nbytes:
+                self._table_nbytes[category] = int(df.memory_usage(deep=True).sum())
+        return sum(self._table_nbytes.values())
+
+    def is_category_loaded(self, category: str) -> bool:
+        """ checks if the elements of the category are in memory (always true for fully received models)"""
+        if hasattr(self.base, "is_loaded"):
+            return self.base.is_loaded(category)
+        return True
+
+    def get_loaded_elements(self) -> dict[str, Base]:
+        """ returns all elements in memory by their object id"""
+        elements = {}
+        for category in self.categories:
+            if not self.is_category_loaded(category):
+                continue
+            for element in self.base[category]:
+                if getattr(element, "id", None):
+                    elements[element.id] = element
+        return elements
+
+    def patch_from(self, previous: "BaseHandler") -> None:
+        """ takes over the cached tables of the previous version of the model, only the rows of
+        changed elements are rebuilt (elements are identified by their content hash)
+
+        Args:
+            previous (BaseHandler): the basehandler of the previous version
+        """
+        for category, old_df in list(previous._dataframes.items()):
+            old_ids = previous._row_ids.get(category)
+            if category not in self.categories or category in self._dataframes or old_ids is None:
+                continue
+            entries = self.base[category]
+            new_ids = [element.id for element in entries]
+
+            # keep the rows of unchanged elements
+            new_id_set = set(new_ids)
+            keep = [obj_id in new_id_set for obj_id in old_ids]
+            kept_df = old_df[keep]
+            kept_ids = [obj_id for obj_id, is_kept in zip(old_ids, keep) if is_kept]
+
+            # build the rows of added and modified elements
+            old_id_set = set(old_ids)
+            changed = [element for element in entries if element.id not in old_id_set]
+            changed_df = self._create_dataframe_from_elements(changed, sort=False)
+
+            # restore the element order of the new version
+            combined = pd.concat([kept_df, changed_df], ignore_index=True)
+            position = {obj_id: index for index, obj_id in enumerate(kept_ids + [element.id for element in changed])}
+            combined = combined.iloc[[position[obj_id] for obj_id in new_ids]].reset_index(drop=True)
+
+            self._store_dataframe(category, self._clean_df(combined), new_ids)
+
+    @traced(kind="data")
     def _create_dataframe_from_elements(self, base_list: list[Base], parameters: list[str] = None, sort: bool = True):
         """creates a dataframe for given elements, only adds the parameters in the list
 
@@ -109,18 +279,10 @@ class BaseHandler:
             result_DF [list]: resulting list of data in 
         """
 
-        # list of dictionaries, later translated into pandas
-        result_data = []
-        # iterate over elements and build up dictionary
-        for AS_element in base_list:
-            # initialize the RevitElementHandler
-            element_handler = BuiltElementsHandler(AS_element)
-            # get all parameters from the element
-            data_dict = element_handler.get_AS_specific_parameters(parameters=parameters)
-            # append the the parameters to the dictionary
-            result_data.append(data_dict)
-        # resulting data to DataFrame
-        result_DF = DataFrame.from_dict(result_data)
+        # single pass over the elements, values go straight into the column buffers
+        builder = ColumnarTableBuilder(parameters)
+        builder.add_elements(base_list)
+        result_DF = builder.build()
 
         # sort the dataframe
         if sort:
@@ -128,6 +290,7 @@ class BaseHandler:
 
         return result_DF
 
+    @traced(kind="data")
     def _clean_df(self, df):
         """sorts the dataframe by columns with all values 0 or None at the end"""
 
@@ -0,0 +1,77 @@
+from specklepy.objects.base import Base
+from pandas import DataFrame
+import numpy as np
+
+
+class ColumnarTableBuilder:
+
+    """
+    Builds the table of a category in a single pass over the elements.
+
+    Every authoring software specific parameter is appended straight into the buffer of its column,
+    missing values are filled with NaN (like pandas does for missing keys). At the end every buffer
+    is converted into a typed numpy array and the DataFrame is built from the arrays without copying.
+    """
+
+    def __init__(self, parameters: list[str] = None) -> None:
+        """ initialize the builder, only the given parameters are selected (all if None)"""
+        self.parameters = set(parameters) if parameters is not None else None
+        self._columns = {}
+        self._n_rows = 0
+
+    def add_elements(self, elements: list[Base]) -> None:
+        """ appends the parameters of all elements"""
+        for element in elements:
+            self.add_element(element)
+
+    def add_element(self, element: Base) -> None:
+        """ appends the parameters of a single element as new row"""
+        assert "Objects.BuiltElements" in element.speckle_type, f"Elment does not belong to BuiltElements, but is {element.speckle_type}"
+        row = self._n_rows
+        self._n_rows += 1
+
+        as_parameters = getattr(element, "parameters", None)
+        if as_parameters is None:
+            return
+
+        columns = self._columns
+        for param in as_parameters.get_dynamic_member_names():
+            parameter = as_parameters[param]
+            name = parameter["name"]
+            if self.parameters is not None and name not in self.parameters:
+                continue
+            column = columns.get(name)
+            if column is None:
+                # new column, fill the previous rows
+                column = columns[name] = [np.nan] * row
+            elif len(column) > row:
+                # parameter name appears twice in the element, the last value wins
+                column[row] = parameter["value"]
+                continue
+            elif len(column) < row:
+                column.extend([np.nan] * (row - len(column)))
+            column.append(parameter["value"])
+
+    def build(self) -> DataFrame:
+        """ converts the column buffers into typed arrays and returns the DataFrame"""
+        data = {}
+        for name, column in self._columns.items():
+            if len(column) < self._n_rows:
+                column.extend([np.nan] * (self._n_rows - len(column)))
+            data[name] = self._to_array(column)
+        return DataFrame(data, index=range(self._n_rows), copy=False)
+
+    @staticmethod
+    def _to_array(values: list) -> np.ndarray:
+        """ infers the dtype of a column like pandas does for a list of records"""
+        types = {type(value) for value in values if value is not None}
+        if types == {int} and None not in values:
+            return np.array(values, dtype=np.int64)
+        if types and types <= {int, float}:
+            # NaN (missing) and None become NaN
+            return np.array(values, dtype=np.float64)
+        if types == {bool} and None not in values:
+            return np.array(values, dtype=bool)
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        return array
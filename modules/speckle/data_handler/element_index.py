@@ -0,0 +1,223 @@
+from typing import NamedTuple, Optional
+
+from specklepy.objects.base import Base
+from pandas import DataFrame
+import pandas as pd
+
+
+class ElementRef(NamedTuple):
+    """ position of an element: its category and its row in the category table"""
+    category: str
+    row: int
+
+
+class ElementIndex:
+
+    """
+    Cross-category index of all elements of a model version.
+
+    Maps the object id, the applicationId and the Revit elementId of every element to its category and its
+    row in the category table. Secondary indexes group the elements by level, family, type and host element,
+    so cross-category lookups are hash lookups instead of scans over the Base lists of all categories.
+
+    The index is built in a single pass over all categories and can be stored as a table (see to_dataframe).
+    """
+
+    # columns of the index table
+    COLUMNS = ["element_id", "application_id", "revit_id", "category", "row", "level", "family", "type", "host_id"]
+
+    # Revit parameters (internal keys, independent of the language of the model)
+    LEVEL_PARAMETERS = ["FAMILY_LEVEL_PARAM", "WALL_BASE_CONSTRAINT", "SCHEDULE_LEVEL_PARAM", "LEVEL_PARAM",
+                        "INSTANCE_REFERENCE_LEVEL_PARAM", "STAIRS_BASE_LEVEL_PARAM", "ROOF_BASE_LEVEL_PARAM"]
+    FAMILY_PARAMETERS = ["ELEM_FAMILY_PARAM"]
+    TYPE_PARAMETERS = ["ELEM_TYPE_PARAM", "SYMBOL_NAME_PARAM"]
+    HOST_PARAMETERS = ["HOST_ID_PARAM"]
+
+    def __init__(self, records: DataFrame) -> None:
+        """ initialize the index from its table, use ElementIndex.build to build it from a model"""
+        self.records = records.reset_index(drop=True)
+        self._refs = [ElementRef(category, int(row)) for category, row in zip(records["category"], records["row"])]
+
+        # object id, applicationId and Revit elementId -> position in the index table
+        self._keys = {}
+        for column in ["revit_id", "application_id", "element_id"]:
+            for position, key in enumerate(self.records[column]):
+                if isinstance(key, str) and key:
+                    self._keys[key] = position
+
+        self._by_level = self._group("level")
+        self._by_family = self._group("family")
+        self._by_type = self._group("type")
+        self._by_host = self._group("host_id")
+
+    def _group(self, column: str) -> dict[str, list[int]]:
+        groups = {}
+        for position, value in enumerate(self.records[column]):
+            if isinstance(value, str) and value:
+                groups.setdefault(value, []).append(position)
+        return groups
+
+    @classmethod
+    def build(cls, base: Base, categories: list[str]) -> "ElementIndex":
+        """ builds the index in a single pass over the elements of all categories
+
+        Args:
+            base (Base): the category container of the BaseHandler
+            categories (list[str]): the categories to index
+        """
+        columns = {name: [] for name in cls.COLUMNS}
+        # host keys of nested elements ("elements" member of the host)
+        nested_hosts = {}
+
+        for category in categories:
+            for row, element in enumerate(base[category]):
+                columns["element_id"].append(getattr(element, "id", None))
+                columns["application_id"].append(getattr(element, "applicationId", None))
+                revit_id = getattr(element, "elementId", None)
+                columns["revit_id"].append(str(revit_id) if revit_id not in (None, "") else None)
+                columns["category"].append(category)
+                columns["row"].append(row)
+
+                parameters = getattr(element, "parameters", None)
+                columns["level"].append(cls._get_name(getattr(element, "level", None))
+                                        or cls._get_parameter(parameters, cls.LEVEL_PARAMETERS))
+                columns["family"].append(cls._get_name(getattr(element, "family", None))
+                                         or cls._get_parameter(parameters, cls.FAMILY_PARAMETERS))
+                columns["type"].append(cls._get_name(getattr(element, "type", None))
+                                       or cls._get_parameter(parameters, cls.TYPE_PARAMETERS))
+                columns["host_id"].append(cls._get_name(getattr(element, "host", None))
+                                          or cls._get_parameter(parameters, cls.HOST_PARAMETERS))
+
+                host_key = columns["element_id"][-1]
+                for child in getattr(element, "elements", None) or []:
+                    child_id = getattr(child, "id", None)
+                    if child_id and host_key:
+                        nested_hosts[child_id] = host_key
+
+        records = DataFrame(columns, columns=cls.COLUMNS)
+        index = cls(records)
+        index._resolve_hosts(nested_hosts)
+        return index
+
+    def _resolve_hosts(self, nested_hosts: dict[str, str]) -> None:
+        """ normalizes the host references (applicationId, elementId or nesting) to the object id of the host"""
+        host_ids = []
+        for element_id, host_key in zip(self.records["element_id"], self.records["host_id"]):
+            host_key = host_key or nested_hosts.get(element_id)
+            position = self._keys.get(host_key) if host_key else None
+            host_ids.append(self.records["element_id"].iat[position] if position is not None else host_key)
+        self.records["host_id"] = host_ids
+        self._by_host = self._group("host_id")
+
+    @staticmethod
+    def _get_name(value) -> Optional[str]:
+        """ returns the name of a referenced object (level, type, host) or the value itself"""
+        if isinstance(value, Base):
+            name = getattr(value, "name", None) or getattr(value, "id", None)
+        elif isinstance(value, dict):
+            name = value.get("name") or value.get("id")
+        else:
+            name = value
+        return str(name) if name not in (None, "") else None
+
+    @staticmethod
+    def _get_parameter(parameters: Base, keys: list[str]) -> Optional[str]:
+        """ returns the value of the first given Revit parameter which is set"""
+        if parameters is None:
+            return None
+        for key in keys:
+            parameter = getattr(parameters, key, None)
+            if parameter is None:
+                continue
+            value = getattr(parameter, "value", None)
+            if value not in (None, ""):
+                return str(value)
+        return None
+
+    def __len__(self) -> int:
+        return len(self._refs)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def lookup(self, key: str) -> Optional[ElementRef]:
+        """ returns the category and row of an element by its object id, applicationId or Revit elementId"""
+        position = self._keys.get(str(key))
+        return self._refs[position] if position is not None else None
+
+    def get_element_id(self, key: str) -> Optional[str]:
+        """ returns the object id of an element by its object id, applicationId or Revit elementId"""
+        position = self._keys.get(str(key))
+        return self.records["element_id"].iat[position] if position is not None else None
+
+    def get_by_level(self, level: str) -> list[ElementRef]:
+        return [self._refs[position] for position in self._by_level.get(level, [])]
+
+    def get_by_family(self, family: str) -> list[ElementRef]:
+        return [self._refs[position] for position in self._by_family.get(family, [])]
+
+    def get_by_type(self, type_name: str) -> list[ElementRef]:
+        return [self._refs[position] for position in self._by_type.get(type_name, [])]
+
+    def get_hosted(self, host_key: str) -> list[ElementRef]:
+        """ returns the elements hosted by the given element (e.g. the doors of a wall)"""
+        host_id = self.get_element_id(host_key) or host_key
+        return [self._refs[position] for position in self._by_host.get(host_id, [])]
+
+    def get_host(self, key: str) -> Optional[ElementRef]:
+        """ returns the host of an element, None if it is not hosted"""
+        position = self._keys.get(str(key))
+        if position is None:
+            return None
+        host_id = self.records["host_id"].iat[position]
+        return self.lookup(host_id) if isinstance(host_id, str) else None
+
+    def get_levels(self) -> list[str]:
+        return sorted(self._by_level)
+
+    def get_families(self) -> list[str]:
+        return sorted(self._by_family)
+
+    def get_types(self) -> list[str]:
+        return sorted(self._by_type)
+
+    def filter(self, category: str = None, level: str = None, family: str = None, type_name: str = None,
+               host_key: str = None) -> list[ElementRef]:
+        """ returns the elements which match all given conditions, the smallest secondary index is scanned"""
+        candidates = []
+        if level is not None:
+            candidates.append(self._by_level.get(level, []))
+        if family is not None:
+            candidates.append(self._by_family.get(family, []))
+        if type_name is not None:
+            candidates.append(self._by_type.get(type_name, []))
+        if host_key is not None:
+            candidates.append(self._by_host.get(self.get_element_id(host_key) or host_key, []))
+        if not candidates:
+            positions = range(len(self._refs))
+        else:
+            candidates.sort(key=len)
+            positions = set(candidates[0]).intersection(*candidates[1:])
+            positions = sorted(positions)
+        refs = [self._refs[position] for position in positions]
+        if category is not None:
+            refs = [ref for ref in refs if ref.category == category]
+        return refs
+
+    def get_rows(self, refs: list[ElementRef]) -> dict[str, list[int]]:
+        """ groups element positions by category: category -> rows (to select them from the category tables)"""
+        rows = {}
+        for ref in refs:
+            rows.setdefault(ref.category, []).append(ref.row)
+        return rows
+
+    def to_dataframe(self) -> DataFrame:
+        """ returns the index table: one row per element with its keys, category, row, level, family, type and host"""
+        return self.records
+
+    @classmethod
+    def from_dataframe(cls, records: DataFrame) -> "ElementIndex":
+        """ restores an index which was stored with to_dataframe"""
+        records = records.astype(object).where(pd.notna(records), None)
+        records["row"] = records["row"].astype(int)
+        return cls(records[cls.COLUMNS])
@@ -0,0 +1,155 @@
+from typing import Optional
+
+from pandas import DataFrame
+
+from .base_handler import BaseHandler
+from .element_index import ElementIndex
+
+import re
+import threading
+
+
+class DuckDBQueryEngine:
+
+    """
+    SQL engine over all category tables of a model version.
+
+    Every category is loaded into a DuckDB table when a query first uses it, the table is copied from the
+    category DataFrame of the basehandler (which builds or reads it once). Queries run vectorized inside DuckDB.
+    Only single SELECT statements are allowed and the access to files is disabled, so a query cannot read other
+    files (e.g. read_csv_auto('/etc/passwd')) or write.
+
+    The element index is loaded as table "elements" (element_id, application_id, revit_id, category,
+    row, level, family, type, host_id), it joins with the element_id column of the category tables.
+    """
+
+    # table of the cross-category element index
+    ELEMENTS_TABLE = "elements"
+
+    # SQL types of the columns by the Arrow type of the stored table and by the dtype of the parameter schema
+    ARROW_TYPES = {"int64": "BIGINT", "double": "DOUBLE", "bool": "BOOLEAN", "string": "VARCHAR", "null": "DOUBLE"}
+    SCHEMA_TYPES = {"float": "DOUBLE", "int": "BIGINT", "bool": "BOOLEAN", "string": "VARCHAR", "mixed": "VARCHAR",
+                    "empty": "DOUBLE"}
+
+    def __init__(self, basehandler: BaseHandler) -> None:
+        """ names a table for every category of the basehandler, the tables are loaded on first use"""
+        # DuckDB is only loaded by the pages and tools which query with SQL
+        import duckdb
+
+        self.basehandler = basehandler
+        # cursors share the database, the setting can not be changed while it is open
+        self.connection = duckdb.connect(database=":memory:", config={"enable_external_access": False})
+        self._lock = threading.Lock()
+        # table name -> category name
+        self.tables = {}
+        for category in basehandler.categories:
+            name = self.get_table_name(category)
+            while name in self.tables or name == self.ELEMENTS_TABLE:
+                name += "_"
+            self.tables[name] = category
+        # names of the tables which are loaded
+        self._loaded = set()
+
+    @staticmethod
+    def get_table_name(category: str) -> str:
+        """ converts a category name ("@Türen") into a plain SQL identifier ("tueren")"""
+        name = category.lstrip("@").lower()
+        for umlaut, replacement in [("ä", "ae"), ("ö", "oe"), ("ü", "ue"), ("ß", "ss")]:
+            name = name.replace(umlaut, replacement)
+        name = re.sub(r"[^a-z0-9_]+", "_", name).strip("_")
+        if not name or name[0].isdigit():
+            name = "t_" + name
+        return name
+
+    def _load_tables(self, sql: str) -> None:
+        """ loads the tables whose names occur in the query, caller holds the lock"""
+        # a column with the name of a table only loads one table too many
+        names = {word.lower() for word in re.findall(r"[A-Za-z_][A-Za-z0-9_]*", sql)}
+        for name in sorted(names - self._loaded):
+            if name == self.ELEMENTS_TABLE:
+                self._create_table_from(name, self.basehandler.get_element_index().to_dataframe())
+            elif name in self.tables:
+                category = self.tables[name]
+                table = self.basehandler.get_category_dataframe(category).copy(deep=False)
+                table.insert(0, "element_id", self.basehandler.get_row_ids(category), allow_duplicates=True)
+                self._create_table_from(name, table)
+            else:
+                continue
+            self._loaded.add(name)
+
+    def _create_table_from(self, name: str, df: DataFrame) -> None:
+        # registered DataFrames are only visible to this connection, tables also to the cursors
+        self.connection.register("__source", df)
+        try:
+            self.connection.execute(f'CREATE TABLE "{name}" AS SELECT * FROM __source')
+        finally:
+            self.connection.unregister("__source")
+
+    def query(self, sql: str, max_rows: int = None) -> DataFrame:
+        """ runs a read-only SQL query and returns the result
+
+        Args:
+            sql (str): the query, table names are listed in self.tables
+            max_rows (int, optional): limits the number of returned rows
+
+        Returns:
+            DataFrame: the result of the query
+        """
+        with self._lock:
+            # DESCRIBE, SHOW and SUMMARIZE are SELECT statements as well
+            statements = self.connection.extract_statements(sql)
+            if len(statements) != 1:
+                raise ValueError(f"Only a single query is allowed, got {len(statements)} statements")
+            if statements[0].type.name != "SELECT":
+                raise ValueError(f"Only read-only queries are allowed, got: {statements[0].type.name}")
+            self._load_tables(sql)
+            # every thread gets its own cursor on the shared database
+            cursor = self.connection.cursor()
+        try:
+            result = cursor.execute(sql)
+            if max_rows is not None:
+                return DataFrame(result.fetchmany(max_rows), columns=[column[0] for column in result.description])
+            return result.df()
+        finally:
+            cursor.close()
+
+    def describe_tables(self, table: str = None) -> str:
+        """ describes the tables (category, columns and their SQL types) for a prompt
+
+        the columns are taken from the stored tables and the parameter schema, no table is loaded into DuckDB.
+        Without a table name, the categories of a lazy model which are not received yet are listed without columns"""
+        descriptions = []
+        for name, category in [(self.ELEMENTS_TABLE, None)] + list(self.tables.items()):
+            if table and name != table:
+                continue
+            columns = self._get_column_types(category, receive=table is not None)
+            if columns is None:
+                column_list = "columns not received yet, describe the table to get them"
+            else:
+                column_list = ", ".join(f'"{column}" {sql_type}' for column, sql_type in columns.items())
+            origin = f"category {category}" if category else "all elements with their category, level, family, type and host"
+            descriptions.append(f"{name} ({origin}): {column_list}")
+        return "\n".join(descriptions)
+
+    def _get_column_types(self, category: Optional[str], receive: bool) -> Optional[dict[str, str]]:
+        """ column -> SQL type of the table of a category (the element index for None), None if the category would
+        have to be received for it"""
+        if category is None:
+            return {column: "BIGINT" if column == "row" else "VARCHAR" for column in ElementIndex.COLUMNS}
+
+        columns = {"element_id": "VARCHAR"}
+        store = self.basehandler.table_store
+        version_id = self.basehandler.version_id
+        if store is not None and store.has_table(version_id, category):
+            for column, arrow_type in store.get_column_types(version_id, category).items():
+                columns[column] = self.ARROW_TYPES.get(arrow_type, "VARCHAR")
+            return columns
+
+        # the schema of a lazy category is only built from its elements if the table is asked for
+        if not receive and not self.basehandler.is_category_loaded(category):
+            if store is None or store.read_schema_records(version_id, category) is None:
+                return None
+        for info in self.basehandler.get_category_schema(category).parameters.values():
+            # integer columns with missing values are floats in the table
+            columns[info.name] = "DOUBLE" if info.dtype == "int" and info.fill_rate < 1 else self.SCHEMA_TYPES[info.dtype]
+        return columns
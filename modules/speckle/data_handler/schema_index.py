@@ -0,0 +1,193 @@
+from specklepy.objects.base import Base
+from pandas import DataFrame
+
+import threading
+
+
+class ParameterInfo:
+
+    """
+    Schema of a single authoring software specific parameter of a category.
+
+    Variables:
+    name (str): name of the parameter (column name of the category table)
+    internal_key (str): member name of the parameter in the parameters object of the element
+    dtype (str): inferred type of the values: float, int, bool, string, mixed or empty
+    fill_rate (float): share of the elements which have a value for the parameter
+    distinct_count (int): number of distinct values (capped at MAX_DISTINCT)
+    units (str): units of the parameter, None if it has no units
+    """
+
+    # distinct values are only counted up to this number
+    MAX_DISTINCT = 10_000
+
+    def __init__(self, name: str, internal_key: str) -> None:
+        self.name = name
+        self.internal_key = internal_key
+        self.units = None
+        self.fill_rate = 0.0
+        self.distinct_count = 0
+        self.dtype = "empty"
+        # accumulated while the index is built
+        self._n_filled = 0
+        self._types = set()
+        self._distinct = set()
+
+    def add_value(self, value, units) -> None:
+        """ accounts a single value of the parameter"""
+        if self.units is None and units:
+            self.units = units
+        if value is None or value == "":
+            return
+        self._n_filled += 1
+        self._types.add(type(value))
+        if len(self._distinct) < self.MAX_DISTINCT:
+            try:
+                self._distinct.add(value)
+            except TypeError:
+                # unhashable values are not counted
+                pass
+
+    def finalize(self, n_elements: int) -> None:
+        """ computes the statistics once all elements are accounted"""
+        self.fill_rate = self._n_filled / n_elements if n_elements else 0.0
+        self.distinct_count = len(self._distinct)
+        self.dtype = self._infer_dtype(self._types)
+        self._types = set()
+        self._distinct = set()
+
+    @staticmethod
+    def _infer_dtype(types: set) -> str:
+        if not types:
+            return "empty"
+        if types == {bool}:
+            return "bool"
+        if types == {int}:
+            return "int"
+        if types <= {int, float}:
+            return "float"
+        if types == {str}:
+            return "string"
+        return "mixed"
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "internal_key": self.internal_key, "dtype": self.dtype,
+                "fill_rate": self.fill_rate, "distinct_count": self.distinct_count, "units": self.units}
+
+    @classmethod
+    def from_dict(cls, record: dict) -> "ParameterInfo":
+        info = cls(record["name"], record["internal_key"])
+        info.dtype = record["dtype"]
+        info.fill_rate = record["fill_rate"]
+        info.distinct_count = record["distinct_count"]
+        info.units = record["units"]
+        return info
+
+
+class CategorySchema:
+
+    """ parameter name -> ParameterInfo for all parameters of a category"""
+
+    def __init__(self, category: str, elements: list[Base] = None) -> None:
+        """ builds the schema in a single pass over the elements of the category"""
+        elements = elements if elements is not None else []
+        self.category = category
+        self.n_elements = len(elements)
+        self.parameters = {}
+
+        for element in elements:
+            as_parameters = getattr(element, "parameters", None)
+            if as_parameters is None:
+                continue
+            for param in as_parameters.get_dynamic_member_names():
+                parameter = as_parameters[param]
+                name = parameter["name"]
+                info = self.parameters.get(name)
+                if info is None:
+                    info = self.parameters[name] = ParameterInfo(name, param)
+                info.add_value(parameter["value"], getattr(parameter, "units", None))
+
+        for info in self.parameters.values():
+            info.finalize(self.n_elements)
+        self._sorted_names = sorted(self.parameters)
+
+    def to_records(self) -> dict:
+        """ returns the schema as json serializable dictionary"""
+        return {"category": self.category, "n_elements": self.n_elements,
+                "parameters": [self.parameters[name].to_dict() for name in self._sorted_names]}
+
+    @classmethod
+    def from_records(cls, records: dict) -> "CategorySchema":
+        """ restores a schema which was stored with to_records"""
+        schema = cls(records["category"])
+        schema.n_elements = records["n_elements"]
+        schema.parameters = {record["name"]: ParameterInfo.from_dict(record) for record in records["parameters"]}
+        schema._sorted_names = sorted(schema.parameters)
+        return schema
+
+    def get_parameter_names(self) -> list[str]:
+        """ returns the sorted parameter names"""
+        return list(self._sorted_names)
+
+    def get(self, name: str) -> ParameterInfo:
+        return self.parameters[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.parameters
+
+    def to_dataframe(self) -> DataFrame:
+        """ returns the schema as table, one row per parameter"""
+        return DataFrame([self.parameters[name].to_dict() for name in self._sorted_names],
+                         columns=["name", "internal_key", "dtype", "fill_rate", "distinct_count", "units"])
+
+    def describe(self, max_parameters: int = None) -> str:
+        """ describes the parameters for a prompt, the best filled parameters first"""
+        infos = sorted(self.parameters.values(), key=lambda info: info.fill_rate, reverse=True)
+        if max_parameters is not None:
+            infos = infos[:max_parameters]
+        lines = []
+        for info in infos:
+            units = f", units: {info.units}" if info.units else ""
+            lines.append(f"- {info.name} ({info.dtype}, filled: {info.fill_rate:.0%}{units})")
+        return "\n".join(lines)
+
+
+class SchemaIndex:
+
+    """
+    Parameter schema of all categories of a model version.
+
+    The schema of a category is built once on first request and then served from memory.
+    The index belongs to the (shared) BaseHandler of a version, so it is built once per version.
+    With a table store, the schema is stored next to the category table and reused by other processes.
+    """
+
+    def __init__(self, base: Base, version_id: str = None, table_store=None) -> None:
+        """ initialize the index with the category container of the BaseHandler"""
+        self.base = base
+        self.version_id = version_id
+        self.table_store = table_store
+        self._schemas = {}
+        self._lock = threading.Lock()
+
+    def get_category_schema(self, category: str) -> CategorySchema:
+        """ returns the schema of the category, builds it on first request"""
+        with self._lock:
+            if category not in self._schemas:
+                self._schemas[category] = self._load_or_build(category)
+            return self._schemas[category]
+
+    def _load_or_build(self, category: str) -> CategorySchema:
+        persistent = self.table_store is not None and self.version_id is not None
+        if persistent:
+            records = self.table_store.read_schema_records(self.version_id, category)
+            if records is not None:
+                return CategorySchema.from_records(records)
+        schema = CategorySchema(category, self.base[category])
+        if persistent:
+            self.table_store.write_schema_records(self.version_id, category, schema.to_records())
+        return schema
+
+    def get_parameter_names(self, category: str) -> list[str]:
+        """ returns the sorted parameter names of the category"""
+        return self.get_category_schema(category).get_parameter_names()
@@ -0,0 +1,157 @@
+from typing import Optional
+
+from pandas import DataFrame
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from modules.speckle.speckle_settings import SpeckleSettings
+
+from urllib.parse import quote
+import json
+import os
+import threading
+import uuid
+
+
+class ParquetTableStore:
+
+    """
+    Stores the category tables of a model version as Parquet files.
+
+    Layout: <root>/<version_id>/<category>.parquet (plus <category>.schema.json for the parameter schema).
+    Model versions are immutable, so a stored table never gets stale and can be shared by all processes.
+    Tables are read memory-mapped and only the requested columns are loaded.
+    """
+
+    # column with the element (object) id of each row
+    ELEMENT_ID_COLUMN = "__element_id"
+    # schema metadata with the columns of mixed value types, they are stored as JSON values
+    JSON_COLUMNS_KEY = b"bim_ir_json_columns"
+
+    def __init__(self, root: str = None) -> None:
+        self.root = root if root else SpeckleSettings.TABLE_STORE_DIR
+
+    def _version_dir(self, version_id: str) -> str:
+        return os.path.join(self.root, quote(version_id, safe=""))
+
+    def _path(self, version_id: str, category: str, suffix: str = ".parquet") -> str:
+        # category names contain "@", spaces and umlauts
+        return os.path.join(self._version_dir(version_id), quote(category, safe="") + suffix)
+
+    def get_table_path(self, version_id: str, category: str) -> str:
+        """ returns the path of the Parquet file of a category"""
+        return self._path(version_id, category)
+
+    def has_version(self, version_id: str) -> bool:
+        """ checks if any table of the version is stored"""
+        return os.path.isdir(self._version_dir(version_id))
+
+    def has_table(self, version_id: str, category: str) -> bool:
+        return os.path.exists(self._path(version_id, category))
+
+    def get_columns(self, version_id: str, category: str) -> list[str]:
+        """ returns the columns of a stored table without reading it"""
+        schema = pq.read_schema(self._path(version_id, category))
+        return [name for name in schema.names if name != self.ELEMENT_ID_COLUMN]
+
+    def get_column_types(self, version_id: str, category: str) -> dict[str, str]:
+        """ returns the columns of a stored table with their Arrow types ("int64", "double", "string", ...)"""
+        schema = pq.read_schema(self._path(version_id, category))
+        return {field.name: str(field.type) for field in schema if field.name != self.ELEMENT_ID_COLUMN}
+
+    def read_table(self, version_id: str, category: str, columns: list[str] = None) -> tuple[DataFrame, list[str]]:
+        """ reads a stored table memory-mapped, only the given columns are loaded
+
+        Returns:
+            tuple[DataFrame, list[str]]: the table, the element ids of its rows
+        """
+        path = self._path(version_id, category)
+        if columns is not None:
+            available = set(pq.read_schema(path).names)
+            columns = [name for name in columns if name in available] + [self.ELEMENT_ID_COLUMN]
+        table = pq.read_table(path, columns=columns, memory_map=True)
+        df = table.to_pandas()
+        row_ids = df.pop(self.ELEMENT_ID_COLUMN).tolist()
+
+        # restore the values of mixed columns with their types (3.5 stays a float next to strings)
+        metadata = table.schema.metadata or {}
+        for name in json.loads(metadata.get(self.JSON_COLUMNS_KEY, b"[]")):
+            if name in df.columns:
+                values = np.empty(len(df), dtype=object)
+                values[:] = [np.nan if value is None else json.loads(value) for value in df[name]]
+                df[name] = values
+        return df, row_ids
+
+    def write_table(self, version_id: str, category: str, df: DataFrame, row_ids: list[str]) -> None:
+        """ writes a table, the file is replaced atomically so concurrent readers never see partial files"""
+        os.makedirs(self._version_dir(version_id), exist_ok=True)
+        columns = {}
+        json_columns = []
+        for name in df.columns:
+            columns[name], is_json = self._to_stored_arrow(df[name])
+            if is_json:
+                json_columns.append(name)
+        columns[self.ELEMENT_ID_COLUMN] = pa.array([str(obj_id) if obj_id else None for obj_id in row_ids], type=pa.string())
+        table = pa.table(columns, metadata={self.JSON_COLUMNS_KEY: json.dumps(json_columns).encode()})
+
+        path = self._path(version_id, category)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        pq.write_table(table, tmp_path)
+        os.replace(tmp_path, path)
+
+    def read_schema_records(self, version_id: str, category: str) -> Optional[dict]:
+        """ reads the stored parameter schema of a category, None if it is not stored"""
+        path = self._path(version_id, category, ".schema.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+
+    def write_schema_records(self, version_id: str, category: str, records: dict) -> None:
+        """ writes the parameter schema of a category"""
+        os.makedirs(self._version_dir(version_id), exist_ok=True)
+        path = self._path(version_id, category, ".schema.json")
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(records, file)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _to_arrow(column: pd.Series) -> pa.Array:
+        """ converts a column, columns with mixed value types are converted to strings (for display)"""
+        try:
+            return pa.array(column, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            values = [None if value is None or (isinstance(value, float) and value != value) else str(value)
+                      for value in column]
+            return pa.array(values, type=pa.string())
+
+    @staticmethod
+    def _to_stored_arrow(column: pd.Series) -> tuple[pa.Array, bool]:
+        """ converts a column, columns with mixed value types are stored as JSON values (read_table restores them)
+
+        Returns:
+            tuple[pa.Array, bool]: the array, if it holds JSON values
+        """
+        try:
+            return pa.array(column, from_pandas=True), False
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            values = [None if value is None or (isinstance(value, float) and value != value)
+                      else json.dumps(value, default=lambda item: item.item() if isinstance(item, np.generic) else str(item))
+                      for value in column]
+            return pa.array(values, type=pa.string()), True
+
+
+_table_store = None
+_table_store_lock = threading.Lock()
+
+
+def get_table_store() -> ParquetTableStore:
+    """ returns the process wide table store"""
+    global _table_store
+    with _table_store_lock:
+        if _table_store is None:
+            _table_store = ParquetTableStore()
+    return _table_store
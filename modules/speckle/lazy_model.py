@@ -0,0 +1,304 @@
+from typing import Callable, Dict, List
+
+from specklepy.serialization.base_object_serializer import BaseObjectSerializer
+from specklepy.transports.server import ServerTransport
+
+from modules.speckle.object_cache import LocalObjectCache, get_object_cache
+
+import json
+import threading
+
+
+# members which hold the display geometry of an element
+GEOMETRY_MEMBERS = ["displayValue", "@displayValue"]
+
+# members of the serialized json which are no dynamic members of a Base object
+BASE_MEMBERS = ["id", "speckle_type", "applicationId", "totalChildrenCount", "units"]
+
+DATA_CHUNK_TYPE = "Speckle.Core.Models.DataChunk"
+
+
+def is_reference(value) -> bool:
+    """ checks if a serialized value is a reference to a detached object"""
+    return isinstance(value, dict) and value.get("speckle_type") == "reference" and "referencedId" in value
+
+
+def collect_references(value, skip_members: List[str] = None) -> List[str]:
+    """ returns the ids of all detached objects referenced in a serialized value
+
+    Args:
+        value: parsed json of an object (or a part of it)
+        skip_members (list[str], optional): members which are not followed, e.g. the display geometry
+    """
+    skip_members = skip_members if skip_members else []
+    references = []
+    stack = [value]
+    while stack:
+        current = stack.pop()
+        if is_reference(current):
+            references.append(current["referencedId"])
+        elif isinstance(current, dict):
+            stack.extend(item for name, item in current.items()
+                         if name not in skip_members and name != "__closure")
+        elif isinstance(current, list):
+            stack.extend(current)
+    return references
+
+
+def flatten_data_chunks(items: list, fetcher: "LazyObjectFetcher") -> list:
+    """ replaces the references to data chunks in a serialized list by their items
+
+    Returns:
+        list: references to the elements and inline objects, in the order of the full list
+    """
+    references = [item["referencedId"] for item in items if is_reference(item)]
+    fetched = fetcher.get_many(references) if references else {}
+    flattened = []
+    for item in items:
+        if is_reference(item) and fetched[item["referencedId"]].get("speckle_type") == DATA_CHUNK_TYPE:
+            flattened.extend(flatten_data_chunks(fetched[item["referencedId"]].get("data", []), fetcher))
+        else:
+            flattened.append(item)
+    return flattened
+
+
+def flatten_element_ids(items: list, fetcher: "LazyObjectFetcher"):
+    """ splits a serialized list into referenced elements and inline objects, resolves data chunks
+
+    Returns:
+        tuple[list[str], list]: ids of the referenced elements, inline objects
+    """
+    flattened = flatten_data_chunks(items, fetcher)
+    element_ids = [item["referencedId"] for item in flattened if is_reference(item)]
+    inline_objects = [item for item in flattened if not is_reference(item)]
+    return element_ids, inline_objects
+
+
+def get_category_element_ids(root: dict, fetcher: "LazyObjectFetcher") -> Dict[str, List[str]]:
+    """ returns the ids of the referenced elements per category without receiving the elements
+
+    Args:
+        root (dict): the serialized root object of a version
+        fetcher (LazyObjectFetcher): fetcher for the root's container and data chunks
+
+    Returns:
+        dict[str, list[str]]: category name -> element ids (in order)
+    """
+    container = root
+    if is_reference(root.get("@Types")):
+        # new Speckle data format
+        container = fetcher.get_many([root["@Types"]["referencedId"]])[root["@Types"]["referencedId"]]
+    elif isinstance(root.get("@Types"), dict):
+        container = root["@Types"]
+
+    categories = {}
+    for name, value in container.items():
+        if name.startswith("__") or name in BASE_MEMBERS or not isinstance(value, list):
+            continue
+        categories[name], _ = flatten_element_ids(value, fetcher)
+    return categories
+
+
+class LazyObjectFetcher:
+
+    """
+    Fetches serialized objects by id, first from the local object cache, then in batches from the server.
+    The server transport is only created when objects are missing locally.
+    """
+
+    # number of objects requested per call of the getobjects endpoint
+    BATCH_SIZE = 5000
+
+    def __init__(self, get_transport: Callable[[], ServerTransport], cache: LocalObjectCache = None) -> None:
+        self._get_transport = get_transport
+        self._transport = None
+        self.cache = cache if cache else get_object_cache()
+        # serialized size of all objects handed out so far
+        self.loaded_bytes = 0
+        # called after a member was received (e.g. the memory budget of the model registry is checked)
+        self.on_received = None
+
+    @property
+    def transport(self) -> ServerTransport:
+        if self._transport is None:
+            self._transport = self._get_transport()
+        return self._transport
+
+    def get_many(self, id_list: List[str]) -> Dict[str, dict]:
+        """ returns the parsed objects, downloads only the objects which are not cached"""
+        id_list = list(dict.fromkeys(id_list))
+        found = self.cache.has_objects(id_list)
+        missing = [obj_id for obj_id in id_list if not found[obj_id]]
+        for start in range(0, len(missing), self.BATCH_SIZE):
+            self._download(missing[start:start + self.BATCH_SIZE])
+        if missing:
+            self.cache.end_write()
+
+        objects = {}
+        for obj_id in id_list:
+            obj_string = self.cache.get_object(obj_id)
+            if obj_string is None:
+                raise ValueError(f"Object {obj_id} could not be received")
+            self.loaded_bytes += len(obj_string)
+            objects[obj_id] = json.loads(obj_string)
+        return objects
+
+    def get_trees(self, id_list: List[str], skip_members: List[str] = None) -> Dict[str, dict]:
+        """ returns the objects and all their (transitively) referenced children, except the skipped members"""
+        objects = {}
+        pending = list(id_list)
+        while pending:
+            fetched = self.get_many(pending)
+            objects.update(fetched)
+            children = []
+            for obj in fetched.values():
+                children.extend(collect_references(obj, skip_members))
+            pending = [obj_id for obj_id in dict.fromkeys(children) if obj_id not in objects]
+        return objects
+
+    def _download(self, id_list: List[str]) -> None:
+        """ downloads a batch of objects into the local cache"""
+        transport = self.transport
+        if not isinstance(transport, ServerTransport):
+            # local transports (e.g. recorded versions) serve the objects directly
+            for obj_id in id_list:
+                obj = transport.get_object(obj_id)
+                if obj is not None:
+                    self.cache.save_object(obj_id, obj)
+            return
+        endpoint = f"{transport.url}/api/getobjects/{transport.stream_id}"
+        r = transport.session.post(endpoint, data={"objects": json.dumps(id_list)}, stream=True)
+        r.raise_for_status()
+        if r.encoding is None:
+            r.encoding = "utf-8"
+        for line in r.iter_lines(decode_unicode=True):
+            if line:
+                obj_id, obj = line.split("\t", 1)
+                self.cache.save_object(obj_id, obj)
+
+
+class _SkippingReader:
+
+    """ read transport for the serializer which hides the skipped members of every object"""
+
+    name = "SkippingReader"
+
+    def __init__(self, cache: LocalObjectCache, skip_members: List[str]) -> None:
+        self.cache = cache
+        self.skip_members = skip_members
+
+    def get_object(self, id: str):
+        obj_string = self.cache.get_object(id)
+        if obj_string is None or not any(f'"{name}"' in obj_string for name in self.skip_members):
+            return obj_string
+        obj = json.loads(obj_string)
+        for name in self.skip_members:
+            obj.pop(name, None)
+        return json.dumps(obj)
+
+
+class LazyBase:
+
+    """
+    Stands in for a received Base object, detached members are only received on first access.
+
+    Only the serialized root is loaded at first. Containers (plain Base objects like "@Types") stay lazy,
+    lists of elements (the categories) are received with all their children on first access, optionally
+    without the display geometry. Supports the parts of the Base interface used by the BaseHandler.
+
+    Elements of a previous version can be passed as known_elements (object id -> Base), they are reused
+    instead of received again, so a new version only receives the changed elements.
+    """
+
+    def __init__(self, obj: dict, fetcher: LazyObjectFetcher, skip_geometry: bool = True, known_elements: dict = None) -> None:
+        self._obj = obj
+        self._fetcher = fetcher
+        self._skip_members = GEOMETRY_MEMBERS if skip_geometry else []
+        self._known_elements = known_elements if known_elements else {}
+        self._members = {}
+        self._lock = threading.RLock()
+        self.id = obj.get("id")
+        self.speckle_type = obj.get("speckle_type")
+        self.applicationId = obj.get("applicationId")
+
+    @property
+    def loaded_bytes(self) -> int:
+        return self._fetcher.loaded_bytes
+
+    def get_dynamic_member_names(self) -> List[str]:
+        """ returns the member names without receiving the members"""
+        return [name for name in self._obj if not name.startswith("__") and name not in BASE_MEMBERS]
+
+    def is_loaded(self, name: str) -> bool:
+        """ checks if a member was already received"""
+        return name in self._members
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._obj
+
+    def __getitem__(self, name: str):
+        received = False
+        with self._lock:
+            if name not in self._members:
+                self._members[name] = self._resolve(self._obj[name])
+                received = True
+            member = self._members[name]
+        # outside of the lock, the callback measures the model
+        if received and self._fetcher.on_received is not None:
+            self._fetcher.on_received()
+        return member
+
+    def set_receive_callback(self, callback: Callable[[], None]) -> None:
+        """ sets the function which is called after a member of this or a nested object was received"""
+        self._fetcher.on_received = callback
+
+    def __getattr__(self, name: str):
+        # only called for missing attributes, e.g. dynamic members accessed as attribute
+        if name.startswith("_") or name not in self.__dict__.get("_obj", {}):
+            raise AttributeError(name)
+        return self[name]
+
+    def to_dict(self) -> dict:
+        """ returns the serialized root, detached members stay references"""
+        return dict(self._obj)
+
+    def _resolve(self, value):
+        """ receives a serialized member"""
+        if is_reference(value):
+            obj = self._fetcher.get_many([value["referencedId"]])[value["referencedId"]]
+            if obj.get("speckle_type") == "Base":
+                # containers stay lazy
+                return LazyBase(obj, self._fetcher, skip_geometry=bool(self._skip_members),
+                                known_elements=self._known_elements)
+            return self._deserialize([value])[0]
+        if isinstance(value, list):
+            return self._deserialize(flatten_data_chunks(value, self._fetcher))
+        if isinstance(value, dict) and "speckle_type" in value:
+            return self._deserialize([value])[0]
+        return value
+
+    def _deserialize(self, items: list) -> list:
+        """ receives the referenced elements with their children and deserializes all items into Base objects,
+        the items keep their order"""
+        element_ids = [item["referencedId"] for item in items if is_reference(item)]
+        inline_objects = [item for item in items if not is_reference(item)]
+        new_ids = [obj_id for obj_id in element_ids if obj_id not in self._known_elements]
+        self._fetcher.get_trees(new_ids + collect_references(inline_objects, self._skip_members), self._skip_members)
+        reader = _SkippingReader(self._fetcher.cache, self._skip_members)
+        serializer = BaseObjectSerializer(read_transport=reader)
+
+        elements = []
+        for item in items:
+            if is_reference(item):
+                obj_id = item["referencedId"]
+                if obj_id in self._known_elements:
+                    elements.append(self._known_elements[obj_id])
+                else:
+                    elements.append(serializer.read_json(obj_string=reader.get_object(obj_id)))
+            elif isinstance(item, dict):
+                obj = {name: value for name, value in item.items() if name not in self._skip_members}
+                serializer.deserialized = {}
+                elements.append(serializer.recompose_base(obj=obj))
+            else:
+                elements.append(item)
+        return elements
@@ -0,0 +1,213 @@
+from typing import Callable, Optional, Tuple
+
+from specklepy.objects import Base
+
+from modules.speckle.data_handler.base_handler import BaseHandler
+from modules.speckle.data_handler.query_engine import DuckDBQueryEngine
+from modules.speckle.speckle_settings import SpeckleSettings
+
+from collections import OrderedDict
+import threading
+
+
+class LoadedModel:
+
+    """
+    A received model version which is shared by all tools and pages of the process.
+
+    Variables:
+    url (str): the project url the model was loaded for
+    version_id (str): the resolved version (commit) id
+    base (Base): the received Base object (or a LazyBase in lazy mode)
+    lazy (bool): True if the categories are only received on first access
+    object_id (str): the referenced object of the version
+    diff (VersionDiff): changes against the previous version, if it was loaded incrementally
+    """
+
+    def __init__(self, url: str, version_id: str, base: Base, nbytes: int, lazy: bool = False, object_id: str = None) -> None:
+        self.url = url
+        self.version_id = version_id
+        self.base = base
+        self.lazy = lazy
+        self.object_id = object_id
+        self.diff = None
+        self._nbytes = nbytes
+        self._basehandler = None
+        self._query_engine = None
+        self._lock = threading.Lock()
+        # called when the model grew (received category, cached table), the registry checks its memory budget
+        self.on_grow = None
+        if hasattr(base, "set_receive_callback"):
+            base.set_receive_callback(self._grown)
+
+    @property
+    def nbytes(self) -> int:
+        """ estimated size of the model (serialized size of the received objects and the cached category tables)"""
+        # lazy models grow with every received category
+        nbytes = self._nbytes + getattr(self.base, "loaded_bytes", 0)
+        if self._basehandler is not None:
+            nbytes += self._basehandler.get_table_nbytes()
+        return nbytes
+
+    def get_basehandler(self) -> BaseHandler:
+        """ returns the shared basehandler of the model, created on first use"""
+        with self._lock:
+            if self._basehandler is None:
+                self._basehandler = BaseHandler(self.base, self.version_id)
+                self._basehandler.on_table_cached = self._grown
+        return self._basehandler
+
+    def release_tables(self, max_bytes: int) -> None:
+        """ drops the least recently cached tables until the whole model fits into max_bytes (as far as possible)"""
+        if self._basehandler is not None:
+            table_nbytes = self._basehandler.get_table_nbytes()
+            self._basehandler.release_tables(max(max_bytes - (self.nbytes - table_nbytes), 0))
+
+    def _grown(self) -> None:
+        if self.on_grow is not None:
+            self.on_grow()
+
+    def get_query_engine(self) -> DuckDBQueryEngine:
+        """ returns the shared SQL engine over all categories of the model, created on first use"""
+        basehandler = self.get_basehandler()
+        with self._lock:
+            if self._query_engine is None:
+                self._query_engine = DuckDBQueryEngine(basehandler)
+        return self._query_engine
+
+
+class _PendingLoad:
+
+    """ a load which is currently running, other callers wait for it"""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.model = None
+        self.error = None
+
+
+class ModelRegistry:
+
+    """
+    Thread-safe, process-wide registry of loaded Speckle models keyed by (project url, version id).
+
+    Concurrent requests for the same version wait for a single download. The registry keeps the
+    estimated size of all models below a budget and evicts the least recently used models. The budget is checked
+    when a model is loaded or requested and whenever a model grows (lazy category received, table cached). If the
+    most recent model alone exceeds the budget, its least recently cached tables are dropped.
+    """
+
+    def __init__(self, max_mb: int = None) -> None:
+        self.max_bytes = (max_mb if max_mb else SpeckleSettings.MODEL_REGISTRY_MAX_MB) * 1024 * 1024
+        self._models = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def get_model(self, url: str, version_id: str, loader: Callable[[], Tuple[Base, int]], lazy: bool = False,
+                  object_id: str = None) -> LoadedModel:
+        """ returns the loaded model, loads it with the loader if it is not registered yet
+
+        Args:
+            url (str): the project url
+            version_id (str): the resolved version id
+            loader (Callable): returns the Base object and its size in bytes, only called once per version
+            lazy (bool, optional): the loader returns a LazyBase, lazy and full models are registered separately
+            object_id (str, optional): the referenced object of the version
+
+        Returns:
+            LoadedModel: the shared model
+        """
+        key = (url, version_id, lazy)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                # the model may have grown since it was loaded
+                self._evict(keep=key)
+                return self._models[key]
+            pending = self._loading.get(key)
+            is_loader = pending is None
+            if is_loader:
+                pending = _PendingLoad()
+                self._loading[key] = pending
+
+        # another caller is already loading this version
+        if not is_loader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.model
+
+        try:
+            base, nbytes = loader()
+            pending.model = LoadedModel(url, version_id, base, nbytes, lazy, object_id)
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._loading[key]
+                if pending.model is not None:
+                    self._models[key] = pending.model
+                    pending.model.on_grow = lambda: self._check_budget(key)
+                    self._evict(keep=key)
+            pending.done.set()
+
+        return pending.model
+
+    def get_latest(self, url: str) -> Optional[LoadedModel]:
+        """ returns the most recently used model of the url, if any"""
+        with self._lock:
+            for model in reversed(self._models.values()):
+                if model.url == url:
+                    return model
+        return None
+
+    def remove(self, url: str, version_id: str) -> None:
+        """ removes all variants of a model version from the registry"""
+        with self._lock:
+            for lazy in [False, True]:
+                self._models.pop((url, version_id, lazy), None)
+
+    def get_total_bytes(self) -> int:
+        """ returns the estimated size of all registered models"""
+        with self._lock:
+            return sum(model.nbytes for model in self._models.values())
+
+    def get_stats(self) -> dict:
+        """ returns the registered models and the memory budget"""
+        with self._lock:
+            models = [{"url": model.url, "version_id": model.version_id, "lazy": model.lazy, "nbytes": model.nbytes}
+                      for model in self._models.values()]
+        return {"models": models, "total_bytes": sum(m["nbytes"] for m in models), "max_bytes": self.max_bytes}
+
+    def _check_budget(self, key: tuple) -> None:
+        """ checks the budget after the model of the key grew"""
+        with self._lock:
+            if key in self._models:
+                self._evict(keep=key)
+
+    def _evict(self, keep: tuple) -> None:
+        """ evicts the least recently used models until the budget is met, caller holds the lock"""
+        total = sum(model.nbytes for model in self._models.values())
+        for key in list(self._models):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._models.pop(key).nbytes
+        # the kept model alone exceeds the budget
+        if total > self.max_bytes and keep in self._models:
+            self._models[keep].release_tables(self.max_bytes)
+
+
+_model_registry = None
+_model_registry_lock = threading.Lock()
+
+
+def get_model_registry() -> ModelRegistry:
+    """ returns the process wide model registry"""
+    global _model_registry
+    with _model_registry_lock:
+        if _model_registry is None:
+            _model_registry = ModelRegistry()
+    return _model_registry
@@ -0,0 +1,289 @@
+from typing import Callable, Dict, List, Optional
+
+from specklepy.objects import Base
+from specklepy.transports.abstract_transport import AbstractTransport
+from specklepy.serialization.base_object_serializer import BaseObjectSerializer
+
+from modules.speckle.speckle_settings import SpeckleSettings
+from modules.tracing import traced
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class LocalObjectCache(AbstractTransport):
+
+    """
+    Disk-backed, content addressed store for Speckle objects.
+
+    Objects are keyed by their Speckle object id (the hash of their content), so an entry
+    never gets stale and the same SQLite file can be shared by all processes on the machine.
+    The cache works as local transport for the receive operation, keeps the total size below
+    a budget by evicting the least recently used object trees and counts hits and misses.
+    """
+
+    _name = "LocalObjectCache"
+
+    # SQLite allows a limited number of host parameters per statement
+    SQL_CHUNK_SIZE = 900
+
+    def __init__(self, path: str = None, max_mb: int = None) -> None:
+        """ open (or create) the cache database at the given path"""
+        super().__init__()
+        self.path = path if path else SpeckleSettings.OBJECT_CACHE_PATH
+        self.max_bytes = (max_mb if max_mb else SpeckleSettings.OBJECT_CACHE_MAX_MB) * 1024 * 1024
+
+        # objects which are not yet written to disk
+        self._write_buffer = {}
+        self._lock = threading.RLock()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_written = 0
+        self.evictions = 0
+
+        self._initialise()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    def _initialise(self) -> None:
+        """ creates the database file and the tables"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        # write ahead log allows readers in other processes while we write
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS objects(
+                hash TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL)"""
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_objects_access ON objects(last_access)")
+        # commits are immutable, so their referenced object can be cached as well
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS commits(
+                commit_id TEXT PRIMARY KEY,
+                stream_id TEXT,
+                object_id TEXT NOT NULL)"""
+        )
+        self._conn.commit()
+
+    # --- transport interface ---
+
+    def begin_write(self) -> None:
+        pass
+
+    def end_write(self) -> None:
+        """ writes all buffered objects and enforces the size budget"""
+        self.flush()
+
+    def save_object(self, id: str, serialized_object: str) -> None:
+        """ buffers the object, writes it to disk once the batch is full"""
+        with self._lock:
+            self._write_buffer[id] = serialized_object
+            if len(self._write_buffer) >= SpeckleSettings.OBJECT_CACHE_WRITE_BATCH:
+                self._write_batch()
+
+    def save_object_from_transport(self, id: str, source_transport: AbstractTransport) -> None:
+        serialized_object = source_transport.get_object(id)
+        self.save_object(id, serialized_object)
+
+    def get_object(self, id: str) -> Optional[str]:
+        """ returns the serialized object or None, used by the serializer (no counting)"""
+        with self._lock:
+            if id in self._write_buffer:
+                return self._write_buffer[id]
+            row = self._conn.execute("SELECT content FROM objects WHERE hash = ?", (id,)).fetchone()
+        return row[0] if row else None
+
+    def has_objects(self, id_list: List[str]) -> Dict[str, bool]:
+        """ checks which objects are stored locally, the remote transport only downloads the missing ones"""
+        found = {}
+        with self._lock:
+            buffered = [obj_id for obj_id in id_list if obj_id in self._write_buffer]
+            stored = self._lookup_sizes([obj_id for obj_id in id_list if obj_id not in self._write_buffer])
+        # everything that is found does not need to be downloaded
+        self.hits += len(stored)
+        self.bytes_saved += sum(stored.values())
+        self.misses += len(id_list) - len(stored) - len(buffered)
+        self._touch(list(stored))
+        for obj_id in id_list:
+            found[obj_id] = obj_id in stored or obj_id in buffered
+        return found
+
+    def copy_object_and_children(self, id: str, target_transport: AbstractTransport) -> str:
+        """ copies the object tree into another transport"""
+        root = self.get_object(id)
+        if root is None:
+            raise ValueError(f"Object {id} not found in {self.name}")
+        closure = json.loads(root).get("__closure", {})
+        for child_id in closure:
+            child = self.get_object(child_id)
+            if child is not None:
+                target_transport.save_object(child_id, child)
+        target_transport.save_object(id, root)
+        return root
+
+    # --- cache specific interface ---
+
+    def flush(self) -> None:
+        """ writes the buffered objects and evicts cold objects if the budget is exceeded"""
+        with self._lock:
+            self._write_batch()
+            self._evict()
+
+    def lookup_tree(self, obj_id: str) -> Optional[str]:
+        """ returns the root object if the root and all its children are stored locally,
+        the whole tree is counted as hit and marked as recently used"""
+        root = self.get_object(obj_id)
+        if root is None:
+            self.misses += 1
+            return None
+        children = list(json.loads(root).get("__closure", {}))
+        with self._lock:
+            sizes = self._lookup_sizes(children)
+        if len(sizes) < len(children):
+            # children were evicted, the remote transport only fetches the missing ones
+            self.misses += 1
+            return None
+        self.hits += len(children) + 1
+        self.bytes_saved += len(root) + sum(sizes.values())
+        self._touch(children + [obj_id])
+        return root
+
+    def get_tree_size(self, obj_id: str) -> int:
+        """ returns the serialized size of the object and all its children"""
+        root = self.get_object(obj_id)
+        if root is None:
+            return 0
+        with self._lock:
+            self._write_batch()
+            sizes = self._lookup_sizes(list(json.loads(root).get("__closure", {})))
+        return len(root) + sum(sizes.values())
+
+    def get_commit_object_id(self, commit_id: str) -> Optional[str]:
+        """ returns the referenced object id of a commit which was already received"""
+        if commit_id is None:
+            return None
+        with self._lock:
+            row = self._conn.execute("SELECT object_id FROM commits WHERE commit_id = ?", (commit_id,)).fetchone()
+        return row[0] if row else None
+
+    def save_commit(self, commit_id: str, stream_id: str, object_id: str) -> None:
+        """ remembers the referenced object of a commit"""
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO commits VALUES (?, ?, ?)", (commit_id, stream_id, object_id))
+            self._conn.commit()
+
+    def get_total_bytes(self) -> int:
+        """ returns the size of all stored objects"""
+        with self._lock:
+            row = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()
+        return row[0]
+
+    def get_stats(self) -> dict:
+        """ returns the counters of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+            "bytes_written": self.bytes_written,
+            "evictions": self.evictions,
+            "total_bytes": self.get_total_bytes(),
+            "max_bytes": self.max_bytes,
+        }
+
+    # --- internals, callers hold the lock ---
+
+    def _write_batch(self) -> None:
+        if not self._write_buffer:
+            return
+        now = time.time()
+        rows = [(obj_id, content, len(content), now) for obj_id, content in self._write_buffer.items()]
+        self._conn.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?)", rows)
+        self._conn.commit()
+        self.bytes_written += sum(row[2] for row in rows)
+        self._write_buffer = {}
+
+    def _lookup_sizes(self, id_list: List[str]) -> Dict[str, int]:
+        sizes = {}
+        for start in range(0, len(id_list), self.SQL_CHUNK_SIZE):
+            chunk = id_list[start:start + self.SQL_CHUNK_SIZE]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._conn.execute(f"SELECT hash, size FROM objects WHERE hash IN ({placeholders})", chunk)
+            sizes.update(rows.fetchall())
+        return sizes
+
+    def _touch(self, id_list: List[str]) -> None:
+        """ marks the objects as recently used"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany("UPDATE objects SET last_access = ? WHERE hash = ?", [(now, obj_id) for obj_id in id_list])
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """ deletes least recently used objects until the cache is below 90% of the budget"""
+        total = self.get_total_bytes()
+        if total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * 0.9)
+        to_delete = []
+        for obj_id, size in self._conn.execute("SELECT hash, size FROM objects ORDER BY last_access ASC"):
+            if total <= target:
+                break
+            to_delete.append((obj_id,))
+            total -= size
+        self._conn.executemany("DELETE FROM objects WHERE hash = ?", to_delete)
+        self._conn.commit()
+        self.evictions += len(to_delete)
+
+
+_object_cache = None
+_object_cache_lock = threading.Lock()
+
+
+def get_object_cache() -> LocalObjectCache:
+    """ returns the process wide object cache"""
+    global _object_cache
+    with _object_cache_lock:
+        if _object_cache is None:
+            _object_cache = LocalObjectCache()
+    return _object_cache
+
+
+@traced(kind="speckle")
+def receive_with_cache(obj_id: str, get_remote_transport: Callable[[], AbstractTransport],
+                       cache: LocalObjectCache = None) -> Base:
+    """ receives an object tree, uses the local cache first and only downloads the missing objects
+
+    Args:
+        obj_id (str): id of the root object
+        get_remote_transport (Callable): returns the server transport, only called on a cache miss
+        cache (LocalObjectCache, optional): the cache to use. Defaults to the process wide cache.
+
+    Returns:
+        Base: the received Base object
+    """
+    cache = cache if cache else get_object_cache()
+
+    obj_string = cache.lookup_tree(obj_id)
+    if obj_string is None:
+        # download the missing objects into the cache
+        remote_transport = get_remote_transport()
+        obj_string = remote_transport.copy_object_and_children(id=obj_id, target_transport=cache)
+        cache.end_write()
+
+    # deserialize from the local cache
+    serializer = BaseObjectSerializer(read_transport=cache)
+    return serializer.read_json(obj_string=obj_string)
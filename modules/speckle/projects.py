@@ -1,12 +1,19 @@
 from dotenv import load_dotenv
 
 from modules.speckle.data_handler.base_handler import BaseHandler
+from modules.speckle.data_handler.query_engine import DuckDBQueryEngine
+from modules.speckle.object_cache import get_object_cache, receive_with_cache
+from modules.speckle.model_registry import get_model_registry
+from modules.speckle.client_pool import get_client_pool
+from modules.speckle.lazy_model import LazyBase, LazyObjectFetcher
+from modules.speckle.recorded_transport import RecordedTransport, get_recording_path, record_version
+from modules.speckle.speckle_settings import SpeckleSettings
+from modules.speckle.version_diff import compute_version_diff
+from modules.speckle.data_handler.table_store import get_table_store
+from modules.tracing import traced
 
-from specklepy.api.client import SpeckleClient
 from specklepy.objects import Base
-from specklepy.transports.server import ServerTransport
 from specklepy.api.wrapper import StreamWrapper
-from specklepy.api import operations
 from specklepy.serialization.base_object_serializer import BaseObjectSerializer
 from specklepy.logging.exceptions import GraphQLException
 
@@ -35,8 +42,8 @@ class ProjectsOverview:
         return self.projects[project_name]
     
     def get_default_project(self):
-        """ returns the first project in the list"""
-        return self.projects[0]
+        """ returns the name of the first project in the list"""
+        return self.PROJECTS[0]["name"]
 
 
 class SpeckleProject:
@@ -46,9 +53,20 @@ class SpeckleProject:
     For the output of data, see speckle_data.py
     """
 
-    def __init__(self, name = None, url = None):
-        """ provide the SpeckleProject with a name and a url or a project name from the ProjectsOverview"""
+    def __init__(self, name = None, url = None, lazy = None, skip_geometry = None, transport = None):
+        """ provide the SpeckleProject with a name and a url or a project name from the ProjectsOverview
+
+        in lazy mode only the root object is received at first, the elements of a category are
+        received on first access (optionally without display geometry)
+
+        the transport selects the source of the model: "server", "record" (the received version is recorded)
+        or "replay" (the recorded version is served from disk, no network)"""
         self.name = name
+        self.lazy = lazy if lazy is not None else SpeckleSettings.LAZY_LOADING
+        self.skip_geometry = skip_geometry if skip_geometry is not None else SpeckleSettings.SKIP_GEOMETRY
+        self.transport = transport if transport is not None else SpeckleSettings.TRANSPORT
+        if self.transport not in ["server", "record", "replay"]:
+            raise ValueError(f"Speckle transport not supported: {self.transport}")
         if url is not None:
             self.url = url
         else:
@@ -61,10 +79,15 @@ class SpeckleProject:
         try:
             self.url = projects.get_url(name)
         except KeyError:
-            KeyError(f"Project {name} not found in ProjectsOverview")
+            raise KeyError(f"Project {name} not found in ProjectsOverview") from None
 
+    @traced(kind="speckle")
     def load_json(self):
         """ loads the json data from the Speckle base object"""
+        if isinstance(self.base_obj, LazyBase):
+            # in lazy mode the detached members are shown as references
+            self.obj_dict = self.base_obj.to_dict()
+            return self.obj_dict
         serializer = BaseObjectSerializer()
         _, self.obj_dict = serializer.traverse_base(self.base_obj)
         return self.obj_dict
@@ -75,9 +98,12 @@ class SpeckleProject:
         """
         self.auth_token = os.environ.get("SPECKLE_AUTH_TOKEN")
 
+    @traced(kind="speckle", attributes=["commit_url"])
     def get_commit_data(self, commit_url: str) -> Base:
         """ gets the commit data from the Speckle API and returns it as Base object,
         supports old and new Speckle format"""
+        if self.transport == "replay":
+            return self.get_commit_data_recorded(commit_url)
         version = self.identify_oldnew_speckle(commit_url)
         if version == "old":
             commit_data = self.get_commit_data_old(commit_url)
@@ -91,62 +117,139 @@ class SpeckleProject:
         """
         # load Speckle API token
         self._load_auth_token()
-
-        version = self.identify_oldnew_speckle(commit_url)
-        if version=="old":
-            client = SpeckleClient(host="app.speckle.systems")
-        elif version=="new":
-            client = SpeckleClient(host="speckle.xyz")
-
-        client = SpeckleClient(host="speckle.xyz")
-        client.authenticate_with_token(self.auth_token)
+        host = "speckle.xyz"
 
         # get Speckle Stream Wrapper
         wrapper = StreamWrapper(commit_url)
-        # Initialize a server transport
-        transport = ServerTransport(client=client, stream_id=wrapper.stream_id)
 
-        # Get the commit
-        try:
-            commit_obj = client.commit.get(wrapper.stream_id, wrapper.commit_id)
-        except GraphQLException as e:
-            raise ValueError(f"Error while getting commit: {e}")
+        # commits are immutable, a known commit is served from the local object cache
+        cache = get_object_cache()
+        object_id = cache.get_commit_object_id(wrapper.commit_id)
 
-        # load the base object
-        self.base_obj = operations.receive(commit_obj.referencedObject, transport)
-        return self.base_obj
+        if object_id is None:
+            client = get_client_pool().get_client(host, self.auth_token)
+
+            # Get the commit
+            try:
+                commit_obj = client.commit.get(wrapper.stream_id, wrapper.commit_id)
+            except GraphQLException as e:
+                raise ValueError(f"Error while getting commit: {e}")
+            object_id = commit_obj.referencedObject
+            cache.save_commit(wrapper.commit_id, wrapper.stream_id, object_id)
+
+        def get_transport():
+            # the server transport is only needed if objects are missing locally
+            return get_client_pool().get_transport(host, self.auth_token, wrapper.stream_id)
+
+        # load the base object (shared with all other callers of this version)
+        return self._load_version(commit_url, wrapper.commit_id, object_id, get_transport)
     
     def get_commit_data_new(self, commit_url: str) -> Base:
         """ get the commit data as Base object, based on the new Speckle version"""
         # load Speckle API token
         self._load_auth_token()
-        
-        client = SpeckleClient(host="app.speckle.systems")
-        client.authenticate_with_token(self.auth_token)
+        host = "app.speckle.systems"
+        pool = get_client_pool()
 
         # get Speckle Stream Wrapper
         wrapper = StreamWrapper(commit_url)
 
-        # Fetch commit and create a transport for operations
+        # Fetch commit (the latest commit is only resolved again after a short time)
         if wrapper.commit_id is None:
-            stream = client.stream.get(wrapper.stream_id)
-            model = next((branch for branch in stream.branches.items
-                        if branch.id == wrapper.model_id), None)
-            commit = model.commits.items[0] if model else None
+            commit = pool.get_latest_commit(host, self.auth_token, wrapper.stream_id, wrapper.model_id)
+        else:
+            commit = pool.get_client(host, self.auth_token).commit.get(wrapper.stream_id, wrapper.commit_id)
 
-        transport = ServerTransport(client=client, stream_id=wrapper.stream_id)
+        if commit is None:
+            raise ValueError(f"No version found for model {wrapper.model_id}")
 
-        # Get the commit
-        self.base_obj = operations.receive(obj_id=commit.referencedObject,remote_transport=transport)
-        
-        # try:
-        #     # Retrieve and process the referenced object
-        #     self.base_obj = operations.receive(obj_id=commit.referencedObject,remote_transport=transport)
-        # except GraphQLException as e:
-        #     raise ValueError(f"Error while getting commit: {e}")
-        
+        def get_transport():
+            return pool.get_transport(host, self.auth_token, wrapper.stream_id)
+
+        # Get the commit (shared with all other callers of this version)
+        return self._load_version(commit_url, commit.id, commit.referencedObject, get_transport)
+
+    def get_commit_data_recorded(self, commit_url: str) -> Base:
+        """ get the commit data as Base object from the recording of the url (see recorded_transport.py)"""
+        transport = RecordedTransport(get_recording_path(commit_url))
+        version_id, object_id = transport.get_version()
+        return self._load_version(commit_url, version_id, object_id, lambda: transport)
+
+    def _load_version(self, commit_url: str, version_id: str, object_id: str, get_transport) -> Base:
+        """ gets the model version from the process wide registry, receives it only if no other
+        caller has loaded it yet (objects which were received before come from the local cache)
+
+        if a previous version of the model is registered, the new version is loaded incrementally:
+        only the changed elements are received and the cached category tables are patched"""
+        if self.transport == "record":
+            self._record_version(commit_url, version_id, object_id, get_transport)
+
+        registry = get_model_registry()
+        previous = registry.get_latest(commit_url)
+        if previous is None or previous.version_id == version_id or previous.object_id is None \
+                or not SpeckleSettings.INCREMENTAL_UPDATES:
+            previous = None
+        loaded_incrementally = []
+
+        def load_model():
+            base = receive_with_cache(object_id, get_transport)
+            return base, get_object_cache().get_tree_size(object_id)
+
+        def load_lazy_model():
+            # only the root object, categories are received on first access
+            fetcher = LazyObjectFetcher(get_transport)
+            root = fetcher.get_many([object_id])[object_id]
+            return LazyBase(root, fetcher, skip_geometry=self.skip_geometry), 0
+
+        def load_incremental_model():
+            # reuse the unchanged elements of the previous version
+            fetcher = LazyObjectFetcher(get_transport)
+            diff = compute_version_diff(previous.version_id, previous.object_id, version_id, object_id, fetcher)
+            known_elements = previous.get_basehandler().get_loaded_elements()
+            root = fetcher.get_many([object_id])[object_id]
+            loaded_incrementally.append(diff)
+            return LazyBase(root, fetcher, skip_geometry=self.skip_geometry, known_elements=known_elements), 0
+
+        if previous is not None:
+            loader = load_incremental_model
+        elif self.lazy or get_table_store().has_version(version_id):
+            # the tables of a known version are read from Parquet, elements are only received if needed
+            loader = load_lazy_model
+        else:
+            loader = load_model
+        self.model = registry.get_model(commit_url, version_id, loader, lazy=self.lazy, object_id=object_id)
+
+        if loaded_incrementally:
+            # patch the tables of the previous version instead of rebuilding them
+            self.model.diff = loaded_incrementally[0]
+            self.model.get_basehandler().patch_from(previous.get_basehandler())
+
+        self.version_id = version_id
+        self.base_obj = self.model.base
         return self.base_obj
-    
+
+    def _record_version(self, commit_url: str, version_id: str, object_id: str, get_transport) -> None:
+        """ records the whole version, so it can be replayed without the server"""
+        cache = get_object_cache()
+        if cache.lookup_tree(object_id) is None:
+            get_transport().copy_object_and_children(id=object_id, target_transport=cache)
+            cache.end_write()
+        record_version(commit_url, version_id, object_id, cache)
+
+    def check_for_new_version(self):
+        """ checks if a new version of the model was pushed and loads it incrementally
+
+        Returns:
+            VersionDiff: added, removed and modified elements per category, None if the version did not change
+        """
+        previous_version_id = getattr(self, "version_id", None)
+        # resolve the latest version again, instead of waiting for the cached resolution to expire
+        get_client_pool().invalidate_latest_commits()
+        self.get_commit_data(self.url)
+        if previous_version_id is None or previous_version_id == self.version_id:
+            return None
+        return self.model.diff
+
     def identify_oldnew_speckle(self, commit_url: str) -> str:
         """ identifies if the commit_url is from the old or new speckle version"""
         # check URL for old or new Speckle version
@@ -170,9 +273,21 @@ class SpeckleProject:
         # check that base_obj is already loaded
         if not hasattr(self, "base_obj"):
             self.get_commit_data(self.url)
-        # create basehandler
-        self.basehandler = BaseHandler(self.base_obj)
+        # get the basehandler which is shared by all callers of this version
+        self.basehandler = self.model.get_basehandler()
         return self.basehandler
+
+    def get_version_id(self) -> str:
+        """ returns the id of the loaded version, caches of derived data (answers, plans) are keyed by it"""
+        if not hasattr(self, "base_obj"):
+            self.get_commit_data(self.url)
+        return self.version_id
+
+    def get_query_engine(self) -> DuckDBQueryEngine:
+        """ returns the SQL engine over all categories of the loaded version"""
+        if not hasattr(self, "base_obj"):
+            self.get_commit_data(self.url)
+        return self.model.get_query_engine()
     
     def get_project_information(self) -> Base:
         """ extracts the project information as base object"""
@@ -0,0 +1,146 @@
+from typing import Dict, List, Optional, Tuple
+
+from specklepy.objects import Base
+from specklepy.transports.abstract_transport import AbstractTransport
+from specklepy.serialization.base_object_serializer import BaseObjectSerializer
+
+from modules.speckle.speckle_settings import SpeckleSettings
+
+import hashlib
+import json
+import os
+import threading
+
+
+class RecordedTransport(AbstractTransport):
+
+    """
+    File-based transport which serves the recorded objects of a model version, no Speckle server is needed.
+
+    A recording is a folder per model url with the resolved version (version.json) and the serialized
+    objects (objects.jsonl, one "id<TAB>object" per line like the getobjects endpoint of the server).
+    It replaces the server transport when SpeckleSettings.TRANSPORT is "replay".
+    """
+
+    _name = "RecordedTransport"
+
+    VERSION_FILE = "version.json"
+    OBJECTS_FILE = "objects.jsonl"
+
+    def __init__(self, path: str) -> None:
+        """ open the recording folder, the objects are read on first access"""
+        super().__init__()
+        self.path = path
+        self._objects = None
+        self._write_buffer = {}
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    # --- transport interface ---
+
+    def begin_write(self) -> None:
+        pass
+
+    def end_write(self) -> None:
+        """ appends the buffered objects to the recording"""
+        with self._lock:
+            if not self._write_buffer:
+                return
+            os.makedirs(self.path, exist_ok=True)
+            objects = self._load()
+            with open(os.path.join(self.path, self.OBJECTS_FILE), "a", encoding="utf-8") as file:
+                for obj_id, serialized_object in self._write_buffer.items():
+                    if obj_id not in objects:
+                        file.write(f"{obj_id}\t{serialized_object}\n")
+                        objects[obj_id] = serialized_object
+            self._write_buffer = {}
+
+    def save_object(self, id: str, serialized_object: str) -> None:
+        with self._lock:
+            self._write_buffer[id] = serialized_object
+
+    def save_object_from_transport(self, id: str, source_transport: AbstractTransport) -> None:
+        self.save_object(id, source_transport.get_object(id))
+
+    def get_object(self, id: str) -> Optional[str]:
+        with self._lock:
+            if id in self._write_buffer:
+                return self._write_buffer[id]
+            return self._load().get(id)
+
+    def has_objects(self, id_list: List[str]) -> Dict[str, bool]:
+        with self._lock:
+            objects = self._load()
+            return {obj_id: obj_id in objects or obj_id in self._write_buffer for obj_id in id_list}
+
+    def copy_object_and_children(self, id: str, target_transport: AbstractTransport) -> str:
+        """ copies the object tree into another transport (e.g. the local object cache)"""
+        root = self.get_object(id)
+        if root is None:
+            raise ValueError(f"Object {id} not recorded in {self.path}")
+        for child_id in json.loads(root).get("__closure", {}):
+            child = self.get_object(child_id)
+            if child is not None:
+                target_transport.save_object(child_id, child)
+        target_transport.save_object(id, root)
+        return root
+
+    # --- recording specific interface ---
+
+    def get_version(self) -> Tuple[str, str]:
+        """ returns the recorded version id and the id of its root object"""
+        version_path = os.path.join(self.path, self.VERSION_FILE)
+        if not os.path.exists(version_path):
+            raise ValueError(f"No recorded version in {self.path} (record it with SPECKLE_TRANSPORT=record)")
+        with open(version_path, encoding="utf-8") as file:
+            version = json.load(file)
+        return version["version_id"], version["object_id"]
+
+    def save_version(self, url: str, version_id: str, object_id: str) -> None:
+        """ records the resolved version of the model url"""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, self.VERSION_FILE), "w", encoding="utf-8") as file:
+            json.dump({"url": url, "version_id": version_id, "object_id": object_id}, file, indent=2)
+
+    def _load(self) -> dict:
+        """ reads the recorded objects, callers hold the lock"""
+        if self._objects is None:
+            self._objects = {}
+            objects_path = os.path.join(self.path, self.OBJECTS_FILE)
+            if os.path.exists(objects_path):
+                with open(objects_path, encoding="utf-8") as file:
+                    for line in file:
+                        if line.strip():
+                            obj_id, serialized_object = line.rstrip("\n").split("\t", 1)
+                            self._objects[obj_id] = serialized_object
+        return self._objects
+
+
+def get_recording_path(url: str, root: str = None) -> str:
+    """ returns the recording folder of a model url"""
+    root = root if root else SpeckleSettings.RECORDING_DIR
+    return os.path.join(root, hashlib.sha256(url.encode("utf-8")).hexdigest()[:16])
+
+
+def record_version(url: str, version_id: str, object_id: str, source: AbstractTransport) -> None:
+    """ records a received model version, the objects are copied from the source transport (e.g. the object cache)"""
+    transport = RecordedTransport(get_recording_path(url))
+    if not transport.has_objects([object_id])[object_id]:
+        source.copy_object_and_children(object_id, transport)
+        transport.end_write()
+    transport.save_version(url, version_id, object_id)
+
+
+def record_base(url: str, base: Base, version_id: str = None) -> str:
+    """ records a Base object as the version of a model url (e.g. a synthetic model), returns the version id"""
+    transport = RecordedTransport(get_recording_path(url))
+    serializer = BaseObjectSerializer(write_transports=[transport])
+    object_id, _ = serializer.write_json(base)
+    transport.end_write()
+    # versions of recorded Base objects are identified by their content
+    version_id = version_id if version_id else object_id[:10]
+    transport.save_version(url, version_id, object_id)
+    return version_id
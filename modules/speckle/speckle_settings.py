@@ -0,0 +1,48 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+
+class SpeckleSettings():
+
+    """class to handle the settings of the Speckle data loading over all prototypes"""
+
+    # root folder for all local caches, shared by all processes on this machine
+    CACHE_DIR = os.environ.get("BIM_IR_CACHE_DIR", ".cache")
+
+    # content addressed object cache (keyed by Speckle object id)
+    OBJECT_CACHE_PATH = os.path.join(CACHE_DIR, "speckle", "objects.db")
+    OBJECT_CACHE_MAX_MB = int(os.environ.get("SPECKLE_OBJECT_CACHE_MAX_MB", 4096))
+
+    # number of objects which are buffered before they are written to disk
+    OBJECT_CACHE_WRITE_BATCH = 2000
+
+    # budget of the process wide model registry, estimated by the serialized size of the models
+    MODEL_REGISTRY_MAX_MB = int(os.environ.get("SPECKLE_MODEL_REGISTRY_MAX_MB", 2048))
+
+    # budget of the data the Streamlit pages derive from the models (JSON tree, selected tables),
+    # shared by all sessions of the server
+    SHARED_CACHE_MAX_MB = int(os.environ.get("SPECKLE_SHARED_CACHE_MAX_MB", 1024))
+
+    # seconds for which the latest version of a model is not resolved again
+    VERSION_RESOLVE_TTL = float(os.environ.get("SPECKLE_VERSION_RESOLVE_TTL", 30))
+
+    # number of kept-alive connections per Speckle server
+    HTTP_POOL_SIZE = 8
+
+    # lazy mode: receive the elements of a category only on first access
+    LAZY_LOADING = os.environ.get("SPECKLE_LAZY_LOADING", "false").lower() == "true"
+    # skip the display geometry of the elements in lazy mode
+    SKIP_GEOMETRY = os.environ.get("SPECKLE_SKIP_GEOMETRY", "true").lower() == "true"
+
+    # load new versions of a registered model incrementally (only changed elements are received)
+    INCREMENTAL_UPDATES = os.environ.get("SPECKLE_INCREMENTAL_UPDATES", "true").lower() == "true"
+
+    # materialized category tables (Parquet), keyed by version id and category
+    TABLE_STORE_DIR = os.path.join(CACHE_DIR, "tables")
+
+    # source of the models: "server", "record" (server, the received versions are recorded) or "replay"
+    # (recorded versions only, no network, e.g. for the pipeline benchmark)
+    TRANSPORT = os.environ.get("SPECKLE_TRANSPORT", "server")
+    RECORDING_DIR = os.environ.get("SPECKLE_RECORDING_DIR", os.path.join(CACHE_DIR, "recordings", "speckle"))
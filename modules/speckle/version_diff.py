@@ -0,0 +1,111 @@
+from typing import Dict, List
+
+from pandas import DataFrame
+
+from modules.speckle.lazy_model import LazyObjectFetcher, get_category_element_ids
+
+
+class CategoryDiff:
+
+    """
+    Changes of a single category between two versions.
+
+    Elements are identified by their applicationId (e.g. the Revit UniqueId), elements without
+    applicationId by their object id. As object ids are content hashes, every changed element
+    gets a new object id.
+
+    Variables:
+    added (list[str]): elements which only exist in the new version
+    removed (list[str]): elements which only exist in the old version
+    modified (list[str]): elements which exist in both versions with changed content
+    changed_object_ids (list[str]): object ids of the new version which have to be received
+    """
+
+    def __init__(self) -> None:
+        self.added = []
+        self.removed = []
+        self.modified = []
+        self.changed_object_ids = []
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.removed or self.modified)
+
+
+class VersionDiff:
+
+    """ changes between two versions of a model, per category"""
+
+    def __init__(self, old_version_id: str, new_version_id: str) -> None:
+        self.old_version_id = old_version_id
+        self.new_version_id = new_version_id
+        self.categories = {}
+
+    def is_empty(self) -> bool:
+        return all(category_diff.is_empty() for category_diff in self.categories.values())
+
+    def get_changed_object_ids(self) -> List[str]:
+        """ returns the object ids which have to be received for the new version"""
+        return [obj_id for category_diff in self.categories.values() for obj_id in category_diff.changed_object_ids]
+
+    def to_dataframe(self) -> DataFrame:
+        """ returns the diff as table with the columns category, change and element"""
+        rows = []
+        for category, category_diff in self.categories.items():
+            for change in ["added", "removed", "modified"]:
+                for element in getattr(category_diff, change):
+                    rows.append({"category": category, "change": change, "element": element})
+        return DataFrame(rows, columns=["category", "change", "element"])
+
+
+def _get_identities(object_ids: List[str], fetcher: LazyObjectFetcher) -> Dict[str, str]:
+    """ maps object ids to the identity of the element (applicationId, otherwise the object id)"""
+    if not object_ids:
+        return {}
+    objects = fetcher.get_many(object_ids)
+    return {obj_id: obj.get("applicationId") or obj_id for obj_id, obj in objects.items()}
+
+
+def compute_version_diff(old_version_id: str, old_object_id: str, new_version_id: str, new_object_id: str,
+                         fetcher: LazyObjectFetcher) -> VersionDiff:
+    """ computes the changed elements per category between two versions
+
+    Only the roots, the category containers and the elements with a changed object id are received,
+    objects of the old version normally come from the local object cache.
+
+    Args:
+        old_version_id (str): id of the cached version
+        old_object_id (str): referenced object of the cached version
+        new_version_id (str): id of the new version
+        new_object_id (str): referenced object of the new version
+        fetcher (LazyObjectFetcher): fetcher for the stream of the model
+
+    Returns:
+        VersionDiff: added, removed and modified elements per category
+    """
+    roots = fetcher.get_many([old_object_id, new_object_id])
+    old_categories = get_category_element_ids(roots[old_object_id], fetcher)
+    new_categories = get_category_element_ids(roots[new_object_id], fetcher)
+
+    diff = VersionDiff(old_version_id, new_version_id)
+    for category in set(old_categories) | set(new_categories):
+        old_ids = set(old_categories.get(category, []))
+        new_ids = set(new_categories.get(category, []))
+
+        # unchanged elements keep their object id
+        old_only = [obj_id for obj_id in old_categories.get(category, []) if obj_id not in new_ids]
+        new_only = [obj_id for obj_id in new_categories.get(category, []) if obj_id not in old_ids]
+        old_identities = set(_get_identities(old_only, fetcher).values())
+        new_identities = _get_identities(new_only, fetcher)
+
+        category_diff = CategoryDiff()
+        category_diff.changed_object_ids = new_only
+        for identity in new_identities.values():
+            if identity in old_identities:
+                category_diff.modified.append(identity)
+            else:
+                category_diff.added.append(identity)
+        new_identity_set = set(new_identities.values())
+        category_diff.removed = [identity for identity in old_identities if identity not in new_identity_set]
+        diff.categories[category] = category_diff
+
+    return diff
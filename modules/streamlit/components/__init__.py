@@ -1,5 +1,24 @@
-from .st_components import StreamlitComponents
-from .st_langchain import Streamlit_Langchain_Components
-from .st_pandasai import Streamlit_PandasAI_Components
-from .st_speckle import Streamlit_Speckle_Components
-from .sidebar import Sidebar
\ No newline at end of file
+from importlib import import_module
+
+# the components are imported on first access, so the data view does not load the chat stack
+_COMPONENTS = {
+    "StreamlitComponents": ".st_components",
+    "Streamlit_Langchain_Components": ".st_langchain",
+    "Streamlit_PandasAI_Components": ".st_pandasai",
+    "Streamlit_Speckle_Components": ".st_speckle",
+    "Sidebar": ".sidebar",
+}
+
+__all__ = list(_COMPONENTS)
+
+
+def __getattr__(name: str):
+    if name not in _COMPONENTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_COMPONENTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,5 +1,7 @@
 import streamlit as st
 
+from modules.tracing import get_tracer
+
 class StreamlitComponents:
     
     def __init__(self):
@@ -17,4 +19,21 @@ class StreamlitComponents:
         )
 
         if info:
-            st.expander("ℹ️ Info about this Page", expanded=False).markdown(info)
\ No newline at end of file
+            st.expander("ℹ️ Info about this Page", expanded=False).markdown(info)
+
+    def record_latency(self, metrics: dict, max_entries: int = 100):
+        """
+        Saves the latency metrics of an answer in the session state and shows the time to the first visible output,
+        the metrics are added to the trace of the request
+        """
+        request_span = get_tracer().get_current_span()
+        if request_span is not None:
+            request_span.trace.root.attributes.update(metrics)
+            metrics = {**metrics, "trace_id": request_span.trace.trace_id}
+        latencies = st.session_state.setdefault("latency_metrics", [])
+        latencies.append({"page": st.session_state.get("page_title"), "project": st.session_state.get("project_name"),
+                          **metrics})
+        del latencies[:-max_entries]
+
+        if metrics.get("time_to_first_visible") is not None:
+            st.caption(f"Erste Ausgabe nach {metrics['time_to_first_visible']:.2f} s, Antwort nach {metrics['total_time']:.2f} s")
@@ -1,7 +1,9 @@
 from .st_components import StreamlitComponents
 
-from modules.streamlit.messages import StreamlitChatHistory, OutputGenerator
+from modules.streamlit.messages import StreamlitChatHistory, OutputGenerator, StreamlitStreamHandler
 from modules.llm.agent_handler import Langchain_Agent_Handler
+from modules.llm.llm_settings import LLMSettings
+from modules.tracing import get_tracer, span, traced
 
 import streamlit as st
 from langchain.agents import AgentExecutor
@@ -13,6 +15,7 @@ class Streamlit_Langchain_Components(StreamlitComponents):
     def __init__(self):
         super().__init__()
 
+    @traced(kind="render")
     def load_chat_history(self, page_title: str) -> StreamlitChatHistory:
         """ loads the chat history from the list of Human and AI messages
         converts the Langchain messages to Streamlit chat outputs"""
@@ -40,89 +43,113 @@ class Streamlit_Langchain_Components(StreamlitComponents):
         
         return chat_history
     
-    def new_user_query(self, agent: AgentExecutor, chat_history: StreamlitChatHistory) -> StreamlitChatHistory:
+    def new_user_query(self, agent: AgentExecutor, chat_history: StreamlitChatHistory,
+                       settings: LLMSettings = None) -> StreamlitChatHistory:
         """ handle a new user query, sends to API and returns the response, updates the chat history"""
+        settings = settings if settings else LLMSettings()
         if prompt := st.chat_input("Frag mich alles über deine BIM Daten..."):
+            with get_tracer().trace("chat.langchain", page=st.session_state.get("page_title"),
+                                    project=st.session_state.get("project_name")):
             
-            # Display user message in chat message container
-            with st.chat_message("user"):
-                st.markdown(prompt)
-
-            # Display assistant response in chat message container
-            with st.chat_message("assistant"):
-                # generate placeholder for message
-                message_placeholder = st.empty()
-
-                # load Langchain Tracer (for LangSmith)
-                tracer = LangChainTracer()
-                # get assistant response via API
-                assistant_response = agent.invoke(
-                    {
-                        "input": prompt,
-                        "chat_history": chat_history.history
-                    },
-                    config={"callbacks": [tracer]}
-                )
-                response_output = assistant_response["output"]
-
-                # generate output message in Streamlit
-                output = OutputGenerator.get_output(response_output)
-                output.return_chat_message(response_output, message_placeholder)
-
-                # Show intermediate steps in Streamlit
-                with st.expander("Zwischenschritte des Agenten anzeigen"):
-                    # st.write(Langchain_Agent_Handler.show_intermediate_steps(assistant_response))
-                    self._understand_message(assistant_response)
+                # Display user message in chat message container
+                with st.chat_message("user"):
+                    st.markdown(prompt)
+
+                # Display assistant response in chat message container
+                with st.chat_message("assistant"):
+                    # generate placeholder for message and a container for the tool calls
+                    status = st.status("Agent arbeitet...")
+                    message_placeholder = st.empty()
+
+                    # load Langchain Tracer (for LangSmith)
+                    tracer = LangChainTracer()
+                    # streams the tokens and tool calls into the placeholders while they are generated
+                    stream_handler = StreamlitStreamHandler(message_placeholder, status)
+                    # get assistant response via API
+                    assistant_response = Langchain_Agent_Handler.invoke(
+                        agent,
+                        {
+                            "input": prompt,
+                            # last turns and a summary of the older ones, bounded by the token budget of the model
+                            "chat_history": chat_history.get_agent_history(settings)
+                        },
+                        callbacks=[tracer, stream_handler]
+                    )
+                    response_output = assistant_response["output"]
+                    status.update(label="Agent fertig", state="complete", expanded=False)
+
+                    # generate output message in Streamlit
+                    output = OutputGenerator.get_output(response_output)
+                    with span("render.output", kind="render"):
+                        output.return_chat_message(response_output, message_placeholder)
+                    self.record_latency(stream_handler.get_metrics())
+
+                    # Show intermediate steps in Streamlit
+                    with st.expander("Zwischenschritte des Agenten anzeigen"):
+                        # st.write(Langchain_Agent_Handler.show_intermediate_steps(assistant_response))
+                        self._understand_message(assistant_response)
             
-            # for successful chat, Add user message to chat history
-            chat_history.append(HumanMessage(prompt))
-            # Add assistant message to chat history
-            chat_history.append(AIMessage(response_output))
+                # for successful chat, Add user message to chat history
+                chat_history.append(HumanMessage(prompt))
+                # Add assistant message to chat history
+                chat_history.append(AIMessage(response_output))
 
         return chat_history
     
-    def test_tool(self, agent: AgentExecutor, chat_history: StreamlitChatHistory) -> StreamlitChatHistory:
+    def test_tool(self, agent: AgentExecutor, chat_history: StreamlitChatHistory,
+                  settings: LLMSettings = None) -> StreamlitChatHistory:
         """ handle a new user query, sends to API and returns the response, updates the chat history"""
+        settings = settings if settings else LLMSettings()
         if prompt := st.chat_input("Frag mich alles über deine BIM Daten..."):
+            with get_tracer().trace("chat.langchain", page=st.session_state.get("page_title"),
+                                    project=st.session_state.get("project_name")):
             
-            # Display user message in chat message container
-            with st.chat_message("user"):
-                st.markdown(prompt)
-
-            # Display assistant response in chat message container
-            with st.chat_message("assistant"):
-                # generate placeholder for message
-                message_placeholder = st.empty()
-
-                # load Langchain Tracer (for LangSmith)
-                tracer = LangChainTracer()
-                # get assistant response via API
-                assistant_response = agent.invoke(
-                    {
-                        "question": prompt,
-                        "chat_history": chat_history.history
-                    },
-                    config={"callbacks": [tracer]}
-                )
-                response_output = assistant_response["output"]
-
-                # generate output message in Streamlit
-                output = OutputGenerator.get_output(response_output)
-                output.return_chat_message(response_output, message_placeholder)
-
-                # Show intermediate steps in Streamlit
-                with st.expander("Zwischenschritte des Agenten anzeigen"):
-                    # st.write(Langchain_Agent_Handler.show_intermediate_steps(assistant_response))
-                    self._understand_message(assistant_response)
+                # Display user message in chat message container
+                with st.chat_message("user"):
+                    st.markdown(prompt)
+
+                # Display assistant response in chat message container
+                with st.chat_message("assistant"):
+                    # generate placeholder for message and a container for the tool calls
+                    status = st.status("Agent arbeitet...")
+                    message_placeholder = st.empty()
+
+                    # load Langchain Tracer (for LangSmith)
+                    tracer = LangChainTracer()
+                    # streams the tokens and tool calls into the placeholders while they are generated
+                    stream_handler = StreamlitStreamHandler(message_placeholder, status)
+                    # get assistant response via API
+                    assistant_response = agent.invoke(
+                        {
+                            "question": prompt,
+                            # last turns and a summary of the older ones, bounded by the token budget of the model
+                            "chat_history": chat_history.get_agent_history(settings)
+                        },
+                        config={"callbacks": [tracer, stream_handler]}
+                    )
+                    response_output = assistant_response["output"]
+                    status.update(label="Agent fertig", state="complete", expanded=False)
+
+                    # generate output message in Streamlit
+                    output = OutputGenerator.get_output(response_output)
+                    with span("render.output", kind="render"):
+                        output.return_chat_message(response_output, message_placeholder)
+                    self.record_latency(stream_handler.get_metrics())
+
+                    # Show intermediate steps in Streamlit
+                    with st.expander("Zwischenschritte des Agenten anzeigen"):
+                        # st.write(Langchain_Agent_Handler.show_intermediate_steps(assistant_response))
+                        self._understand_message(assistant_response)
             
-            # for successful chat, Add user message to chat history
-            chat_history.append(HumanMessage(prompt))
-            # Add assistant message to chat history
-            chat_history.append(AIMessage(response_output))
+                # for successful chat, Add user message to chat history
+                chat_history.append(HumanMessage(prompt))
+                # Add assistant message to chat history
+                chat_history.append(AIMessage(response_output))
 
         return chat_history
     
 
+    @traced(kind="render")
     def _understand_message(self, assistant_response: dict):
         """ show the executed code in the chat"""
 
@@ -2,6 +2,9 @@ import streamlit as st
 from pandas import DataFrame
 from pandasai import Agent
 
+from concurrent.futures import ThreadPoolExecutor
+import time
+
 from modules.speckle.projects import SpeckleProject
 
 from modules.streamlit.messages.chat_output import OutputGenerator
@@ -9,6 +12,11 @@ from modules.streamlit.messages.st_chathistory import StreamlitChatHistory
 from modules.streamlit.components.st_components import StreamlitComponents
 
 from modules.llm.agent_handler import Pandasai_Agent_Handler
+from modules.llm.answer_cache import get_answer_cache
+from modules.llm.code_executor import SandboxError, stream_code
+from modules.llm.llm_settings import LLMSettings
+from modules.llm.plan_cache import get_plan_cache
+from modules.tracing import get_tracer, span, traced
 
 
 class Streamlit_PandasAI_Components(StreamlitComponents):
@@ -16,9 +24,11 @@ class Streamlit_PandasAI_Components(StreamlitComponents):
     def __init__(self):
         pass
 
-    @st.cache_data(show_spinner=True, hash_funcs={SpeckleProject: lambda x: x.name})
-    def choose_data_subset(_self, speckle_project: SpeckleProject, category_name: str):
+    def choose_data_subset(self, speckle_project: SpeckleProject, category_name: str):
         """ load the data subset from the speckle project for a given category_name
+
+        the table is not copied per session, all sessions on the model version share the table of its basehandler
+        (accounted in the budget of the model registry), so it must not be modified
         
         Args:
             speckle_project (SpeckleProject): the speckle project
@@ -43,6 +53,7 @@ class Streamlit_PandasAI_Components(StreamlitComponents):
         
         return df
 
+    @traced(kind="render")
     def load_chat_history(self, page_title: str):
         """ loads the chat history"""
         # Setup Chat History
@@ -54,47 +65,139 @@ class Streamlit_PandasAI_Components(StreamlitComponents):
             with st.chat_message(message["role"]):
                 # generate placeholder for message
                 message_placeholder = st.empty()
+                # stored tables are loaded from disk
+                content = history.get_content(message)
                 # get the correct Output class
-                output = OutputGenerator.get_output(message["content"])
+                output = OutputGenerator.get_output(content)
                 # load the chat message
-                output.load_chat_message(message["content"], message_placeholder)
+                output.load_chat_message(content, message_placeholder)
         
         return history
 
-    def new_user_query(self, df: DataFrame, agent: Agent, history: StreamlitChatHistory):
-        """ handle a new user query, sends to API and returns the response, updates the chat history"""
+    def new_user_query(self, df: DataFrame, agent: Agent, history: StreamlitChatHistory, answer_key: tuple = None):
+        """ handle a new user query, sends to API and returns the response, updates the chat history
+
+        with an answer_key (version id, category), answers of the same or similar questions are taken from the answer cache"""
         if prompt := st.chat_input("Frag mich alles über deine BIM Daten..."):
+            with get_tracer().trace("chat.pandasai", page=st.session_state.get("page_title"),
+                                    project=st.session_state.get("project_name")):
             
-            # Display user message in chat message container
-            with st.chat_message("user"):
-                st.markdown(prompt)
-
-            # Display assistant response in chat message container
-            with st.chat_message("assistant"):
-                # generate placeholder for message
-                message_placeholder = st.empty()
-
-                # get assistant response via API
-                assistant_response = agent.chat(prompt)
-
-                # generate output message in Streamlit
-                output = OutputGenerator.get_output(assistant_response)
-                output.return_chat_message(assistant_response, message_placeholder)
+                # Display user message in chat message container
+                with st.chat_message("user"):
+                    st.markdown(prompt)
+
+                # Display assistant response in chat message container
+                with st.chat_message("assistant"):
+                    # generate placeholder for message and a container for the pipeline steps
+                    status = st.status("PandasAI arbeitet...")
+                    message_placeholder = st.empty()
+
+                    # answers of the same or a similar question about the same data are reused
+                    answer_cache = get_answer_cache() if LLMSettings.ANSWER_CACHE_ENABLED and answer_key else None
+                    scope = f"pandasai:{answer_key[1]}" if answer_cache else None
+                    cached = answer_cache.lookup(answer_key[0], scope, prompt) if answer_cache else None
+
+                    # the cached code of the question is executed directly as long as the columns of the data match
+                    plan_cache = get_plan_cache() if LLMSettings.PLAN_CACHE_ENABLED and cached is None else None
+                    plan = plan_cache.get("pandasai", [df], prompt) if plan_cache else None
+                    if plan is not None:
+                        start = time.perf_counter()
+                        with span("plan_cache.execute", kind="code") as plan_span:
+                            try:
+                                status.write("Antwort aus gespeichertem Code")
+                                status.code(plan)
+                                # the code runs in the code sandbox, the result is shown while it arrives
+                                assistant_response = OutputGenerator.stream_output(stream_code(plan, [df], "pandasai"),
+                                                                                   message_placeholder, status)
+                                metrics = {"time_to_first_token": None, "time_to_first_visible": 0.0,
+                                           "total_time": time.perf_counter() - start, "tokens": None}
+                            except SandboxError as e:
+                                # the code does not fit the data anymore, PandasAI generates it again
+                                if plan_span is not None:
+                                    plan_span.error = f"{type(e).__name__}: {e}"
+                                plan_cache.drop("pandasai", [df], prompt)
+                                plan = None
+
+                    if cached is not None:
+                        assistant_response = cached.answer
+                        metrics = {"time_to_first_token": None, "time_to_first_visible": 0.0, "total_time": 0.0, "tokens": None}
+                        status.write(f"Antwort aus dem Cache (Frage: {cached.question})")
+                        if cached.code:
+                            status.code(cached.code)
+                    elif plan is None:
+                        # get assistant response via API, the pipeline steps are shown while they run
+                        n_logs = len(agent.logger._logs)
+                        assistant_response, metrics = self._chat_with_step_events(agent, prompt, status)
+                        # the logs are reset for a new conversation
+                        since = n_logs if len(agent.logger._logs) >= n_logs else 0
+                        code = Pandasai_Agent_Handler.load_code(agent, since)
+                        # charts are files which are moved to the export folder, they are not cached
+                        is_chart = isinstance(assistant_response, str) and assistant_response.endswith(".png")
+                        if plan_cache and not is_chart and code != "No steps executed":
+                            plan_cache.put("pandasai", [df], prompt, code)
+                        if answer_cache and not is_chart:
+                            steps = [{"source": log["source"], "msg": str(log["msg"]).split("\n")[0]}
+                                     for log in Pandasai_Agent_Handler.return_verbose(agent)]
+                            answer_cache.store(answer_key[0], scope, prompt, assistant_response, code=code, steps=steps)
+                    status.update(label="PandasAI fertig", state="complete", expanded=False)
+
+                    # generate output message in Streamlit
+                    output = OutputGenerator.get_output(assistant_response)
+                    with span("render.output", kind="render"):
+                        output.return_chat_message(assistant_response, message_placeholder)
+                    self.record_latency(metrics)
                 
-                # Show executed code in Streamlit
-                with st.expander("Understand Query"):
-                    self._understand_message(agent)
+                    # Show executed code in Streamlit
+                    if cached is None and plan is None:
+                        with st.expander("Understand Query"):
+                            self._understand_message(agent)
             
-            # for successful chat, add to history
-            # Add user message to chat history
-            history.append({"role": "user", "content": prompt, "type": "string"})
-            # st.session_state.messages.append({"role": "user", "content": prompt, "type": "string"})
-            # Add assistant message to chat history
-            history.append(output.save_chat_message(assistant_response))
-            # st.session_state["messages"].append(output.save_chat_message(assistant_response)) 
+                # for successful chat, add to history
+                # Add user message to chat history
+                history.append({"role": "user", "content": prompt, "type": "string"})
+                # st.session_state.messages.append({"role": "user", "content": prompt, "type": "string"})
+                # Add assistant message to chat history
+                history.append(output.save_chat_message(assistant_response))
+                # st.session_state["messages"].append(output.save_chat_message(assistant_response)) 
 
         return history
 
+    @traced("pandasai.chat", kind="agent")
+    def _chat_with_step_events(self, agent: Agent, prompt: str, status, poll_interval: float = 0.1):
+        """ runs the chat in a worker thread and writes the new log entries of the pipeline into the status container
+
+        Returns:
+            tuple: the response of the agent, the latency metrics
+        """
+        start = time.perf_counter()
+        first_event = None
+        n_seen = len(agent.logger._logs)
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(agent.chat, prompt)
+            while True:
+                # check before reading the logs, so the last steps are shown as well
+                done = future.done()
+                logs = agent.logger._logs
+                if len(logs) < n_seen:
+                    # the logs were reset for the new chat
+                    n_seen = 0
+                for log in logs[n_seen:]:
+                    if first_event is None:
+                        first_event = time.perf_counter() - start
+                    title = str(log["msg"]).split("\n")[0]
+                    status.write(f"**{log['source']}**: {title}")
+                n_seen = len(logs)
+                if done:
+                    break
+                time.sleep(poll_interval)
+            response = future.result()
+
+        metrics = {"time_to_first_token": None, "time_to_first_visible": first_event,
+                   "total_time": time.perf_counter() - start, "tokens": None}
+        return response, metrics
+
+    @traced(kind="render")
     def _understand_message(self, agent: Agent):
         """ show the executed code in the chat"""
 
@@ -1,6 +1,7 @@
 from modules.speckle.data_handler.base_handler import BaseHandler
 from modules.speckle.projects import SpeckleProject
 from modules.streamlit.components.st_components import StreamlitComponents
+from modules.streamlit.shared_cache import get_shared_model_cache, get_version_key
 
 import streamlit as st
 import streamlit.components.v1 as components
@@ -18,9 +19,11 @@ class Streamlit_Speckle_Components(StreamlitComponents):
     def show_3Dmodel(self, commit_url: str):
         return components.iframe(commit_url, height=600)
     
-    @st.cache_data(show_spinner=True, hash_funcs={SpeckleProject: lambda x: x.name})
-    def load_json_from_project(_self, project: SpeckleProject):
-        return project.load_json()
+    def load_json_from_project(self, project: SpeckleProject):
+        """ the data tree of the model version, shared by all sessions"""
+        key = ("json", *get_version_key(project))
+        with st.spinner("Lade die Datenstruktur..."):
+            return get_shared_model_cache().get_or_create(key, project.load_json)
 
     def show_data_tree(self, project: SpeckleProject):
         """ Streamlit module to show the data tree of the Speckle project
@@ -47,7 +50,7 @@ class Streamlit_Speckle_Components(StreamlitComponents):
         selected_category = st.selectbox("Wähle eine Kategorie aus", self.basehandler.categories)
         return selected_category
     
-    def filter_dataframe(self, show_df: bool = False):
+    def filter_dataframe(self, project: SpeckleProject, show_df: bool = False):
         """ Steamlit module to filter the dataframe from the Speckle project"""
 
         # Get the selected category
@@ -55,10 +58,8 @@ class Streamlit_Speckle_Components(StreamlitComponents):
         # Select Box to choose the category
         selected_category = self.choose_category()
         
-        # bekomme alle Category Elements -> TODO: Was sind Category Elements?
-        category_elements = self.basehandler.base[selected_category]
-        # Lade die dazugehörigen Parameter
-        parameters = self.get_parameters_from_category(self.basehandler, selected_category)
+        # Lade die dazugehörigen Parameter (aus dem Schema Index der Version)
+        parameters = self.basehandler.get_ASparameters_from_category(selected_category)
 
         # Choose all parameters for the table
         with st.expander("Wähle relevante Parameter zu " + selected_category + " aus.", expanded=True):
@@ -77,7 +78,7 @@ class Streamlit_Speckle_Components(StreamlitComponents):
 
             if selected_parameters:
                 # create the dataframe
-                result_DF = self.create_dataframe(self.basehandler, category_elements, selected_parameters)
+                result_DF = self.create_dataframe(project, selected_category, selected_parameters)
                 # if selected show the dataframe on streamlit
                 if show_df:
                     # filter the dataframe
@@ -96,13 +97,11 @@ class Streamlit_Speckle_Components(StreamlitComponents):
                         st.markdown(self.add_text)
         return result_DF
 
-    @st.cache_data(hash_funcs={BaseHandler: lambda x: hash(str(x.base.id))})
-    def get_parameters_from_category(_self, basehandler: BaseHandler, selected_category: str):
-        return basehandler.get_ASparameters_from_category(selected_category)
-
-    @st.cache_data(hash_funcs={BaseHandler: lambda x: hash(str(x.base.id))})
-    def create_dataframe(_self, basehandler: BaseHandler, _selected_category: str, selected_parameters: list[str]):
-        return basehandler._create_dataframe_from_elements(_selected_category, selected_parameters)
+    def create_dataframe(self, project: SpeckleProject, selected_category: str, selected_parameters: list[str]):
+        """ the table of the category with the selected parameters, shared by all sessions (read-only)"""
+        key = ("table", *get_version_key(project), selected_category, tuple(selected_parameters))
+        return get_shared_model_cache().get_or_create(
+            key, lambda: self.basehandler.get_category_dataframe(selected_category, selected_parameters))
     
     def show_speckle_api_key_missing(self):
         """
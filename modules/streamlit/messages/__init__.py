@@ -1,2 +1,3 @@
 from .chat_output import OutputGenerator
-from .st_chathistory import StreamlitChatHistory
\ No newline at end of file
+from .st_chathistory import StreamlitChatHistory
+from .stream_handler import StreamlitStreamHandler
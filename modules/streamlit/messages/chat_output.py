@@ -1,13 +1,10 @@
 from pandas import DataFrame
-from pandasai import SmartDataframe, Agent
+import pandas as pd
 from numpy import int64
 
-from modules.llm.agent_handler.pandasai_agent import Pandasai_Agent_Handler
-
 import streamlit as st
 from io import StringIO
 import os
-import time
 
 from abc import ABC
 
@@ -33,6 +30,38 @@ class OutputGenerator(ABC):
         else:
             return Output()
         
+    @staticmethod
+    def stream_output(events, message_placeholder, status=None):
+        """ shows the events of sandboxed code while they arrive and returns the complete result
+
+        printed text is written into the status container, the rows of a DataFrame result are appended to the table
+
+        Args:
+            events: the ("stdout" | "rows" | "value", payload) events of the code sandbox
+            message_placeholder: the placeholder of the chat message
+            status (optional): the status container of the answer
+        """
+        printed = ""
+        chunks = []
+        value = None
+        table = None
+        for kind, payload in events:
+            if kind == "stdout":
+                printed += payload
+                if status is not None:
+                    status.write(payload)
+            elif kind == "rows":
+                chunks.append(payload)
+                if table is None:
+                    table = message_placeholder.dataframe(payload)
+                else:
+                    table.add_rows(payload)
+            elif kind == "value":
+                value = payload
+        if chunks:
+            return pd.concat(chunks)
+        return value if value is not None else printed.strip()
+
     @staticmethod
     def possible_outputs():
         """ Returns the possible output classes"""
@@ -67,7 +96,7 @@ class Output(ABC):
     def _get_message_number(self, message):
         """ Returns the number of the message on this page, needed for specifying file names"""
         # get current page
-        current_page = st.session_state.get("project_name")
+        current_page = st.session_state.get("page_title")
         # get the history
         if st.session_state.history:
             overall_history = st.session_state.history
@@ -102,7 +131,7 @@ class OutputDataFrame(Output):
             st.markdown(self.add_text)
 
         # # Get Message Number
-        # page_title = st.session_state.get("project_name")
+        # page_title = st.session_state.get("page_title")
         # number_message = self._get_message_number(message)
 
         # # Create Download Button
@@ -149,15 +178,8 @@ class OutputString(Output):
 
     def return_chat_message(self, message, message_placeholder):
         """
-        Returns a string
+        Returns a string, the tokens were already streamed into the placeholder (see StreamlitStreamHandler)
         """
-        full_response = ""
-        # Simulate stream of response with milliseconds delay
-        for chunk in message.split():
-            full_response += chunk + " "
-            time.sleep(0.05)
-            # Add a blinking cursor to simulate typing
-            message_placeholder.markdown(full_response + "▌")
         message_placeholder.markdown(message)
 
     def load_chat_message(self, message, message_placeholder):
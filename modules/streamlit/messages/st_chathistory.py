@@ -1,6 +1,47 @@
 import streamlit as st
 
-from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from pandas import DataFrame
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from modules.llm.history_window import HistoryWindow
+from modules.llm.llm_settings import LLMSettings
+from modules.speckle.data_handler.table_store import ParquetTableStore
+
+import os
+import uuid
+
+
+class StoredDataFrame:
+
+    """ reference to a table output of the chat, stored as Parquet file instead of in the session state
+
+    Variables:
+    path (str): the Parquet file
+    rows (int): number of rows of the table
+    columns (list[str]): the columns of the table
+    """
+
+    def __init__(self, df: DataFrame, directory: str = None) -> None:
+        directory = directory if directory else LLMSettings.CHAT_ARTIFACT_DIR
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"{uuid.uuid4().hex}.parquet")
+        self.rows = len(df)
+        self.columns = [str(name) for name in df.columns]
+        # columns with mixed value types are stored as strings (display only)
+        table = pa.table({str(name): ParquetTableStore._to_arrow(df[name]) for name in df.columns})
+        pq.write_table(table, self.path)
+
+    def load(self) -> DataFrame:
+        return pq.read_table(self.path, memory_map=True).to_pandas()
+
+    def delete(self) -> None:
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
 
 class StreamlitChatHistory:
 
@@ -96,6 +137,11 @@ class StreamlitChatHistory:
 
     def reset(self):
         """reset the chat history in the Streamlit session state"""
+        # remove the stored outputs and the summary of the history
+        for message in self.history:
+            if isinstance(message, dict) and isinstance(message.get("content"), StoredDataFrame):
+                message["content"].delete()
+        st.session_state.get("history_window", {}).pop(self.chat_name, None)
         # initialize the history file
         self.history = []
         # reset the chat state
@@ -113,7 +159,24 @@ class StreamlitChatHistory:
         """
         # check the format
         self.check_valid_history_format(message)
+        # tables are stored by reference, the session state keeps only the path
+        if self.framework == "pandasai" and isinstance(message["content"], DataFrame):
+            message = {**message, "content": StoredDataFrame(message["content"])}
         # append message
         self.history.append(message)
         # reassign the session states
-        self.reload_st_states()
\ No newline at end of file
+        self.reload_st_states()
+
+    def get_content(self, message):
+        """ returns the content of a message, stored tables are loaded"""
+        content = message["content"] if isinstance(message, dict) else message.content
+        if isinstance(content, StoredDataFrame):
+            return content.load()
+        return content
+
+    def get_agent_history(self, settings: LLMSettings) -> list[BaseMessage]:
+        """ returns the history for the prompt of the agent: a summary of the older turns and the last turns
+        (bounded by the token budget of the model, see HistoryWindow)"""
+        states = st.session_state.setdefault("history_window", {})
+        window = HistoryWindow(settings, states.setdefault(self.chat_name, {}))
+        return window.get_messages(self.history)
@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from modules.llm.tools.async_tools import get_current_script_run_ctx, script_run_context
+
+import time
+
+
+class StreamlitStreamHandler(BaseCallbackHandler):
+
+    """
+    Streams the tokens of the LLM into the message placeholder while they are generated.
+
+    Every LLM call starts a new text, so the placeholder always shows the currently generated text and finally
+    the answer of the last call. Tool calls and their results are written into the status container.
+    Only the LLM calls of the top-level run are streamed: the runs inside of a tool (e.g. the pandas agent of the
+    BIM IR tool, which gets the callbacks of the calling agent) can run concurrently, their tool calls are only
+    written into the status container.
+    The handler measures the time to the first visible token, which is the latency the user perceives.
+    """
+
+    # called in the thread of the event loop in async mode, Streamlit elements can only be written from threads
+    # with the script context, so the handler writes with the script context of its session
+    run_inline = True
+
+    def __init__(self, message_placeholder, status_container=None) -> None:
+        self._script_run_ctx = get_current_script_run_ctx()
+        self.message_placeholder = message_placeholder
+        self.status_container = status_container
+        self.text = ""
+        self.n_tokens = 0
+        self.start_time = time.perf_counter()
+        self.first_token_time = None
+        self.first_event_time = None
+        # ids of the tool runs and of all runs inside of them
+        self._nested_runs = set()
+
+    def _is_nested(self, run_id: UUID, parent_run_id: Optional[UUID], is_tool: bool = False) -> bool:
+        """ remembers the run if it is a tool run or inside of one, returns if it is inside of a tool run"""
+        nested = parent_run_id is not None and parent_run_id in self._nested_runs
+        if nested or is_tool:
+            self._nested_runs.add(run_id)
+        return nested
+
+    def on_chain_start(self, serialized: Dict[str, Any], inputs: Dict[str, Any], *, run_id: UUID,
+                       parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._is_nested(run_id, parent_run_id)
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID,
+                     parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        if not self._is_nested(run_id, parent_run_id):
+            self.text = ""
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        if not self._is_nested(run_id, parent_run_id):
+            self.text = ""
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        """ shows the new token with a cursor"""
+        # tool calls are streamed without text
+        if not token:
+            return
+        self.n_tokens += 1
+        # the runs inside of tools are not streamed
+        if run_id in self._nested_runs:
+            return
+        if self.first_token_time is None:
+            self.first_token_time = time.perf_counter() - self.start_time
+        self.text += token
+        with script_run_context(self._script_run_ctx):
+            self.message_placeholder.markdown(self.text + "▌")
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID,
+                      parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._is_nested(run_id, parent_run_id, is_tool=True)
+        self._write_event(f"🔧 **{serialized.get('name', 'Tool')}**: {input_str}")
+
+    def on_tool_end(self, output: Any, **kwargs: Any) -> None:
+        output = str(output)
+        self._write_event(f"✅ {output[:500]}{' ...' if len(output) > 500 else ''}")
+
+    def on_tool_error(self, error: BaseException, **kwargs: Any) -> None:
+        self._write_event(f"❌ {error}")
+
+    def _write_event(self, text: str) -> None:
+        if self.first_event_time is None:
+            self.first_event_time = time.perf_counter() - self.start_time
+        if self.status_container is not None:
+            with script_run_context(self._script_run_ctx):
+                self.status_container.write(text)
+
+    def get_metrics(self) -> dict:
+        """ returns the latency metrics of the answer (seconds)"""
+        visible = [value for value in [self.first_token_time, self.first_event_time] if value is not None]
+        return {
+            "time_to_first_token": self.first_token_time,
+            "time_to_first_visible": min(visible) if visible else None,
+            "total_time": time.perf_counter() - self.start_time,
+            "tokens": self.n_tokens,
+        }
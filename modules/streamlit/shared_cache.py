@@ -0,0 +1,161 @@
+from typing import Any, Callable
+
+from pandas import DataFrame, Series
+import streamlit as st
+
+from modules.speckle.projects import SpeckleProject
+from modules.speckle.speckle_settings import SpeckleSettings
+
+from collections import OrderedDict
+import sys
+import threading
+
+
+def estimate_nbytes(value: Any) -> int:
+    """ estimated memory of a cached value: deep memory usage of tables, deep size of containers"""
+    if isinstance(value, DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, Series):
+        return int(value.memory_usage(deep=True))
+
+    # iterative, the JSON trees of large models are deeper than the recursion limit
+    total = 0
+    seen = set()
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set)):
+            stack.extend(item)
+        elif isinstance(item, (DataFrame, Series)):
+            total += estimate_nbytes(item)
+    return total
+
+
+def get_version_key(project: SpeckleProject) -> tuple:
+    """ the resolved model version of the project (url, version id, lazy mode), loads the model if needed"""
+    return project.url, project.get_version_id(), project.lazy
+
+
+class _PendingEntry:
+
+    """ a value which is currently created, other sessions wait for it"""
+
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SharedModelCache:
+
+    """
+    Cache of the data the Streamlit pages derive from a model version (JSON tree, selected tables), shared by all
+    sessions of the server.
+
+    Unlike st.cache_data the values are not pickled and copied per call: all sessions get the same object, so it
+    must not be modified. Entries are keyed by the resolved model version (see get_version_key), not by the name of
+    the project. The estimated size of all entries is kept below a budget by evicting the least recently used ones.
+    The models themselves are shared by the model registry (see model_registry.py).
+    """
+
+    def __init__(self, max_mb: int = None) -> None:
+        self.max_bytes = (max_mb if max_mb else SpeckleSettings.SHARED_CACHE_MAX_MB) * 1024 * 1024
+        # key -> (value, estimated bytes)
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_create(self, key: tuple, create: Callable[[], Any]) -> Any:
+        """ returns the cached value, creates it once if it is not cached (concurrent sessions wait for it)
+
+        Args:
+            key (tuple): key of the value, starts with the version key of the model
+            create (Callable): creates the value, only called once per key
+
+        Returns:
+            Any: the shared value (read-only)
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            pending = self._loading.get(key)
+            is_creator = pending is None
+            if is_creator:
+                pending = _PendingEntry()
+                self._loading[key] = pending
+                self.misses += 1
+
+        if not is_creator:
+            pending.done.wait()
+            if pending.error is not None and not isinstance(pending.error, Exception):
+                # the session of the creator was interrupted (rerun, stop), this session creates the value
+                return self.get_or_create(key, create)
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+
+        nbytes = None
+        try:
+            try:
+                pending.value = create()
+                nbytes = estimate_nbytes(pending.value)
+            except BaseException as e:
+                # also interruptions (e.g. the rerun of the session), the waiting sessions get the error
+                pending.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._loading[key]
+                    # values larger than the whole budget are returned, but not kept
+                    if pending.error is None and nbytes is not None and nbytes <= self.max_bytes:
+                        self._entries[key] = (pending.value, nbytes)
+                        self._evict(keep=key)
+        finally:
+            pending.done.set()
+
+        return pending.value
+
+    def get_total_bytes(self) -> int:
+        """ returns the estimated size of all entries"""
+        with self._lock:
+            return sum(nbytes for _, nbytes in self._entries.values())
+
+    def get_stats(self) -> dict:
+        """ returns the number and size of the entries, the budget and the hit counters"""
+        with self._lock:
+            return {"entries": len(self._entries), "total_bytes": sum(nbytes for _, nbytes in self._entries.values()),
+                    "max_bytes": self.max_bytes, "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _evict(self, keep: tuple) -> None:
+        """ evicts the least recently used entries until the budget is met, caller holds the lock"""
+        total = sum(nbytes for _, nbytes in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._entries.pop(key)[1]
+            self.evictions += 1
+
+
+@st.cache_resource(show_spinner=False)
+def get_shared_model_cache() -> SharedModelCache:
+    """ returns the cache which is shared by all sessions of the Streamlit server (cleared with the resource cache)"""
+    return SharedModelCache()
@@ -0,0 +1,3 @@
+from .tracing_settings import TracingSettings
+from .tracer import Span, Tracer, get_tracer, span, traced
+from .exporter import format_json_lines, format_prometheus, start_trace_server
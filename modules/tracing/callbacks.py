@@ -0,0 +1,133 @@
+from typing import Any, Dict, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+import tiktoken
+
+from modules.tracing.tracer import Span, Tracer
+
+from contextvars import ContextVar
+import threading
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+
+    """
+    Traces the LLM calls (with prompt and completion tokens) and the tool calls of LangChain runs.
+
+    The tool span is the running span while the tool runs, so the spans of the data path (model loading, tables)
+    and the LLM calls inside the tool are its children. Streamed completions do not report their token usage,
+    then the prompt is counted with the tokenizer and the completion by its streamed tokens.
+    """
+
+    # called in the context of the run (also in async mode), so the tool span can be activated
+    run_inline = True
+
+    def __init__(self, tracer: Tracer) -> None:
+        self.tracer = tracer
+        # run id -> (span, token of the activation, parent span, streamed tokens)
+        self._runs = {}
+        self._lock = threading.Lock()
+        self._encoding = None
+
+    # --- LLM calls ---
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts: List[str], *, run_id: UUID,
+                     parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        self._start_llm(serialized, "\n".join(prompts), run_id, parent_run_id, kwargs)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages: List[List[Any]], *, run_id: UUID,
+                            parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        text = "\n".join(str(message.content) for batch in messages for message in batch)
+        self._start_llm(serialized, text, run_id, parent_run_id, kwargs)
+
+    def on_llm_new_token(self, token: str, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.get(run_id)
+            if run is not None and token:
+                run[3] += 1
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        span, _, _, streamed = run
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        estimate = span.attributes.pop("prompt_tokens_estimate", 0)
+        prompt_tokens = usage.get("prompt_tokens", estimate)
+        completion_tokens = usage.get("completion_tokens")
+        if completion_tokens is None:
+            text = "".join(generation.text for generations in response.generations for generation in generations)
+            completion_tokens = streamed if streamed else self._count_tokens(text)
+        span.attributes.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        self.tracer.record_tokens(span.attributes.get("model", "unknown"), prompt_tokens, completion_tokens)
+        self.tracer.end_span(span)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is not None:
+            self.tracer.end_span(run[0], error=f"{type(error).__name__}: {error}")
+
+    # --- tool calls ---
+
+    def on_tool_start(self, serialized: Dict[str, Any], input_str: str, *, run_id: UUID,
+                      parent_run_id: Optional[UUID] = None, **kwargs: Any) -> None:
+        name = serialized.get("name", "tool")
+        parent = self._get_parent(parent_run_id)
+        span = self.tracer.start_span(f"tool.{name}", "tool", parent=parent, attributes={"input": input_str[:200]})
+        token = self.tracer.activate(span)
+        with self._lock:
+            self._runs[run_id] = [span, token, parent, 0]
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_tool(run_id)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_tool(run_id, f"{type(error).__name__}: {error}")
+
+    # --- internals ---
+
+    def _start_llm(self, serialized: dict, text: str, run_id: UUID, parent_run_id: Optional[UUID], kwargs: dict) -> None:
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model_name") or params.get("model") or (serialized.get("id") or ["llm"])[-1]
+        span = self.tracer.start_span(f"llm.{model}", "llm", parent=self._get_parent(parent_run_id),
+                                      attributes={"model": model, "prompt_tokens_estimate": self._count_tokens(text)})
+        with self._lock:
+            self._runs[run_id] = [span, None, None, 0]
+
+    def _end_tool(self, run_id: UUID, error: str = None) -> None:
+        with self._lock:
+            run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        span, token, parent, _ = run
+        self.tracer.deactivate(token, parent)
+        self.tracer.end_span(span, error=error)
+
+    def _get_parent(self, parent_run_id: Optional[UUID]) -> Optional[Span]:
+        """ the span of the parent run if it is traced (e.g. the tool of an LLM call), otherwise the running span"""
+        with self._lock:
+            run = self._runs.get(parent_run_id) if parent_run_id else None
+        return run[0] if run is not None else self.tracer.get_current_span()
+
+    def _count_tokens(self, text: str) -> int:
+        if self._encoding is None:
+            self._encoding = tiktoken.get_encoding("cl100k_base")
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+
+_registered_handler = None
+
+
+def register_tracing_callbacks(tracer: Tracer) -> None:
+    """ traces the LLM and tool calls of all LangChain runs of the process, without passing the handler"""
+    global _registered_handler
+    if _registered_handler is not None:
+        return
+    _registered_handler = TracingCallbackHandler(tracer)
+    # LangChain adds the value of the variable to the callbacks of every run, its default is seen by all threads
+    register_configure_hook(ContextVar("bim_ir_tracing_callback", default=_registered_handler), inheritable=True)
@@ -0,0 +1,125 @@
+from modules.tracing.tracer import Tracer, get_rss_bytes
+from modules.tracing.tracing_settings import TracingSettings
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import json
+import threading
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(**labels) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+def format_prometheus(tracer: Tracer) -> str:
+    """ the aggregates of the tracer in the Prometheus text format"""
+    aggregates = tracer.get_aggregates()
+    lines = [
+        "# HELP bim_ir_span_duration_seconds Duration of the traced steps",
+        "# TYPE bim_ir_span_duration_seconds histogram",
+    ]
+    for (name, kind), (bucket_counts, total, count) in sorted(aggregates["durations"].items()):
+        labels = _labels(span=name, kind=kind)
+        cumulative = 0
+        for bound, bucket_count in zip(tracer.buckets, bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'bim_ir_span_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'bim_ir_span_duration_seconds_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f"bim_ir_span_duration_seconds_sum{{{labels}}} {total}")
+        lines.append(f"bim_ir_span_duration_seconds_count{{{labels}}} {count}")
+
+    lines += [
+        "# HELP bim_ir_span_rss_growth_bytes_total Growth of the resident memory of the process during the steps",
+        "# TYPE bim_ir_span_rss_growth_bytes_total counter",
+    ]
+    for (name, kind), growth in sorted(aggregates["rss_growth"].items()):
+        lines.append(f"bim_ir_span_rss_growth_bytes_total{{{_labels(span=name, kind=kind)}}} {growth}")
+
+    lines += [
+        "# HELP bim_ir_span_errors_total Traced steps which ended with an error",
+        "# TYPE bim_ir_span_errors_total counter",
+    ]
+    for (name, kind), errors in sorted(aggregates["errors"].items()):
+        lines.append(f"bim_ir_span_errors_total{{{_labels(span=name, kind=kind)}}} {errors}")
+
+    lines += [
+        "# HELP bim_ir_llm_tokens_total Tokens of the LLM calls",
+        "# TYPE bim_ir_llm_tokens_total counter",
+    ]
+    for (model, kind), tokens in sorted(aggregates["tokens"].items()):
+        lines.append(f"bim_ir_llm_tokens_total{{{_labels(model=model, type=kind)}}} {tokens}")
+
+    lines += [
+        "# HELP bim_ir_process_resident_memory_bytes Resident memory of the process",
+        "# TYPE bim_ir_process_resident_memory_bytes gauge",
+        f"bim_ir_process_resident_memory_bytes {get_rss_bytes()}",
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def format_json_lines(tracer: Tracer, limit: int = None) -> str:
+    """ the timelines of the last requests, one JSON object per line"""
+    return "".join(json.dumps(trace, default=str) + "\n" for trace in tracer.get_traces(limit))
+
+
+class _TraceRequestHandler(BaseHTTPRequestHandler):
+
+    """ GET /metrics (Prometheus text), /traces?limit=n (JSON lines) and /traces/<trace id> (JSON)"""
+
+    tracer: Tracer = None
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        if url.path == "/metrics":
+            self._send(format_prometheus(self.tracer), "text/plain; version=0.0.4")
+        elif url.path == "/traces":
+            limit = parse_qs(url.query).get("limit", [None])[0]
+            self._send(format_json_lines(self.tracer, int(limit) if limit else None), "application/x-ndjson")
+        elif url.path.startswith("/traces/"):
+            trace = self.tracer.get_trace(url.path.rsplit("/", 1)[-1])
+            if trace is None:
+                self.send_error(404, "Trace not found")
+                return
+            self._send(json.dumps(trace, default=str), "application/json")
+        else:
+            self.send_error(404)
+
+    def _send(self, body: str, content_type: str) -> None:
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args) -> None:
+        # scrapes are not logged
+        pass
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_trace_server(tracer: Tracer, host: str = None, port: int = None) -> ThreadingHTTPServer:
+    """ starts the local endpoint of the tracer once per process (None if disabled or the port is taken)"""
+    global _server
+    host = host if host else TracingSettings.SERVER_HOST
+    port = port if port is not None else TracingSettings.SERVER_PORT
+    with _server_lock:
+        if _server is not None or not port:
+            return _server
+        handler = type("TraceRequestHandler", (_TraceRequestHandler,), {"tracer": tracer})
+        try:
+            _server = ThreadingHTTPServer((host, port), handler)
+        except OSError as e:
+            # e.g. another Streamlit process on this machine serves the port
+            print(f"Trace endpoint not started on {host}:{port}: {e}")
+            return None
+        _server.daemon_threads = True
+        threading.Thread(target=_server.serve_forever, name="trace-server", daemon=True).start()
+        return _server
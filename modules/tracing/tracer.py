@@ -0,0 +1,322 @@
+from typing import Callable, Dict, List, Optional
+
+from modules.tracing.tracing_settings import TracingSettings
+
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import bisect
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+
+
+# span of the running code, copied into asyncio tasks and (with run_in_thread) into executor threads
+_current_span: ContextVar[Optional["Span"]] = ContextVar("bim_ir_current_span", default=None)
+
+
+def get_rss_bytes() -> int:
+    """ resident memory of the process (0 if it can not be read)"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # peak instead of current memory, in kilobytes on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        return 0
+
+
+class Span:
+
+    """ a timed step of a request, with the change of the resident memory of the process while it ran"""
+
+    __slots__ = ["trace", "span_id", "parent_id", "name", "kind", "attributes", "start", "end",
+                 "rss_start", "rss_end", "error"]
+
+    def __init__(self, trace: "Trace", name: str, kind: str, parent: "Span" = None, attributes: dict = None) -> None:
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent is not None else None
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes if attributes else {}
+        self.start = time.perf_counter()
+        self.end = None
+        self.rss_start = get_rss_bytes()
+        self.rss_end = None
+        self.error = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        return self.end - self.start if self.end is not None else None
+
+    @property
+    def rss_delta(self) -> Optional[int]:
+        return self.rss_end - self.rss_start if self.rss_end is not None else None
+
+    def to_dict(self) -> dict:
+        """ the span on the timeline of its trace (seconds since the start of the trace)"""
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "offset": self.start - self.trace.start,
+            "duration": self.duration,
+            "rss_delta_bytes": self.rss_delta,
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Trace:
+
+    """ the spans of one request, the first span is the root"""
+
+    def __init__(self, name: str) -> None:
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        self.spans = []
+        self.root = None
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            if self.root is None:
+                self.root = span
+            self.spans.append(span)
+
+    def to_dict(self) -> dict:
+        """ the timeline of the request, spans ordered by their start"""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration": self.root.duration if self.root else None,
+            "attributes": self.root.attributes if self.root else {},
+            "spans": [span.to_dict() for span in spans],
+        }
+
+
+class Tracer:
+
+    """
+    Collects the spans of the requests and aggregates them per span name.
+
+    A span without a running parent span starts a new trace, so every chat request, but also every load of a model
+    outside a request, gets its own timeline. The last finished traces are kept in memory (and optionally appended
+    to a JSON lines file), the durations, memory changes and LLM tokens are aggregated for the Prometheus export.
+    """
+
+    def __init__(self, enabled: bool = None, max_traces: int = None, log_path: str = None) -> None:
+        self.enabled = enabled if enabled is not None else TracingSettings.ENABLED
+        self.log_path = log_path if log_path is not None else TracingSettings.TRACE_LOG_PATH
+        self.buckets = TracingSettings.DURATION_BUCKETS
+        self._traces = deque(maxlen=max_traces if max_traces else TracingSettings.MAX_TRACES)
+        self._lock = threading.Lock()
+
+        # aggregates per (name, kind): bucket counts, sum and count of the durations, memory growth, errors
+        self._durations = {}
+        self._rss_growth = {}
+        self._errors = {}
+        # LLM tokens per (model, prompt | completion)
+        self._tokens = {}
+
+    # --- spans ---
+
+    @contextmanager
+    def span(self, name: str, kind: str = "function", **attributes):
+        """ times the block as span of the running trace (or as root of a new trace)"""
+        if not self.enabled:
+            yield None
+            return
+        span = self.start_span(name, kind, attributes=attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+    @contextmanager
+    def trace(self, name: str, kind: str = "request", **attributes):
+        """ times the block as root of a new trace, e.g. a chat request"""
+        if not self.enabled:
+            yield None
+            return
+        token = _current_span.set(None)
+        try:
+            with self.span(name, kind, **attributes) as span:
+                yield span
+        finally:
+            _current_span.reset(token)
+
+    def start_span(self, name: str, kind: str = "function", parent: Span = None, attributes: dict = None) -> Span:
+        """ starts a span below the given parent (default: the running span), it has to be ended with end_span"""
+        parent = parent if parent is not None else _current_span.get()
+        trace = parent.trace if parent is not None else Trace(name)
+        span = Span(trace, name, kind, parent, attributes)
+        trace.add(span)
+        return span
+
+    def end_span(self, span: Span, error: str = None) -> None:
+        """ ends the span, the trace is finished with its root span"""
+        span.end = time.perf_counter()
+        span.rss_end = get_rss_bytes()
+        if error is not None:
+            span.error = error
+
+        key = (span.name, span.kind)
+        with self._lock:
+            histogram = self._durations.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            index = bisect.bisect_left(self.buckets, span.duration)
+            if index < len(self.buckets):
+                histogram[0][index] += 1
+            histogram[1] += span.duration
+            histogram[2] += 1
+            self._rss_growth[key] = self._rss_growth.get(key, 0) + max(span.rss_delta, 0)
+            if span.error is not None:
+                self._errors[key] = self._errors.get(key, 0) + 1
+            if span is span.trace.root:
+                self._traces.append(span.trace)
+
+        if span is span.trace.root and self.log_path:
+            self._write_trace(span.trace)
+
+    @staticmethod
+    def get_current_span() -> Optional[Span]:
+        return _current_span.get()
+
+    @staticmethod
+    def activate(span: Span):
+        """ makes the span the parent of the following spans in this context, returns the token for deactivate"""
+        return _current_span.set(span)
+
+    @staticmethod
+    def deactivate(token, parent: Optional[Span] = None) -> None:
+        try:
+            _current_span.reset(token)
+        except ValueError:
+            # the span ended in another context (e.g. a callback of another thread)
+            _current_span.set(parent)
+
+    # --- aggregates ---
+
+    def record_tokens(self, model: str, prompt_tokens: int, completion_tokens: int) -> None:
+        """ counts the tokens of an LLM call"""
+        with self._lock:
+            for kind, tokens in [("prompt", prompt_tokens), ("completion", completion_tokens)]:
+                self._tokens[(model, kind)] = self._tokens.get((model, kind), 0) + tokens
+
+    def get_traces(self, limit: int = None) -> List[dict]:
+        """ returns the timelines of the last finished traces, newest last"""
+        with self._lock:
+            traces = list(self._traces)
+        if limit is not None:
+            traces = traces[-limit:]
+        return [trace.to_dict() for trace in traces]
+
+    def get_trace(self, trace_id: str) -> Optional[dict]:
+        with self._lock:
+            trace = next((trace for trace in self._traces if trace.trace_id == trace_id), None)
+        return trace.to_dict() if trace else None
+
+    def get_aggregates(self) -> Dict[str, dict]:
+        """ returns a copy of the aggregates (durations, rss_growth, errors, tokens)"""
+        with self._lock:
+            return {
+                "durations": {key: [list(value[0]), value[1], value[2]] for key, value in self._durations.items()},
+                "rss_growth": dict(self._rss_growth),
+                "errors": dict(self._errors),
+                "tokens": dict(self._tokens),
+            }
+
+    def _write_trace(self, trace: Trace) -> None:
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.log_path)), exist_ok=True)
+            with open(self.log_path, "a", encoding="utf-8") as file:
+                file.write(json.dumps(trace.to_dict(), default=str) + "\n")
+        except OSError as e:
+            print(f"Trace could not be written: {e}")
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+_langchain_traced = False
+
+
+def get_tracer() -> Tracer:
+    """ returns the process wide tracer, the LLM and tool calls of all LangChain runs are traced as well
+    and the local endpoint is started"""
+    global _tracer, _langchain_traced
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+            if _tracer.enabled:
+                from modules.tracing.exporter import start_trace_server
+                start_trace_server(_tracer)
+        # the callbacks are registered once a page has loaded LangChain, the data view does not import it
+        if _tracer.enabled and not _langchain_traced and "langchain_core" in sys.modules:
+            from modules.tracing.callbacks import register_tracing_callbacks
+            register_tracing_callbacks(_tracer)
+            _langchain_traced = True
+    return _tracer
+
+
+def span(name: str, kind: str = "function", **attributes):
+    """ times the block as span of the process wide tracer"""
+    return get_tracer().span(name, kind, **attributes)
+
+
+def traced(name: str = None, kind: str = "function", attributes: List[str] = None) -> Callable:
+    """ decorator which times every call of the function as span
+
+    Args:
+        name (str, optional): name of the span. Defaults to the qualified name of the function.
+        kind (str, optional): kind of the span (speckle, data, tool, llm, render, ...)
+        attributes (list[str], optional): arguments of the function which are recorded with the span
+    """
+    def decorator(function: Callable) -> Callable:
+        span_name = name if name else function.__qualname__
+        signature = inspect.signature(function) if attributes else None
+
+        def get_attributes(args, kwargs) -> dict:
+            if signature is None:
+                return {}
+            bound = signature.bind_partial(*args, **kwargs).arguments
+            return {attribute: bound[attribute] for attribute in attributes if attribute in bound}
+
+        if inspect.iscoroutinefunction(function):
+            @functools.wraps(function)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().span(span_name, kind, **get_attributes(args, kwargs)):
+                    return await function(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = get_tracer()
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with tracer.span(span_name, kind, **get_attributes(args, kwargs)):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,25 @@
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+
+class TracingSettings():
+
+    """class to handle the settings of the latency and memory tracing over all prototypes"""
+
+    # spans around the data path, the tools, the LLM calls and the render steps
+    ENABLED = os.environ.get("BIM_IR_TRACING", "true").lower() == "true"
+
+    # number of finished traces (requests) which are kept in memory
+    MAX_TRACES = int(os.environ.get("BIM_IR_TRACING_MAX_TRACES", 200))
+
+    # the finished traces are appended to this file as JSON lines (empty: not written)
+    TRACE_LOG_PATH = os.environ.get("BIM_IR_TRACE_LOG", "")
+
+    # local endpoint with /metrics (Prometheus text) and /traces (JSON lines), port 0 disables it
+    SERVER_HOST = "127.0.0.1"
+    SERVER_PORT = int(os.environ.get("BIM_IR_TRACE_PORT", 9464))
+
+    # upper bounds of the duration histogram (seconds)
+    DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0]
@@ -9,13 +9,12 @@ import streamlit as st
 
 # Set the page title
 page_title = "PandasAI Prototype"
-st.session_state["project_name"] = page_title
 st.set_page_config(
     page_title=page_title,
     layout="wide"
 )
 
-# Set the page title in the session state
+# Set the page title in the session state (the project name is set by the project selection of the sidebar)
 st.session_state["page_title"] = page_title
 
 # Instantiate the main components
@@ -41,11 +40,13 @@ category_name = st.selectbox("Choose a table", speckle_project.get_categories())
 # get the data subset and display it
 df = st_chat.choose_data_subset(speckle_project, category_name)
 
-# Setup agent
-agent = Pandasai_Agent_Handler.setup_agent(df, llmsettings)
+# Setup agent, reruns reuse the agent of this session for the same data and settings
+agent_cache = st.session_state.setdefault("pandasai_agents", {})
+data_key = (speckle_project.get_version_id(), category_name)
+agent = Pandasai_Agent_Handler.get_cached_agent(df, llmsettings, agent_cache, data_key)
 
 # Load Chat History
 history = st_chat.load_chat_history(page_title)
 
 # New Chat
-history = st_chat.new_user_query(df, agent, history)
\ No newline at end of file
+history = st_chat.new_user_query(df, agent, history, answer_key=data_key)
\ No newline at end of file
@@ -7,12 +7,14 @@ import streamlit as st
 
 # Set the page title
 page_title = "Langchain Chat"
-st.session_state["project_name"] = page_title
 st.set_page_config(
     page_title=page_title,
     layout="wide"
 )
 
+# Set the page title in the session state (the project name is set by the project selection of the sidebar)
+st.session_state["page_title"] = page_title
+
 # Instantiate the main components
 sidebar = Sidebar()
 st_chat = Streamlit_Langchain_Components()
@@ -29,11 +31,11 @@ llmsettings = sidebar.llmsettings
 speckle_project = SpeckleProject(st.session_state.get("project_name"))
 
 # Setup agent
-# Streamlit actually reruns the setup every time the user interacts with the page
+# Streamlit reruns the page on every interaction, the agent executor is cached by model, temperature, prompt version and tools
 agent = Langchain_Agent_Handler.setup_agent(llmsettings)
 
 # Load Chat History
 history = st_chat.load_chat_history(page_title)
 
 # New Chat
-history = st_chat.new_user_query(agent, history)
\ No newline at end of file
+history = st_chat.new_user_query(agent, history, llmsettings)
\ No newline at end of file
@@ -7,12 +7,14 @@ import streamlit as st
 
 # Set the page title
 page_title = "BIM IR Tool Chat"
-st.session_state["project_name"] = page_title
 st.set_page_config(
     page_title=page_title,
     layout="wide"
 )
 
+# Set the page title in the session state (the project name is set by the project selection of the sidebar)
+st.session_state["page_title"] = page_title
+
 # Instantiate the main components
 sidebar = Sidebar()
 st_chat = Streamlit_Langchain_Components()
@@ -35,4 +37,4 @@ agent = Langchain_Agent_Handler.setup_tool_tester(llmsettings)
 history = st_chat.load_chat_history(page_title)
 
 # New Chat
-history = st_chat.test_tool(agent, history)
\ No newline at end of file
+history = st_chat.test_tool(agent, history, llmsettings)
\ No newline at end of file
@@ -0,0 +1,46 @@
+from langchain_core.embeddings import Embeddings
+
+from modules.llm.answer_cache import SemanticAnswerCache
+
+
+class ConstantEmbeddings(Embeddings):
+
+    """ embeds every text to the same vector, so every cached question is similar"""
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return [1.0, 0.0]
+
+
+def create_cache(tmp_path) -> SemanticAnswerCache:
+    return SemanticAnswerCache(path=str(tmp_path / "answers.sqlite"), embeddings=ConstantEmbeddings())
+
+
+def test_similar_question_with_same_key_tokens_hits(tmp_path):
+    cache = create_cache(tmp_path)
+    cache.store("v1", "bim_ir", "Wie viele Türen gibt es im 1. OG?", "12")
+
+    cached = cache.lookup("v1", "bim_ir", "Anzahl der Türen im 1. OG")
+    assert cached is not None and cached.answer == "12"
+    assert cache.semantic_hits == 1
+
+
+def test_similar_question_with_other_number_level_or_category_misses(tmp_path):
+    cache = create_cache(tmp_path)
+    cache.store("v1", "bim_ir", "Wie viele Türen gibt es im 1. OG?", "12")
+
+    assert cache.lookup("v1", "bim_ir", "Wie viele Türen gibt es im 2. OG?") is None
+    assert cache.lookup("v1", "bim_ir", "Wie viele Türen gibt es im 1. UG?") is None
+    assert cache.lookup("v1", "bim_ir", "Wie viele Fenster gibt es im 1. OG?") is None
+    assert cache.semantic_hits == 0
+
+
+def test_best_candidate_with_matching_key_tokens_is_returned(tmp_path):
+    cache = create_cache(tmp_path)
+    cache.store("v1", "bim_ir", "Wie viele Türen gibt es im EG?", "4")
+    cache.store("v1", "bim_ir", "Wie viele Türen gibt es im OG?", "7")
+
+    assert cache.lookup("v1", "bim_ir", "Anzahl Türen im OG").answer == "7"
+    assert cache.lookup("v1", "bim_ir", "Anzahl Türen im EG").answer == "4"
@@ -0,0 +1,54 @@
+from pandas import DataFrame
+import pyarrow as pa
+
+from modules.llm import code_runner
+
+import multiprocessing
+
+
+def write_table(path: str, df: DataFrame) -> None:
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+def run_request(conn, code: str, path: str) -> list:
+    conn.send({"code": code, "framework": "pandas_agent", "paths": [path], "setup": None,
+               "cpu_seconds": 30, "chunk_rows": 500})
+    events = []
+    while True:
+        kind, payload = conn.recv()
+        if kind == "done":
+            return events
+        events.append((kind, payload))
+
+
+def test_worker_requests_do_not_share_changes(tmp_path):
+    path = str(tmp_path / "table.arrow")
+    write_table(path, DataFrame({"a": [1.0, 2.0, 3.0], "b": ["x", "y", "z"]}))
+
+    context = multiprocessing.get_context("spawn")
+    conn, child_conn = context.Pipe()
+    process = context.Process(target=code_runner.worker_main, args=(child_conn,), daemon=True)
+    process.start()
+    try:
+        assert conn.recv() == ("ready", None)
+
+        # in-place edits work like in the python tool of the agent (the mapped buffers are read-only)
+        events = run_request(conn, 'df["c"] = 1\ndf.loc[0, "a"] = 99.0\ndf.drop(columns=["b"], inplace=True)\n'
+                                   'df["a"].sum()', path)
+        assert events == [("value", 104.0)]
+
+        # the next request sees the original table
+        events = run_request(conn, '(list(df.columns), df["a"].tolist())', path)
+        assert events == [("value", (["a", "b"], [1.0, 2.0, 3.0]))]
+    finally:
+        conn.send(None)
+        process.join(timeout=10)
+
+
+def test_in_process_execution_does_not_change_the_tables():
+    df = DataFrame({"a": [1, 2, 3]})
+    assert code_runner.execute('df["a"] = 0\ndf["b"] = 1\ndf["a"].sum()', [df]) == 0
+    assert list(df.columns) == ["a"]
+    assert df["a"].tolist() == [1, 2, 3]
@@ -0,0 +1,48 @@
+from langchain_core.messages import AIMessage, HumanMessage
+import pytest
+
+from modules.llm.history_window import HistoryWindow
+from modules.llm.llm_settings import LLMSettings
+
+
+class WordEncoding:
+
+    """ counts words instead of tokens, the tiktoken encodings are downloaded on first use"""
+
+    def encode(self, text: str) -> list[str]:
+        return text.split()
+
+
+@pytest.fixture(autouse=True)
+def encoding(monkeypatch):
+    monkeypatch.setattr(HistoryWindow, "_encodings", {model: WordEncoding() for model in LLMSettings.MODEL_OPTIONS})
+
+
+def failing_summarizer(prompt: str) -> str:
+    raise RuntimeError("summary model not available")
+
+
+def create_history(turns: int) -> list:
+    history = []
+    for i in range(turns):
+        history += [HumanMessage(content=f"Frage {i}: " + "Wände " * 200), AIMessage(content=f"Antwort {i}: " + "12 " * 200)]
+    return history
+
+
+def test_fallback_summary_is_capped():
+    window = HistoryWindow(LLMSettings(), summarizer=failing_summarizer)
+    history = []
+    for turns in range(1, 30):
+        history = create_history(turns)
+        window.get_messages(history)
+    assert len(window.state["summary"]) <= LLMSettings.HISTORY_SUMMARY_MAX_CHARS
+    # the latest folded messages are kept
+    assert "Antwort" in window.state["summary"].split("\n")[-1]
+
+
+def test_summary_counts_against_the_budget():
+    settings = LLMSettings()
+    window = HistoryWindow(settings, summarizer=lambda prompt: "Es wurde nach den Wänden gefragt. " * 60)
+    messages = window.get_messages(create_history(LLMSettings.HISTORY_TURNS + 2))
+    assert window.state["summary"]
+    assert window.count_tokens(messages) <= settings.get_history_token_budget()
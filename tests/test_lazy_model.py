@@ -0,0 +1,27 @@
+import json
+
+from modules.speckle.lazy_model import DATA_CHUNK_TYPE, LazyBase, LazyObjectFetcher
+from modules.speckle.object_cache import LocalObjectCache
+
+
+def reference(obj_id: str) -> dict:
+    return {"speckle_type": "reference", "referencedId": obj_id}
+
+
+def element(obj_id: str) -> dict:
+    return {"id": obj_id, "speckle_type": "Base", "name": obj_id}
+
+
+def test_mixed_category_keeps_the_order_of_the_full_model(tmp_path):
+    cache = LocalObjectCache(path=str(tmp_path / "objects.sqlite"))
+    objects = [element("w1"), element("w2"), element("w3"),
+               {"id": "chunk", "speckle_type": DATA_CHUNK_TYPE, "data": [reference("w2"), element("inline2")]}]
+    for obj in objects:
+        cache.save_object(obj["id"], json.dumps(obj))
+    cache.end_write()
+
+    fetcher = LazyObjectFetcher(lambda: None, cache=cache)
+    root = {"id": "root", "speckle_type": "Base",
+            "@Wände": [element("inline1"), reference("w1"), reference("chunk"), reference("w3")]}
+    walls = LazyBase(root, fetcher)["@Wände"]
+    assert [wall["name"] for wall in walls] == ["inline1", "w1", "w2", "inline2", "w3"]
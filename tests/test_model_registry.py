@@ -0,0 +1,74 @@
+from pandas import DataFrame
+from specklepy.objects import Base
+import numpy as np
+import pytest
+
+from modules.speckle.data_handler import base_handler
+from modules.speckle.data_handler.table_store import ParquetTableStore
+from modules.speckle.model_registry import ModelRegistry
+
+MB = 1024 * 1024
+
+
+class FakeLazyBase(Base):
+
+    """ a lazy model which receives a category of the given size"""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.__dict__["loaded_bytes"] = 0
+        self.__dict__["_callback"] = None
+
+    def set_receive_callback(self, callback) -> None:
+        self.__dict__["_callback"] = callback
+
+    def receive(self, nbytes: int) -> None:
+        self.__dict__["loaded_bytes"] += nbytes
+        self._callback()
+
+
+@pytest.fixture(autouse=True)
+def table_store(tmp_path, monkeypatch):
+    monkeypatch.setattr(base_handler, "get_table_store", lambda: ParquetTableStore(str(tmp_path)))
+
+
+def store_table(basehandler, category: str, nbytes: int) -> None:
+    df = DataFrame({"value": np.zeros(nbytes // 8)})
+    basehandler._store_dataframe(category, df, [f"id{i}" for i in range(len(df))])
+
+
+def test_growing_lazy_model_evicts_other_models():
+    registry = ModelRegistry(max_mb=2)
+    first = registry.get_model("url", "v1", lambda: (FakeLazyBase(), 0), lazy=True)
+    second = registry.get_model("url", "v2", lambda: (FakeLazyBase(), 0), lazy=True)
+
+    first.base.receive(MB)
+    second.base.receive(int(1.5 * MB))
+    assert [model["version_id"] for model in registry.get_stats()["models"]] == ["v2"]
+
+
+def test_get_checks_the_budget_of_grown_models():
+    registry = ModelRegistry(max_mb=2)
+    first = registry.get_model("url", "v1", lambda: (Base(), 0))
+    registry.get_model("url", "v2", lambda: (Base(), 0))
+
+    # tables cached without a check (e.g. before the registry knew the model)
+    first.get_basehandler().on_table_cached = None
+    store_table(first.get_basehandler(), "@Wände", 3 * MB)
+    registry.get_model("url", "v2", lambda: (Base(), 0))
+    assert [model["version_id"] for model in registry.get_stats()["models"]] == ["v2"]
+
+
+def test_single_model_drops_its_least_recently_cached_tables():
+    registry = ModelRegistry(max_mb=2)
+    model = registry.get_model("url", "v1", lambda: (Base(), 0))
+    basehandler = model.get_basehandler()
+
+    store_table(basehandler, "@Wände", MB)
+    store_table(basehandler, "@Türen", MB // 2)
+    assert "@Wände" in basehandler._dataframes and "@Türen" in basehandler._dataframes
+
+    store_table(basehandler, "@Fenster", MB)
+    assert "@Wände" not in basehandler._dataframes
+    assert "@Türen" in basehandler._dataframes and "@Fenster" in basehandler._dataframes
+    assert model.nbytes <= registry.max_bytes
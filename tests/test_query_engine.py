@@ -0,0 +1,130 @@
+from pandas import DataFrame
+import pytest
+
+from modules.speckle.data_handler.query_engine import DuckDBQueryEngine
+from modules.speckle.data_handler.schema_index import CategorySchema
+from modules.speckle.data_handler.table_store import ParquetTableStore
+
+
+class FakeElementIndex:
+
+    def to_dataframe(self) -> DataFrame:
+        return DataFrame({"element_id": ["w1", "w2", "d1"], "category": ["@Wände", "@Wände", "@Türen"],
+                          "level": ["EG", "1. OG", "EG"]})
+
+
+class FakeBaseHandler:
+
+    """ the parts of the BaseHandler which are used by the query engine"""
+
+    def __init__(self) -> None:
+        self.categories = ["@Wände", "@Türen"]
+        self.version_id = "version"
+        self.table_store = None
+        self.tables = {
+            "@Wände": (DataFrame({"Fläche": [10.0, 12.5]}), ["w1", "w2"]),
+            "@Türen": (DataFrame({"Breite": [0.9]}), ["d1"]),
+        }
+        self.built = []
+        # categories of a lazy model which are not received yet
+        self.not_received = set()
+
+    def get_category_dataframe(self, category: str) -> DataFrame:
+        self.built.append(category)
+        return self.tables[category][0]
+
+    def is_category_loaded(self, category: str) -> bool:
+        return category not in self.not_received
+
+    def get_category_schema(self, category: str) -> CategorySchema:
+        self.not_received.discard(category)
+        df = self.tables[category][0]
+        parameters = [{"name": name, "internal_key": name, "dtype": "float", "fill_rate": 1.0, "distinct_count": len(df),
+                       "units": None} for name in df.columns]
+        return CategorySchema.from_records({"category": category, "n_elements": len(df), "parameters": parameters})
+
+    def get_row_ids(self, category: str) -> list[str]:
+        return self.tables[category][1]
+
+    def get_element_index(self) -> FakeElementIndex:
+        return FakeElementIndex()
+
+
+@pytest.fixture
+def engine() -> DuckDBQueryEngine:
+    return DuckDBQueryEngine(FakeBaseHandler())
+
+
+def test_select_and_join(engine):
+    df = engine.query('SELECT e.level, SUM(w."Fläche") AS area FROM waende w JOIN elements e USING (element_id) '
+                      'GROUP BY e.level ORDER BY e.level')
+    assert df.to_dict("list") == {"level": ["1. OG", "EG"], "area": [12.5, 10.0]}
+    assert "tueren" in engine.describe_tables("tueren")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT 1; DROP TABLE waende",
+    "DROP TABLE waende",
+    "INSERT INTO waende VALUES ('w3', 1.0)",
+    "COPY waende TO '/tmp/waende.csv'",
+    "ATTACH '/tmp/other.db'",
+    "SET enable_external_access = true",
+])
+def test_only_single_select_statements(engine, sql):
+    with pytest.raises(ValueError):
+        engine.query(sql)
+    assert len(engine.query("SELECT * FROM waende")) == 2
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM read_csv_auto('/etc/passwd')",
+    "SELECT * FROM '/etc/passwd'",
+    "SELECT * FROM read_text('/etc/passwd')",
+])
+def test_files_can_not_be_read(engine, sql):
+    with pytest.raises(Exception):
+        engine.query(sql)
+
+
+def test_tables_are_loaded_on_first_use():
+    basehandler = FakeBaseHandler()
+    engine = DuckDBQueryEngine(basehandler)
+    assert basehandler.built == []
+    assert engine.query("SELECT COUNT(*) AS n FROM tueren")["n"][0] == 1
+    assert basehandler.built == ["@Türen"]
+    engine.query('SELECT "Breite" FROM tueren')
+    assert basehandler.built == ["@Türen"]
+
+
+def test_describe_does_not_load_tables():
+    basehandler = FakeBaseHandler()
+    basehandler.not_received.add("@Türen")
+    engine = DuckDBQueryEngine(basehandler)
+
+    description = engine.describe_tables()
+    assert basehandler.built == []
+    assert 'waende (category @Wände): "element_id" VARCHAR, "Fläche" DOUBLE' in description
+    assert "tueren (category @Türen): columns not received yet" in description
+    assert '"level" VARCHAR' in description
+
+    # a single table is described from its schema, which receives the category
+    assert engine.describe_tables("tueren") == 'tueren (category @Türen): "element_id" VARCHAR, "Breite" DOUBLE'
+    assert basehandler.built == []
+
+
+def test_described_types_match_the_loaded_tables(engine):
+    description = engine.describe_tables("waende")
+    columns = engine.query('DESCRIBE "waende"')
+    assert description.endswith(", ".join(f'"{row.column_name}" {row.column_type}' for row in columns.itertuples()))
+
+
+def test_described_types_of_stored_tables_match_the_loaded_tables(tmp_path):
+    basehandler = FakeBaseHandler()
+    basehandler.table_store = ParquetTableStore(str(tmp_path))
+    for category, (df, row_ids) in basehandler.tables.items():
+        basehandler.table_store.write_table(basehandler.version_id, category, df, row_ids)
+    engine = DuckDBQueryEngine(basehandler)
+
+    description = engine.describe_tables("waende")
+    columns = engine.query('DESCRIBE "waende"')
+    assert description.endswith(", ".join(f'"{row.column_name}" {row.column_type}' for row in columns.itertuples()))
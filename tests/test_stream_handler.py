@@ -0,0 +1,46 @@
+from uuid import uuid4
+
+from modules.streamlit.messages.stream_handler import StreamlitStreamHandler
+
+
+class FakeElement:
+
+    def __init__(self) -> None:
+        self.markdowns = []
+        self.writes = []
+
+    def markdown(self, text: str) -> None:
+        self.markdowns.append(text)
+
+    def write(self, text: str) -> None:
+        self.writes.append(text)
+
+
+def test_only_top_level_tokens_are_streamed():
+    placeholder, status = FakeElement(), FakeElement()
+    handler = StreamlitStreamHandler(placeholder, status)
+    agent, tool_1, tool_2 = uuid4(), uuid4(), uuid4()
+    handler.on_chain_start({}, {}, run_id=agent)
+
+    # two concurrent tool calls with nested agents which stream their own tokens
+    handler.on_tool_start({"name": "BIM_IR_Tool"}, "Türen", run_id=tool_1, parent_run_id=agent)
+    handler.on_tool_start({"name": "BIM_IR_Tool"}, "Fenster", run_id=tool_2, parent_run_id=agent)
+    nested_runs = []
+    for tool in [tool_1, tool_2]:
+        chain, llm = uuid4(), uuid4()
+        handler.on_chain_start({}, {}, run_id=chain, parent_run_id=tool)
+        handler.on_chat_model_start({}, [[]], run_id=llm, parent_run_id=chain)
+        nested_runs.append(llm)
+    for llm in nested_runs:
+        handler.on_llm_new_token("nested ", run_id=llm)
+    handler.on_tool_end("12", run_id=tool_1, parent_run_id=agent)
+
+    final = uuid4()
+    handler.on_chat_model_start({}, [[]], run_id=final, parent_run_id=agent)
+    for token in ["Es gibt ", "12 Türen."]:
+        handler.on_llm_new_token(token, run_id=final)
+
+    assert handler.text == "Es gibt 12 Türen."
+    assert all("nested" not in text for text in placeholder.markdowns)
+    assert status.writes[:2] == ["🔧 **BIM_IR_Tool**: Türen", "🔧 **BIM_IR_Tool**: Fenster"]
+    assert handler.n_tokens == 4
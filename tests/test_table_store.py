@@ -0,0 +1,38 @@
+from pandas import DataFrame
+import pandas as pd
+
+from modules.speckle.data_handler.columnar_builder import ColumnarTableBuilder
+from modules.speckle.data_handler.table_store import ParquetTableStore
+
+
+def build_table(columns: dict) -> DataFrame:
+    """ builds the columns like the in-memory build of a category table"""
+    return DataFrame({name: ColumnarTableBuilder._to_array(values) for name, values in columns.items()})
+
+
+def test_stored_table_equals_built_table(tmp_path):
+    df = build_table({
+        "Name": ["Wand 1", "Wand 2", "Wand 3", "Wand 4"],
+        "Fläche": [10.0, 12.5, float("nan"), 3.0],
+        "Anzahl": [1, 2, 3, 4],
+        "Tragend": [True, False, True, True],
+        "Mixed": [3.5, "abc", None, 2],
+        "Kommentar": ["a", None, "c", "d"],
+    })
+    store = ParquetTableStore(str(tmp_path))
+    store.write_table("version", "@Wände", df, ["w1", "w2", "w3", "w4"])
+
+    stored, row_ids = store.read_table("version", "@Wände")
+    pd.testing.assert_frame_equal(stored, df)
+    assert row_ids == ["w1", "w2", "w3", "w4"]
+    assert [type(value) for value in stored["Mixed"][:2]] == [float, str]
+    assert stored["Mixed"][3] == 2 and isinstance(stored["Mixed"][3], int)
+
+
+def test_selected_columns_keep_mixed_types(tmp_path):
+    df = build_table({"Mixed": [3.5, "abc"], "Fläche": [1.0, 2.0]})
+    store = ParquetTableStore(str(tmp_path))
+    store.write_table("version", "@Wände", df, ["w1", "w2"])
+
+    stored, _ = store.read_table("version", "@Wände", columns=["Mixed"])
+    assert stored["Mixed"].tolist() == [3.5, "abc"]